@@ -22,6 +22,8 @@ import threading
 import subprocess
 import re
 import json
+import base64
+import struct
 import requests
 import logging
 import os
@@ -51,6 +53,8 @@ ODL_SWITCH_NODE_ID = os.environ.get('ODL_SWITCH_NODE_ID')  # e.g., "openflow:172
 ODL_CONTROLLER_IP = os.environ.get('ODL_CONTROLLER_IP')  # e.g., "10.10.10.10"
 GRACE_PERIOD = int(os.getenv('GRACE_PERIOD', 30))  # Default to 30 if not set
 API_KEY = os.environ.get('API_KEY')  # API key for authentication
+# Payload wire format: "u8b64" (compact binary) or "json" (legacy fallback)
+PAYLOAD_FORMAT = os.getenv('PAYLOAD_FORMAT', 'u8b64').lower()
 
 # Logger setup (defaults to minimal output; configurable via env)
 logger = logging.getLogger(__name__)
@@ -405,6 +409,20 @@ def hex_to_dec(hex_str):
         return "0"  # Return "0" for unparseable hex strings
 
 
+def encode_payload(packet_arr):
+    """Encode the packet matrix in the configured wire format.
+
+    "u8b64" sends base64(header + uint8 bytes) which the server decodes with np.frombuffer;
+    "json" keeps the legacy JSON list of decimal strings for older controllers.
+    """
+    if PAYLOAD_FORMAT != "u8b64":
+        return json.dumps(packet_arr), "json"
+    body = bytes(int(value) & 0xFF for packet in packet_arr for value in packet)
+    num_bytes = len(packet_arr[0]) if packet_arr else 0
+    header = struct.pack(">2sBHH", b"PM", 1, len(packet_arr), num_bytes)
+    return base64.b64encode(header + body).decode("ascii"), "u8b64"
+
+
 def classify_and_apply_policy(flow_key, ip_src, ip_dst, src_port, dst_port, client_actual_mac, remote_actual_mac, packet_arr, src_flag, tcp_flag):
     global flow_installation_details # store cookie
 
@@ -415,6 +433,7 @@ def classify_and_apply_policy(flow_key, ip_src, ip_dst, src_port, dst_port, clie
     if not API_BASE_URL:
         logger.error("API_BASE_URL is not set. Cannot queue classification.")
         return
+    payload, payload_format = encode_payload(packet_arr)
     # Prepare the data to send
     data_to_send = {
         "controller_ip": ODL_CONTROLLER_IP,
@@ -425,7 +444,8 @@ def classify_and_apply_policy(flow_key, ip_src, ip_dst, src_port, dst_port, clie
         "dst_port": dst_port,
         "src_mac": client_actual_mac,  # Client's MAC address
         "dst_mac": remote_actual_mac,  # MAC address of the other endpoint
-        "payload": json.dumps(packet_arr),
+        "payload": payload,
+        "payload_format": payload_format,
         "src": src_flag,  # 1 if src_ip is client, 0 if dst_ip is client
         "tcp": tcp_flag,  # 1 for TCP, 0 for UDP
         "port_to_client": PORT_TO_CLIENTS,
@@ -452,7 +472,8 @@ def handle_classification_response(flow_key, result):
         s2c_match_str_from_payload = None
         shared_cookie = None
         for flow_res in result["flow_results"]:
-            if flow_res.get("status") == "success" and flow_res.get("payload_sent"):
+            # "queued": installed asynchronously, the payload is what will be sent
+            if flow_res.get("status") in ("success", "queued") and flow_res.get("payload_sent"):
                 try:
                     sent_flow_data_list = flow_res["payload_sent"].get("flow-node-inventory:flow")
                     if not sent_flow_data_list:
@@ -3,6 +3,8 @@ import threading
 import subprocess
 import re
 import json
+import base64
+import struct
 import requests
 import logging
 import os
@@ -23,6 +25,8 @@ NUM_BYTES = int(os.environ.get('NUM_BYTES'))
 NUM_PACKETS = int(os.getenv('NUM_PACKETS'))
 MODEL_NAME = os.getenv('MODEL_NAME')
 LAN_IP_ADDRESS = os.environ.get('LAN_IP_ADDRESS')
+# Payload wire format: "u8b64" (compact binary) or "json" (legacy fallback)
+PAYLOAD_FORMAT = os.getenv('PAYLOAD_FORMAT', 'u8b64').lower()
 
 # Set a grace period (in seconds) to wait before clearing flow state
 GRACE_PERIOD = 30
@@ -315,12 +319,27 @@ def pkt_callback(pkt):
 def hex_to_dec(hex_data):
     return str(int(hex_data, 16))
 
+
+def encode_payload(packet_arr):
+    """Encode the packet matrix in the configured wire format.
+
+    "u8b64" sends base64(header + uint8 bytes) which the server decodes with np.frombuffer;
+    "json" keeps the legacy JSON list of decimal strings for older controllers.
+    """
+    if PAYLOAD_FORMAT != "u8b64":
+        return json.dumps(packet_arr), "json"
+    body = bytes(int(value) & 0xFF for packet in packet_arr for value in packet)
+    num_bytes = len(packet_arr[0]) if packet_arr else 0
+    header = struct.pack(">2sBHH", b"PM", 1, len(packet_arr), num_bytes)
+    return base64.b64encode(header + body).decode("ascii"), "u8b64"
+
 # =====================
 # Classification Function
 # =====================
 def classify(flow_key, ip_src, ip_dst, src_port, dst_port, src_mac, packet_arr, src, tcp):
     headers = {'Content-Type': 'application/json'}
     protected_url = f"{API_BASE_URL}/api/v1/classify/"
+    payload, payload_format = encode_payload(packet_arr)
     data = {
         "model_name": MODEL_NAME,
         "src_ip": ip_src,
@@ -329,7 +348,8 @@ def classify(flow_key, ip_src, ip_dst, src_port, dst_port, src_mac, packet_arr,
         "dst_port": dst_port,
         "src_mac": src_mac,
         "dst_mac": src_mac,
-        "payload": json.dumps(packet_arr),
+        "payload": payload,
+        "payload_format": payload_format,
         "src": src,
         "tcp": tcp,
         "lan_ip_address": LAN_IP_ADDRESS,
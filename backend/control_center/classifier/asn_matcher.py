@@ -0,0 +1,232 @@
+"""
+ASN organisation to category matching
+
+The keyword tables live in classifier/asn_category_mappings.json. For each
+(table, model category set) an ASNCategoryMatcher is compiled once into a single
+regex over all keywords plus a word -> priority map, so matching an organisation
+is one regex scan and one set lookup regardless of how large the table grows.
+Results are memoised per (asn, model, table) in a bounded LRU, cleared whenever a
+process reloads ASN data (ASN index, IP reputation snapshot) or a model's categories.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ASN_MAPPINGS_PATH = getattr(
+    settings, 'ASN_CATEGORY_MAPPINGS_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'asn_category_mappings.json')
+)
+
+# Tables and how their second (fallback) pass compares keyword words with the organisation
+#   words:     a keyword word equals a whole word of the organisation
+#   substring: a keyword word appears anywhere in the organisation
+TABLE_WORD_MODES = {
+    'default': 'words',
+    'quic': 'substring',
+}
+
+_WORD_SEPARATORS = re.compile(r'[-_]')
+
+_MISSING = object()
+
+
+class ASNCategoryMatcher:
+    """
+    Keyword matcher compiled for one mapping table and one set of available categories
+
+    Matching semantics (unchanged from the original linear scans):
+    1. Substring pass: the earliest keyword in table order that occurs in the
+       organisation wins.
+    2. Word pass: the earliest keyword sharing a word with the organisation wins.
+    In both passes a keyword maps to its first category available in the model;
+    keywords with no available category are dropped at compile time.
+    """
+
+    def __init__(self, mappings: Dict[str, List[str]], available_categories: Sequence[str], word_mode: str = 'words'):
+        available = set(available_categories)
+        self.word_mode = word_mode
+        # keyword -> (priority, category) for keywords that can produce a category
+        self._keywords: Dict[str, Tuple[int, str]] = {}
+        for priority, (keyword, categories) in enumerate(mappings.items()):
+            category = next((c for c in categories if c in available), None)
+            if category is not None:
+                self._keywords[keyword] = (priority, category)
+
+        # Zero-width lookahead reports a match at every position; alternatives are in
+        # priority order, so the alternative taken is the best keyword starting there
+        self._substring_re = self._compile(sorted(self._keywords, key=lambda k: self._keywords[k][0]))
+
+        # word -> best (priority, category) among keywords containing that word
+        self._word_best: Dict[str, Tuple[int, str]] = {}
+        for keyword, entry in self._keywords.items():
+            for word in keyword.split():
+                if word not in self._word_best or entry[0] < self._word_best[word][0]:
+                    self._word_best[word] = entry
+        self._word_re = self._compile(sorted(self._word_best, key=lambda w: self._word_best[w][0]))
+
+    @staticmethod
+    def _compile(keywords: List[str]) -> Optional[re.Pattern]:
+        if not keywords:
+            return None
+        return re.compile('(?=(' + '|'.join(re.escape(k) for k in keywords) + '))')
+
+    @staticmethod
+    def _best(pattern: Optional[re.Pattern], text: str, table: Dict[str, Tuple[int, str]]) -> Optional[Tuple[int, str]]:
+        if pattern is None:
+            return None
+        return min((table[m.group(1)] for m in pattern.finditer(text)), default=None)
+
+    def match(self, organization_lower: str) -> Optional[str]:
+        """
+        Match one lowercase organisation name
+
+        Returns:
+            Matched category name or None if no keyword applies
+        """
+        best = self._best(self._substring_re, organization_lower, self._keywords)
+        if best is not None:
+            return best[1]
+
+        if self.word_mode == 'substring':
+            best = self._best(self._word_re, organization_lower, self._word_best)
+        else:
+            words = _WORD_SEPARATORS.sub(' ', organization_lower).split()
+            best = min((self._word_best[w] for w in words if w in self._word_best), default=None)
+        return best[1] if best is not None else None
+
+    def match_many(self, organizations_lower: Sequence[str]) -> List[Optional[str]]:
+        """Match a batch of lowercase organisation names"""
+        return [self.match(organization) for organization in organizations_lower]
+
+
+class LRUCache:
+    """Small thread-safe LRU used to memoise ASN -> category results"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = max(1, int(maxsize))
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_mappings: Optional[Dict[str, Dict[str, List[str]]]] = None
+_matchers: Dict[Tuple[str, Tuple[str, ...]], ASNCategoryMatcher] = {}
+_matchers_lock = threading.Lock()
+_match_cache = LRUCache(getattr(settings, 'ASN_MATCH_CACHE_SIZE', 4096))
+
+
+def load_asn_mappings(path: Optional[str] = None) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Load the keyword tables from JSON (cached after the first call)
+
+    Returns:
+        Dict of table name -> {keyword: [categories in priority order]}
+    """
+    global _mappings
+    if _mappings is not None and path is None:
+        return _mappings
+    with open(path or ASN_MAPPINGS_PATH, 'r') as f:
+        data = json.load(f)
+    tables = {name: table for name, table in data.items() if not name.startswith('_')}
+    if path is None:
+        _mappings = tables
+    return tables
+
+
+def get_matcher(table: str, available_categories: Sequence[str]) -> ASNCategoryMatcher:
+    """
+    Get the compiled matcher for a table and a model's category set
+
+    Args:
+        table: Mapping table name ("default" or "quic")
+        available_categories: Categories of the model
+
+    Returns:
+        ASNCategoryMatcher: Matcher compiled on first use for this category set
+    """
+    key = (table, tuple(available_categories))
+    matcher = _matchers.get(key)
+    if matcher is None:
+        with _matchers_lock:
+            matcher = _matchers.get(key)
+            if matcher is None:
+                matcher = ASNCategoryMatcher(
+                    load_asn_mappings().get(table, {}),
+                    available_categories,
+                    word_mode=TABLE_WORD_MODES.get(table, 'words')
+                )
+                _matchers[key] = matcher
+    return matcher
+
+
+def match_asn(asn: Optional[int], organization: str, table: str, model_name: Optional[str],
+              available_categories: Sequence[str]) -> Optional[str]:
+    """
+    Match an ASN organisation to a category, memoised per (asn, model, table)
+
+    Args:
+        asn: ASN number (the cache is bypassed when None)
+        organization: Organisation name from the ASN lookup
+        table: Mapping table name
+        model_name: Active model name
+        available_categories: Categories of the active model
+
+    Returns:
+        Matched category name or None
+    """
+    cache_key = (asn, model_name, table)
+    if asn is not None:
+        cached = _match_cache.get(cache_key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+    category = get_matcher(table, available_categories).match(organization.lower())
+    if asn is not None:
+        _match_cache.set(cache_key, category)
+    return category
+
+
+def clear_match_cache() -> None:
+    """Drop memoised results after the ASN organisations or a model's categories changed"""
+    _match_cache.clear()
+
+
+def clear_caches() -> None:
+    """Drop compiled matchers, loaded tables and memoised results (e.g. after editing the JSON)"""
+    global _mappings
+    with _matchers_lock:
+        _matchers.clear()
+        _mappings = None
+    _match_cache.clear()
@@ -17,7 +17,21 @@
 #
 # For inquiries, contact Keegan White at keeganwhite@taurinetech.com.
 
+import base64
 import json
+import struct
+
+import numpy as np
+
+# Binary packet-matrix wire format ("u8b64"): base64 of a 7 byte big-endian header
+# (magic b"PM", version, num_packets, num_bytes) followed by num_packets * num_bytes uint8 values.
+# Payloads without a payload_format field use the legacy JSON encoded nested list.
+# The sniffers (ansible/playbooks/resources/*sniffer/sniffer.py) encode it in encode_payload.
+PAYLOAD_FORMAT_JSON = "json"
+PAYLOAD_FORMAT_BINARY = "u8b64"
+PACKET_MATRIX_MAGIC = b"PM"
+PACKET_MATRIX_VERSION = 1
+PACKET_MATRIX_HEADER = struct.Struct(">2sBHH")
 
 
 class Classification:
@@ -38,6 +52,50 @@ class Classification:
         self.switch_id = switch_id
 
 
+def decode_packet_matrix(encoded):
+    """
+    Decode a binary wire format payload without copying the packet bytes
+
+    Args:
+        encoded: base64 string (or raw bytes) of header + uint8 matrix
+
+    Returns:
+        np.ndarray: read-only uint8 array of shape (num_packets, num_bytes)
+
+    Raises:
+        ValueError: If the header is malformed or the body length does not match it
+    """
+    raw = base64.b64decode(encoded, validate=True) if isinstance(encoded, str) else encoded
+    if len(raw) < PACKET_MATRIX_HEADER.size:
+        raise ValueError("Binary payload is shorter than its header")
+    magic, version, num_packets, num_bytes = PACKET_MATRIX_HEADER.unpack_from(raw)
+    if magic != PACKET_MATRIX_MAGIC or version != PACKET_MATRIX_VERSION:
+        raise ValueError(f"Unsupported binary payload header {magic!r} v{version}")
+    expected = num_packets * num_bytes
+    if len(raw) - PACKET_MATRIX_HEADER.size != expected:
+        raise ValueError(f"Binary payload has {len(raw) - PACKET_MATRIX_HEADER.size} bytes, expected {expected}")
+    return np.frombuffer(raw, dtype=np.uint8, count=expected,
+                         offset=PACKET_MATRIX_HEADER.size).reshape(num_packets, num_bytes)
+
+
+def decode_payload(payload, payload_format=None):
+    """
+    Decode a classification payload in either supported wire format
+
+    Args:
+        payload: Encoded payload from the sniffer
+        payload_format: "u8b64" for the binary format, None/"json" for the legacy JSON list
+
+    Returns:
+        np.ndarray or list: uint8 matrix for binary payloads, nested list for JSON payloads
+    """
+    if payload_format in (None, "", PAYLOAD_FORMAT_JSON):
+        return json.loads(payload) if isinstance(payload, (str, bytes)) else payload
+    if payload_format == PAYLOAD_FORMAT_BINARY:
+        return decode_packet_matrix(payload)
+    raise ValueError(f"Unsupported payload_format: {payload_format}")
+
+
 def create_classification_from_json(json_data):
     src_ip = json_data.get("src_ip")
     dst_ip = json_data.get("dst_ip")
@@ -50,7 +108,7 @@ def create_classification_from_json(json_data):
     inbound_port = json_data.get("inbound_port")
     outbound_port = json_data.get("outbound_port")
     switch_id = json_data.get("switch_id")
-    payload = json.loads(payload)
+    payload = decode_payload(payload, json_data.get("payload_format"))
     # print(payload)
     if src_ip and dst_ip and src_port and dst_port and src_mac and src == 1:  # the client is sending the packet
         return Classification(src_ip, dst_ip, src_port, dst_port, src_mac, payload, src, outer_ipv4=dst_ip,
@@ -19,9 +19,7 @@
 
 
 import numpy as np
-import keras
 import time
-import pandas as pd
 from utils.ip_lookup_service import get_asn_from_ip
 
 columns = ["label"]
@@ -31,14 +29,22 @@ columns = ["label"]
 data = ["ADS_Analytic_Track", "AmazonAWS", "BitTorrent", "Facebook", "FbookReelStory", "GMail", "Google",
                   "GoogleServices", "HTTP", "HuaweiCloud", "Instagram", "Messenger", "Microsoft", "NetFlix",
                   "QUIC", "TikTok", "TLS", "Unknown", "WhatsApp", "WhatsAppFiles", "WindowsUpdate", "YouTube"]
-label_df = pd.DataFrame(data=data, columns=columns)
+
+
+def _default_labels():
+    # pandas is only needed by this legacy loader, so it is imported on first use
+    import pandas as pd
+    return pd.DataFrame(data=data, columns=columns)
 
 
 class ClassificationModel(object):
 
-    def __init__(self, model_file, num_categories, labels=label_df):
+    def __init__(self, model_file, num_categories, labels=None):
         print('importing')
         try:
+            import keras
+            if labels is None:
+                labels = _default_labels()
             self.model = keras.models.load_model(model_file)
             print('model loaded')
             print(self.model.summary())
@@ -0,0 +1,320 @@
+"""
+Pure-NumPy compiled inference backend
+
+Sequential Keras models built from the layer types used in classifier/ml_models
+(Conv1D, Dense, 1D pooling, Dropout, Flatten, Activation) are compiled into a list of
+float32 NumPy operations. Weights are read straight from the .h5 file with h5py, so a
+worker using this backend never imports TensorFlow. Models with any other layer type
+raise UnsupportedModelError and the ModelManager falls back to Keras.
+
+CompiledModel.predict() is call-compatible with keras.Model.predict(), which lets it be
+used directly by the InferenceBatcher.
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# Layers that are identities at inference time
+_PASSTHROUGH_LAYERS = {"InputLayer", "Dropout", "SpatialDropout1D", "GaussianNoise", "GaussianDropout"}
+
+
+class UnsupportedModelError(Exception):
+    """Raised when a model contains layers the compiled backend cannot run"""
+
+
+def _softmax(x: np.ndarray) -> np.ndarray:
+    x = x - x.max(axis=-1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=-1, keepdims=True)
+    return x
+
+
+def _elu(x: np.ndarray) -> np.ndarray:
+    return np.where(x > 0, x, np.expm1(np.minimum(x, 0)))
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+ACTIVATIONS: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": _sigmoid,
+    "tanh": np.tanh,
+    "softmax": _softmax,
+    "elu": _elu,
+    "swish": lambda x: x * _sigmoid(x),
+    "silu": lambda x: x * _sigmoid(x),
+}
+
+
+def _activation(spec: Any) -> Callable[[np.ndarray], np.ndarray]:
+    if spec is None:
+        return ACTIVATIONS["linear"]
+    if isinstance(spec, dict):
+        # Keras 3 may serialise activations as {"class_name": ..., "config": {...}}
+        spec = spec.get("config", {}).get("name") or spec.get("class_name")
+    name = str(spec).lower()
+    if name not in ACTIVATIONS:
+        raise UnsupportedModelError(f"Unsupported activation: {spec}")
+    return ACTIVATIONS[name]
+
+
+def _scalar(value: Any) -> int:
+    """Keras stores 1D kernel/pool/stride sizes as ints or 1-element lists"""
+    if isinstance(value, (list, tuple)):
+        if len(value) != 1:
+            raise UnsupportedModelError(f"Expected a 1D size, got {value}")
+        value = value[0]
+    return int(value)
+
+
+def _check_channels_last(config: Dict[str, Any], class_name: str):
+    if config.get("data_format", "channels_last") != "channels_last":
+        raise UnsupportedModelError(f"{class_name} with data_format={config.get('data_format')} is not supported")
+
+
+def _conv1d(config: Dict[str, Any], weights: List[np.ndarray]) -> Callable[[np.ndarray], np.ndarray]:
+    _check_channels_last(config, "Conv1D")
+    if _scalar(config.get("groups", 1)) != 1:
+        raise UnsupportedModelError("Grouped Conv1D is not supported")
+    kernel = weights[0]
+    bias = weights[1] if config.get("use_bias", True) else None
+    kernel_size, in_channels, filters = kernel.shape
+    strides = _scalar(config.get("strides", 1))
+    dilation = _scalar(config.get("dilation_rate", 1))
+    padding = config.get("padding", "valid")
+    if padding not in ("valid", "same", "causal"):
+        raise UnsupportedModelError(f"Unsupported Conv1D padding: {padding}")
+    span = (kernel_size - 1) * dilation + 1
+    # im2col: (K, C, F) -> (K*C, F) so each layer is a single GEMM
+    kernel_2d = np.ascontiguousarray(kernel.reshape(kernel_size * in_channels, filters))
+    activation = _activation(config.get("activation"))
+
+    def forward(x: np.ndarray) -> np.ndarray:
+        if padding == "same":
+            length = x.shape[1]
+            out_length = -(-length // strides)
+            total = max((out_length - 1) * strides + span - length, 0)
+            x = np.pad(x, ((0, 0), (total // 2, total - total // 2), (0, 0)))
+        elif padding == "causal":
+            x = np.pad(x, ((0, 0), (span - 1, 0), (0, 0)))
+        # (n, L_out, C, span) -> pick dilated taps -> (n, L_out, K, C)
+        windows = sliding_window_view(x, span, axis=1)[:, ::strides, :, ::dilation]
+        n, out_length = windows.shape[0], windows.shape[1]
+        columns = windows.transpose(0, 1, 3, 2).reshape(n * out_length, kernel_size * in_channels)
+        out = columns @ kernel_2d
+        if bias is not None:
+            out += bias
+        return activation(out.reshape(n, out_length, filters))
+
+    return forward
+
+
+def _pool1d(config: Dict[str, Any], class_name: str) -> Callable[[np.ndarray], np.ndarray]:
+    _check_channels_last(config, class_name)
+    if config.get("padding", "valid") != "valid":
+        raise UnsupportedModelError(f"{class_name} with padding={config.get('padding')} is not supported")
+    pool_size = _scalar(config.get("pool_size", 2))
+    strides = _scalar(config.get("strides") or pool_size)
+    reduce = np.max if class_name == "MaxPooling1D" else np.mean
+
+    def forward(x: np.ndarray) -> np.ndarray:
+        n, length, channels = x.shape
+        out_length = (length - pool_size) // strides + 1
+        if strides == pool_size:
+            # Non-overlapping windows are a plain reshape
+            windows = x[:, :out_length * pool_size].reshape(n, out_length, pool_size, channels)
+            return reduce(windows, axis=2)
+        windows = sliding_window_view(x, pool_size, axis=1)[:, ::strides][:, :out_length]
+        return reduce(windows, axis=-1)
+
+    return forward
+
+
+def _global_pool1d(config: Dict[str, Any], class_name: str) -> Callable[[np.ndarray], np.ndarray]:
+    _check_channels_last(config, class_name)
+    reduce = np.max if class_name == "GlobalMaxPooling1D" else np.mean
+    keepdims = bool(config.get("keepdims", False))
+    return lambda x: reduce(x, axis=1, keepdims=keepdims)
+
+
+def _dense(config: Dict[str, Any], weights: List[np.ndarray]) -> Callable[[np.ndarray], np.ndarray]:
+    kernel = np.ascontiguousarray(weights[0])
+    bias = weights[1] if config.get("use_bias", True) else None
+    activation = _activation(config.get("activation"))
+
+    def forward(x: np.ndarray) -> np.ndarray:
+        out = x @ kernel
+        if bias is not None:
+            out += bias
+        return activation(out)
+
+    return forward
+
+
+def _flatten(config: Dict[str, Any]) -> Callable[[np.ndarray], np.ndarray]:
+    _check_channels_last(config, "Flatten")
+    return lambda x: x.reshape(x.shape[0], -1)
+
+
+def _build_op(class_name: str, config: Dict[str, Any], weights: List[np.ndarray]) -> Optional[Callable[[np.ndarray], np.ndarray]]:
+    if class_name in _PASSTHROUGH_LAYERS:
+        return None
+    if class_name == "Conv1D":
+        return _conv1d(config, weights)
+    if class_name in ("MaxPooling1D", "AveragePooling1D"):
+        return _pool1d(config, class_name)
+    if class_name in ("GlobalMaxPooling1D", "GlobalAveragePooling1D"):
+        return _global_pool1d(config, class_name)
+    if class_name == "Dense":
+        return _dense(config, weights)
+    if class_name == "Flatten":
+        return _flatten(config)
+    if class_name in ("Activation", "ReLU", "Softmax"):
+        if class_name == "ReLU" and (config.get("max_value") is not None or config.get("negative_slope") or config.get("threshold")):
+            raise UnsupportedModelError("ReLU with max_value/negative_slope/threshold is not supported")
+        name = config.get("activation", class_name.lower())
+        return _activation(name)
+    raise UnsupportedModelError(f"Unsupported layer type: {class_name}")
+
+
+class CompiledModel:
+    """
+    Sequential model compiled to NumPy float32 operations
+    """
+
+    def __init__(self, layers: Sequence[Dict[str, Any]], weights: Dict[str, List[np.ndarray]], name: str = "model"):
+        """
+        Args:
+            layers: Keras layer configs ({"class_name": ..., "config": {...}}) in order
+            weights: Layer name -> list of weight arrays in Keras order
+            name: Model name used in log messages
+
+        Raises:
+            UnsupportedModelError: If any layer cannot be compiled
+        """
+        self.name = name
+        self.layer_types: List[str] = []
+        self._ops: List[Callable[[np.ndarray], np.ndarray]] = []
+        for layer in layers:
+            class_name = layer["class_name"]
+            config = layer.get("config", {})
+            layer_weights = [np.asarray(w, dtype=np.float32) for w in weights.get(config.get("name"), [])]
+            op = _build_op(class_name, config, layer_weights)
+            self.layer_types.append(class_name)
+            if op is not None:
+                self._ops.append(op)
+        if not self._ops:
+            raise UnsupportedModelError("Model has no computational layers")
+
+    def predict(self, x: np.ndarray, verbose: int = 0, batch_size: Optional[int] = None) -> np.ndarray:
+        """
+        Run the forward pass (signature compatible with keras.Model.predict)
+
+        Args:
+            x: Input array of shape (n, *input_shape)
+            verbose: Ignored
+            batch_size: Ignored, the whole batch runs as one set of matmuls
+
+        Returns:
+            np.ndarray: float32 model output of shape (n, num_outputs)
+        """
+        out = np.asarray(x, dtype=np.float32)
+        for op in self._ops:
+            out = op(out)
+        return out
+
+    __call__ = predict
+
+    @classmethod
+    def from_keras(cls, keras_model, name: str = "model") -> "CompiledModel":
+        """
+        Compile an already loaded Keras Sequential model
+
+        Raises:
+            UnsupportedModelError: If the model is not Sequential or has unsupported layers
+        """
+        if keras_model.__class__.__name__ != "Sequential":
+            raise UnsupportedModelError(f"Only Sequential models are supported, got {keras_model.__class__.__name__}")
+        layers = [{"class_name": layer.__class__.__name__, "config": layer.get_config()} for layer in keras_model.layers]
+        weights = {layer.name: layer.get_weights() for layer in keras_model.layers}
+        return cls(layers, weights, name=name)
+
+    @classmethod
+    def from_h5(cls, model_path: str, name: str = "model") -> "CompiledModel":
+        """
+        Compile a Keras .h5 file without importing TensorFlow
+
+        Args:
+            model_path: Path to a full-model .h5 file (architecture + weights)
+            name: Model name used in log messages
+
+        Raises:
+            UnsupportedModelError: If h5py is unavailable, the file has no model config,
+                or the model has unsupported layers
+        """
+        try:
+            import h5py
+        except ImportError as e:
+            raise UnsupportedModelError("h5py is required to compile .h5 models") from e
+
+        with h5py.File(model_path, "r") as f:
+            if "model_config" not in f.attrs:
+                raise UnsupportedModelError(f"{model_path} has no model_config attribute")
+            raw_config = f.attrs["model_config"]
+            model_config = json.loads(raw_config.decode("utf-8") if isinstance(raw_config, bytes) else raw_config)
+            if model_config.get("class_name") != "Sequential":
+                raise UnsupportedModelError(f"Only Sequential models are supported, got {model_config.get('class_name')}")
+            layers = model_config["config"]["layers"]
+
+            weights_root = f["model_weights"] if "model_weights" in f else f
+            weights: Dict[str, List[np.ndarray]] = {}
+            for layer in layers:
+                layer_name = layer.get("config", {}).get("name")
+                if layer_name not in weights_root:
+                    continue
+                group = weights_root[layer_name]
+                weight_names = [n.decode("utf-8") if isinstance(n, bytes) else n
+                                for n in group.attrs.get("weight_names", [])]
+                weights[layer_name] = [np.asarray(group[weight_name], dtype=np.float32)
+                                       for weight_name in weight_names]
+        return cls(layers, weights, name=name)
+
+
+def verify_against_keras(compiled: CompiledModel, keras_model, input_shape: Sequence[int],
+                         samples: int = 32, atol: float = 1e-4, seed: int = 0) -> float:
+    """
+    Compare compiled output with Keras on random inputs in the model's [0, 1] input range
+
+    Args:
+        compiled: Compiled model to check
+        keras_model: Reference Keras model
+        input_shape: Model input shape without the batch dimension
+        samples: Number of random inputs
+        atol: Maximum allowed absolute difference
+        seed: RNG seed for reproducible checks
+
+    Returns:
+        float: Maximum absolute difference observed
+
+    Raises:
+        UnsupportedModelError: If the outputs differ by more than atol
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0, 256, size=(samples, *input_shape)).astype(np.float32) / np.float32(255)
+    expected = np.asarray(keras_model.predict(x, verbose=0), dtype=np.float32)
+    actual = compiled.predict(x)
+    if expected.shape != actual.shape:
+        raise UnsupportedModelError(f"Output shape mismatch: keras {expected.shape} vs compiled {actual.shape}")
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > atol:
+        raise UnsupportedModelError(f"Compiled output differs from Keras by {max_diff:.2e} (atol {atol:.0e})")
+    return max_diff
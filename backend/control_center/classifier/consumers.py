@@ -42,3 +42,12 @@ class FlowConsumer(AsyncWebsocketConsumer):
         await self.send_message({
             'flow': flow
         })
+
+    async def flow_batch(self, event):
+        # One message per coalescing window (classifier.flow_notifier)
+        await self.send_message({
+            'total': event['total'],
+            'counts': event['counts'],
+            'flows': event['flows'],
+            'window_ms': event.get('window_ms'),
+        })
@@ -0,0 +1,183 @@
+"""
+Coalesced flow_updates notifications
+
+The classify paths used to send one channel-layer message to the flow_updates group
+per classified flow, so Redis publishes and WebSocket frames grew with the flow rate.
+FlowUpdateNotifier collects the flows of a process in memory and a daemon thread
+sends them every FLOW_UPDATES_COALESCE_MS as a single "flow_batch" event:
+
+    {"type": "flow_batch", "total": 120, "counts": {"YouTube": 80, "Zoom": 40},
+     "flows": [...], "window_ms": 250}
+
+"counts" has the number of flows per category in the window and "flows" a sample of
+at most FLOW_UPDATES_SAMPLE_SIZE of them (the first ones seen). FlowConsumer.flow_batch
+forwards it to the browser. publish() only takes a lock, so it is safe to call from
+sync and async views alike.
+
+Usage:
+    from classifier.flow_notifier import flow_notifier
+
+    flow_notifier.publish_many(application_names)
+"""
+
+import asyncio
+import atexit
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+FLOW_UPDATES_GROUP = 'flow_updates'
+FLOW_UPDATES_COALESCE_MS = getattr(settings, 'FLOW_UPDATES_COALESCE_MS', 250)
+FLOW_UPDATES_SAMPLE_SIZE = getattr(settings, 'FLOW_UPDATES_SAMPLE_SIZE', 20)
+
+
+def flow_category(flow: Any) -> Optional[str]:
+    """
+    Category a flow is counted under
+
+    Args:
+        flow: Application name, or a classification dict as posted to post_flow_classification
+
+    Returns:
+        str or None if the flow names no category
+    """
+    if isinstance(flow, str):
+        return flow
+    if isinstance(flow, dict):
+        category = flow.get('classification') or flow.get('application') or flow.get('category')
+        return str(category) if category else None
+    return None
+
+
+class FlowUpdateNotifier:
+    """
+    Process-local coalescing publisher for the flow_updates group
+
+    Args:
+        interval_ms: Window in milliseconds; each window is sent as one message
+        sample_size: Flows kept per window in the "flows" sample
+        group: Channel-layer group to send to
+    """
+
+    def __init__(self, interval_ms: float = 250, sample_size: int = 20, group: str = FLOW_UPDATES_GROUP):
+        self.interval = max(10.0, float(interval_ms)) / 1000.0
+        self.sample_size = max(0, int(sample_size))
+        self.group = group
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._reset_buffers()
+        self._pid = os.getpid()
+        self._sender: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped = threading.Event()
+
+    def _reset_buffers(self):
+        self._counts: Dict[str, int] = {}
+        self._sample: List[Any] = []
+        self._total = 0
+
+    def _check_fork(self):
+        """Drop state inherited from the parent process (its flows are sent by the parent)"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._start_lock = threading.Lock()
+            self._reset_buffers()
+            # Threads and event loops do not survive fork; the child starts its own sender
+            self._sender = None
+            self._loop = None
+
+    def _ensure_sender(self):
+        """Start the sender thread on first use"""
+        self._check_fork()
+        if self._sender is None:
+            with self._start_lock:
+                if self._sender is None:
+                    self._sender = threading.Thread(target=self._run, name="flow-updates-notifier", daemon=True)
+                    self._sender.start()
+
+    def publish(self, flow: Any):
+        """Queue one classified flow for the next flow_batch message"""
+        self.publish_many((flow,))
+
+    def publish_many(self, flows: Iterable[Any]):
+        """
+        Queue classified flows for the next flow_batch message
+
+        Args:
+            flows: Application names or classification dicts
+        """
+        self._ensure_sender()
+        with self._lock:
+            for flow in flows:
+                self._total += 1
+                category = flow_category(flow)
+                if category is not None:
+                    self._counts[category] = self._counts.get(category, 0) + 1
+                if len(self._sample) < self.sample_size:
+                    self._sample.append(flow)
+
+    def _take(self) -> Optional[dict]:
+        with self._lock:
+            if not self._total:
+                return None
+            event = {
+                'type': 'flow_batch',
+                'total': self._total,
+                'counts': self._counts,
+                'flows': self._sample,
+                'window_ms': round(self.interval * 1000),
+            }
+            self._reset_buffers()
+        return event
+
+    def flush(self) -> bool:
+        """
+        Send the pending flows as one flow_batch message
+
+        Called by the sender thread; the message is sent on the thread's own event loop
+        so the channel layer keeps its connection between windows.
+
+        Returns:
+            bool: False if the channel layer rejected the message (the window is dropped;
+            dashboards only lose one window of counts)
+        """
+        self._check_fork()
+        event = self._take()
+        if event is None:
+            return True
+        try:
+            channel_layer = get_channel_layer()
+            if channel_layer is None:
+                return True
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(channel_layer.group_send(self.group, event))
+            return True
+        except Exception:
+            logger.exception(f"Failed to send {event['total']} flow updates")
+            return False
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.flush()
+
+    def stop(self):
+        """Stop the sender thread and send what is left"""
+        self._stopped.set()
+        if self._sender is not None and self._sender.is_alive():
+            self._sender.join(self.interval * 2)
+        self.flush()
+
+
+flow_notifier = FlowUpdateNotifier(
+    interval_ms=FLOW_UPDATES_COALESCE_MS,
+    sample_size=FLOW_UPDATES_SAMPLE_SIZE,
+)
+atexit.register(flow_notifier.stop)
@@ -0,0 +1,361 @@
+"""
+Asynchronous flow-programming queue
+
+With FLOW_PROGRAMMING_ASYNC enabled the classify views no longer wait for ONOS/ODL.
+They build the flow rules (so the selectors can be returned straight away), push one
+job per classification onto a Redis list per controller and answer with a handle.
+
+A Celery task on the "flow_programming" queue drains a controller's list. A Redis
+lock keeps it to one drainer per controller, so a controller's batches are
+programmed one after another. Each batch of up to FLOW_PROGRAMMING_BATCH_SIZE jobs is coalesced:
+identical rules are sent once, ONOS flows go out in one POST and ODL flows as
+concurrent PUTs. Jobs that failed on a network error are retried with exponential
+backoff, up to FLOW_PROGRAMMING_MAX_ATTEMPTS times; any other error marks the batch's
+handles failed.
+
+A batch is moved atomically (LMOVE in MULTI) to a per-controller processing list and
+removed from it once its handles are updated, so a batch of a drainer that died is
+programmed again by the next drainer of that controller.
+
+Job state is kept under flow_programming:handle:<handle> for
+FLOW_PROGRAMMING_RESULT_TTL seconds and served by GET /api/v1/flow-programming/<handle>/.
+
+Job format:
+    {"handle": str, "flows": [...], "attempts": int}
+    ONOS flows are entries of the POST /onos/v1/flows "flows" array; ODL flows are
+    OdlMeterFlowRule.build_flow_requests() dicts.
+"""
+
+import json
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional, Sequence
+
+import redis
+import requests
+from django.conf import settings
+
+from .state_manager import state_manager
+
+logger = logging.getLogger(__name__)
+
+FLOW_PROGRAMMING_ASYNC = getattr(settings, 'FLOW_PROGRAMMING_ASYNC', False)
+FLOW_PROGRAMMING_BATCH_SIZE = getattr(settings, 'FLOW_PROGRAMMING_BATCH_SIZE', 200)
+FLOW_PROGRAMMING_MAX_ATTEMPTS = getattr(settings, 'FLOW_PROGRAMMING_MAX_ATTEMPTS', 5)
+FLOW_PROGRAMMING_RETRY_BACKOFF = getattr(settings, 'FLOW_PROGRAMMING_RETRY_BACKOFF', 2.0)
+FLOW_PROGRAMMING_RESULT_TTL = getattr(settings, 'FLOW_PROGRAMMING_RESULT_TTL', 3600)
+
+FLOW_PROGRAMMING_QUEUE = 'flow_programming'
+KEY_PREFIX = 'flow_programming:'
+# Seconds a drainer may hold a controller before another one can take over
+LOCK_TTL = 60
+MAX_RETRY_DELAY = 60.0
+
+ONOS = 'onos'
+ODL = 'odl'
+
+STATUS_QUEUED = 'queued'
+STATUS_RETRYING = 'retrying'
+STATUS_INSTALLED = 'installed'
+STATUS_FAILED = 'failed'
+
+
+class ControllerBusy(Exception):
+    """Another worker is draining this controller's queue"""
+
+
+def _queue_key(controller_type: str, controller_ip: str) -> str:
+    return f"{KEY_PREFIX}queue:{controller_type}:{controller_ip}"
+
+
+def _scheduled_key(controller_type: str, controller_ip: str) -> str:
+    return f"{KEY_PREFIX}scheduled:{controller_type}:{controller_ip}"
+
+
+def _processing_key(controller_type: str, controller_ip: str) -> str:
+    return f"{KEY_PREFIX}processing:{controller_type}:{controller_ip}"
+
+
+def _lock_key(controller_type: str, controller_ip: str) -> str:
+    return f"{KEY_PREFIX}lock:{controller_type}:{controller_ip}"
+
+
+def _handle_key(handle: str) -> str:
+    return f"{KEY_PREFIX}handle:{handle}"
+
+
+def new_handle() -> str:
+    return uuid.uuid4().hex
+
+
+def _set_status(pipe, handle: str, status: str, **fields):
+    mapping = {'status': status, 'updated_at': time.time()}
+    for name, value in fields.items():
+        mapping[name] = json.dumps(value) if isinstance(value, (dict, list)) else value
+    pipe.hset(_handle_key(handle), mapping=mapping)
+    pipe.expire(_handle_key(handle), FLOW_PROGRAMMING_RESULT_TTL)
+
+
+def enqueue_flow_jobs(controller_type: str, controller_ip: str, jobs: Sequence[dict]):
+    """
+    Queue flow-programming jobs for a controller and make sure a drainer is scheduled
+
+    Args:
+        controller_type: ONOS or ODL
+        controller_ip: Controller address
+        jobs: {"handle", "flows"} dicts (see module docstring)
+    """
+    if not jobs:
+        return
+    redis_client = state_manager.redis_client
+    pipe = redis_client.pipeline(transaction=False)
+    for job in jobs:
+        job.setdefault('attempts', 0)
+        if job['attempts'] == 0:
+            _set_status(pipe, job['handle'], STATUS_QUEUED, controller_type=controller_type,
+                        controller_ip=controller_ip, attempts=0)
+        pipe.rpush(_queue_key(controller_type, controller_ip), json.dumps(job))
+    pipe.execute()
+    _schedule_drainer(controller_type, controller_ip)
+
+
+def _schedule_drainer(controller_type: str, controller_ip: str):
+    """
+    Start a drainer unless one is already pending
+
+    The scheduled flag is cleared by the drainer once it holds the controller's lock
+    and kept while it waits for the lock, so at most one drainer waits per controller.
+    """
+    if state_manager.redis_client.set(_scheduled_key(controller_type, controller_ip), 1, nx=True, ex=LOCK_TTL):
+        from .tasks import drain_flow_programming_queue
+        drain_flow_programming_queue.apply_async((controller_type, controller_ip), queue=FLOW_PROGRAMMING_QUEUE)
+
+
+def queue_meter_flow_rules(flow_rules) -> list:
+    """
+    Queue the ONOS rules of several classifications instead of posting them
+
+    Args:
+        flow_rules: MeterFlowRule instances
+
+    Returns:
+        List aligned with ``flow_rules``: {"status": "queued", "handle", "flow_ids": [],
+        "flow_rule_src", "flow_rule_dst"} dicts, or [] where the meter ID was invalid
+    """
+    from .meter_flow_rule import apply_flow_rules
+
+    results = []
+    # Controller IP -> [(position in flow_rules, job)]
+    jobs_by_controller: Dict[str, List[tuple]] = {}
+    for position, flow_rule in enumerate(flow_rules):
+        built = flow_rule.build_flow_rules()
+        if built is None:
+            results.append([])
+            continue
+        flow_rule_src, flow_rule_dst = built
+        handle = new_handle()
+        jobs_by_controller.setdefault(flow_rule.controller_ip, []).append(
+            (position, {'handle': handle, 'flows': flow_rule_src['flows'] + flow_rule_dst['flows']})
+        )
+        results.append({
+            'status': STATUS_QUEUED,
+            'handle': handle,
+            'flow_ids': [],
+            'flow_rule_src': flow_rule_src,
+            'flow_rule_dst': flow_rule_dst,
+        })
+    for controller_ip, queued in jobs_by_controller.items():
+        try:
+            enqueue_flow_jobs(ONOS, controller_ip, [job for _, job in queued])
+        except redis.RedisError as e:
+            # Without the queue, program the rules in the request as the synchronous path does
+            logger.error(f"Failed to queue flows for ONOS {controller_ip}, programming them now: {e}")
+            positions = [position for position, _ in queued]
+            for position, result in zip(positions, apply_flow_rules([flow_rules[p] for p in positions])):
+                results[position] = result
+    return results
+
+
+def build_odl_job(odl_flow_rule):
+    """
+    Job and immediate flow results for an OdlMeterFlowRule (queue the job with enqueue_flow_jobs)
+
+    Returns:
+        Tuple (job, flow_results); the results carry "payload_sent" so clients can match
+        the rules before they are installed
+    """
+    flows = odl_flow_rule.build_flow_requests()
+    job = {'handle': new_handle(), 'flows': flows}
+    flow_results = [
+        {'status': STATUS_QUEUED, 'flow_id': flow['flow_id'], 'payload_sent': flow['payload']}
+        for flow in flows
+    ]
+    return job, flow_results
+
+
+def drain_queue(controller_type: str, controller_ip: str) -> int:
+    """
+    Program every queued job of a controller
+
+    Returns:
+        int: Number of jobs processed
+
+    Raises:
+        ControllerBusy: If another worker holds the controller's lock (the scheduled
+            flag is kept, so this is the only drainer waiting for it)
+    """
+    redis_client = state_manager.redis_client
+    queue_key = _queue_key(controller_type, controller_ip)
+    processing_key = _processing_key(controller_type, controller_ip)
+    scheduled_key = _scheduled_key(controller_type, controller_ip)
+    lock_key = _lock_key(controller_type, controller_ip)
+    token = uuid.uuid4().hex
+    if not redis_client.set(lock_key, token, nx=True, ex=LOCK_TTL):
+        # Keep the flag alive while waiting so enqueues do not start more drainers
+        redis_client.set(scheduled_key, 1, ex=LOCK_TTL)
+        raise ControllerBusy(f"{controller_type} {controller_ip}")
+    # Enqueues from now on schedule a new drainer (it waits for this one or finds the queue empty)
+    redis_client.delete(scheduled_key)
+    processed = 0
+    try:
+        # A batch left over by a drainer that died goes first
+        raw_jobs = redis_client.lrange(processing_key, 0, -1)
+        if raw_jobs:
+            logger.warning(f"Reprogramming {len(raw_jobs)} interrupted flow jobs on {controller_type} {controller_ip}")
+        while True:
+            if not raw_jobs:
+                raw_jobs = _claim_batch(redis_client, queue_key, processing_key)
+                if not raw_jobs:
+                    break
+            redis_client.expire(lock_key, LOCK_TTL)
+            _program_batch(controller_type, controller_ip, [json.loads(raw) for raw in raw_jobs])
+            redis_client.delete(processing_key)
+            processed += len(raw_jobs)
+            raw_jobs = None
+    finally:
+        if redis_client.get(lock_key) == token:
+            redis_client.delete(lock_key)
+    # Jobs pushed between the last pop and the release
+    if redis_client.llen(queue_key):
+        _schedule_drainer(controller_type, controller_ip)
+    return processed
+
+
+def _claim_batch(redis_client, queue_key: str, processing_key: str) -> List[str]:
+    """Move up to FLOW_PROGRAMMING_BATCH_SIZE jobs from the queue to the processing list in one transaction"""
+    pipe = redis_client.pipeline(transaction=True)
+    for _ in range(FLOW_PROGRAMMING_BATCH_SIZE):
+        pipe.lmove(queue_key, processing_key, 'LEFT', 'RIGHT')
+    return [raw for raw in pipe.execute() if raw is not None]
+
+
+def _program_batch(controller_type: str, controller_ip: str, jobs: List[dict]):
+    """Program one batch; an unexpected error marks all of its handles failed"""
+    try:
+        if controller_type == ONOS:
+            _program_onos(controller_ip, jobs)
+        else:
+            _program_odl(controller_ip, jobs)
+    except Exception as e:  # noqa: BLE001
+        logger.exception(f"Failed to program {len(jobs)} queued flow jobs on {controller_type} {controller_ip}")
+        pipe = state_manager.redis_client.pipeline(transaction=False)
+        for job in jobs:
+            _set_status(pipe, job['handle'], STATUS_FAILED, attempts=job.get('attempts', 0) + 1, error=str(e))
+        pipe.execute()
+
+
+def _program_onos(controller_ip: str, jobs: List[dict]):
+    from .meter_flow_rule import post_flows_once
+
+    # One POST for the batch; identical and already installed rules are not sent again
+    flows = [flow for job in jobs for flow in job['flows']]
+    try:
+        flow_ids = post_flows_once(controller_ip, flows)
+    except requests.RequestException as e:
+        logger.error(f"Error programming {len(flows)} queued flows on ONOS {controller_ip}: {e}")
+        _retry(ONOS, controller_ip, jobs, str(e))
+        return
+
+    pipe = state_manager.redis_client.pipeline(transaction=False)
+    position = 0
+    for job in jobs:
+        job_flow_ids = flow_ids[position:position + len(job['flows'])]
+        position += len(job['flows'])
+        installed = all(flow_id is not None for flow_id in job_flow_ids)
+        _set_status(
+            pipe, job['handle'], STATUS_INSTALLED if installed else STATUS_FAILED, attempts=job['attempts'] + 1,
+            result={'flow_ids': [flow_id for flow_id in job_flow_ids if flow_id is not None]},
+        )
+    pipe.execute()
+
+
+def _program_odl(controller_ip: str, jobs: List[dict]):
+    from odl.odl_flow_utils import install_odl_flows
+
+    # All PUTs of the batch run concurrently; identical and already installed rules are not sent again
+    flow_results = install_odl_flows(controller_ip, [flow for job in jobs for flow in job['flows']])
+    retry_jobs = []
+    pipe = state_manager.redis_client.pipeline(transaction=False)
+    position = 0
+    for job in jobs:
+        results = flow_results[position:position + len(job['flows'])]
+        position += len(job['flows'])
+        # No response code: the controller was not reached
+        if any(r.get('status') == 'error' and 'response_code' not in r for r in results):
+            retry_jobs.append(job)
+            continue
+        installed = all(r.get('status') == 'success' for r in results)
+        _set_status(pipe, job['handle'], STATUS_INSTALLED if installed else STATUS_FAILED,
+                    attempts=job['attempts'] + 1, result={'flow_results': results})
+    pipe.execute()
+    if retry_jobs:
+        _retry(ODL, controller_ip, retry_jobs, "controller unreachable")
+
+
+def _retry(controller_type: str, controller_ip: str, jobs: List[dict], error: str):
+    """Schedule failed jobs again with exponential backoff, or mark them failed"""
+    from .tasks import requeue_flow_jobs
+
+    pipe = state_manager.redis_client.pipeline(transaction=False)
+    by_delay: Dict[float, List[dict]] = {}
+    for job in jobs:
+        job['attempts'] += 1
+        if job['attempts'] >= FLOW_PROGRAMMING_MAX_ATTEMPTS:
+            _set_status(pipe, job['handle'], STATUS_FAILED, attempts=job['attempts'], error=error)
+            continue
+        delay = min(MAX_RETRY_DELAY, FLOW_PROGRAMMING_RETRY_BACKOFF * 2 ** (job['attempts'] - 1))
+        _set_status(pipe, job['handle'], STATUS_RETRYING, attempts=job['attempts'], error=error)
+        by_delay.setdefault(delay, []).append(job)
+    pipe.execute()
+    for delay, delayed_jobs in by_delay.items():
+        requeue_flow_jobs.apply_async(
+            (controller_type, controller_ip, delayed_jobs), countdown=delay, queue=FLOW_PROGRAMMING_QUEUE
+        )
+
+
+def get_flow_programming_status(handle: str) -> Optional[dict]:
+    """
+    State of a queued classification's flows
+
+    Returns:
+        dict with "handle", "status" (queued, retrying, installed or failed), "controller_type",
+        "controller_ip", "attempts" and, once programmed, "result"; None for an unknown
+        or expired handle
+    """
+    data = state_manager.redis_client.hgetall(_handle_key(handle))
+    if not data:
+        return None
+    status = {
+        'handle': handle,
+        'status': data.get('status'),
+        'controller_type': data.get('controller_type'),
+        'controller_ip': data.get('controller_ip'),
+        'attempts': int(data.get('attempts') or 0),
+        'updated_at': float(data.get('updated_at') or 0),
+    }
+    if 'result' in data:
+        status['result'] = json.loads(data['result'])
+    if 'error' in data:
+        status['error'] = data['error']
+    return status
@@ -0,0 +1,292 @@
+"""
+Out-of-process inference server and client
+
+The server process owns the loaded Keras models and answers forward-pass requests
+from web and Celery workers over a local Unix socket or TCP. Workers running the
+ModelManager in client mode (CLASSIFIER_INFERENCE_SERVER set) never import
+TensorFlow, so they can be scaled without multiplying model memory.
+
+Wire protocol: every message is one frame
+    >II (header_len, body_len) | JSON header | raw body bytes
+Requests carry {"op": "predict"|"load"|"ping", "model": name, "dtype": ..., "shape": [...]}
+with the C-contiguous input array as the body. Responses carry {"status": "ok", ...}
+with the output array as the body, or {"status": "error", "error": message}.
+
+The protocol has no authentication: anyone who can connect can run and load models.
+A tcp:// server therefore only binds to loopback or private addresses, and frames
+larger than max_body_bytes are refused before their body is allocated.
+"""
+
+import ipaddress
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct(">II")
+MAX_HEADER_BYTES = 64 * 1024
+# 64 MiB: about 14,900 rows of the default 225 x 5 float32 input per request
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class InferenceServerError(Exception):
+    """Raised when the inference server is unreachable or returns an error"""
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """
+    Parse an inference server address
+
+    Args:
+        address: "unix:///path/to.sock" or "tcp://host:port"
+
+    Returns:
+        Tuple[int, Any]: socket family and the address to connect/bind to
+    """
+    parsed = urlparse(address)
+    if parsed.scheme == "unix":
+        path = parsed.path or parsed.netloc
+        if not path:
+            raise ValueError(f"Missing socket path in {address}")
+        return socket.AF_UNIX, path
+    if parsed.scheme == "tcp":
+        if not parsed.hostname or not parsed.port:
+            raise ValueError(f"Missing host or port in {address}")
+        return socket.AF_INET, (parsed.hostname, parsed.port)
+    raise ValueError(f"Unsupported inference server address: {address}")
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytearray]:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            return None
+        received += count
+    return buffer
+
+
+def send_frame(sock: socket.socket, header: Dict[str, Any], body: bytes = b"") -> None:
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # One write per frame so small requests are not split across segments
+    sock.sendall(b"".join((FRAME_HEADER.pack(len(header_bytes), len(body)), header_bytes, body)))
+
+
+def recv_frame(sock: socket.socket, max_body_bytes: int = MAX_BODY_BYTES) -> Optional[Tuple[Dict[str, Any], bytearray]]:
+    """
+    Read one frame from the socket
+
+    Args:
+        sock: Connected socket
+        max_body_bytes: Largest body accepted; bigger frames raise before the body is read
+
+    Returns:
+        Tuple of (header, body) or None if the peer closed the connection
+    """
+    prefix = _recv_exact(sock, FRAME_HEADER.size)
+    if prefix is None:
+        return None
+    header_len, body_len = FRAME_HEADER.unpack(prefix)
+    if header_len > MAX_HEADER_BYTES:
+        raise InferenceServerError(f"Frame header too large: {header_len} bytes")
+    if body_len > max_body_bytes:
+        raise InferenceServerError(f"Frame body too large: {body_len} bytes (limit {max_body_bytes})")
+    header_bytes = _recv_exact(sock, header_len)
+    body = _recv_exact(sock, body_len) if body_len else bytearray()
+    if header_bytes is None or body is None:
+        return None
+    return json.loads(header_bytes), body
+
+
+def _array_to_frame(array: np.ndarray) -> Tuple[Dict[str, Any], bytes]:
+    array = np.ascontiguousarray(array)
+    return {"dtype": array.dtype.str, "shape": list(array.shape)}, array.tobytes()
+
+
+def _array_from_frame(header: Dict[str, Any], body: bytearray) -> np.ndarray:
+    return np.frombuffer(body, dtype=np.dtype(header["dtype"])).reshape(header["shape"])
+
+
+class _InferenceRequestHandler(socketserver.BaseRequestHandler):
+    """Serves frames on one client connection until it closes"""
+
+    def handle(self):
+        while True:
+            try:
+                frame = recv_frame(self.request, self.server.max_body_bytes)
+            except (OSError, ValueError, InferenceServerError) as e:
+                logger.warning(f"[InferenceServer] Dropping connection: {e}")
+                return
+            if frame is None:
+                return
+            header, body = frame
+            try:
+                response, payload = self.server.dispatch(header, body)
+            except Exception as e:  # noqa: BLE001
+                logger.exception("[InferenceServer] Request failed")
+                response, payload = {"status": "error", "error": str(e)}, b""
+            try:
+                send_frame(self.request, response, payload)
+            except OSError:
+                return
+
+
+class _InferenceServerMixin:
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def dispatch(self, header: Dict[str, Any], body: bytearray) -> Tuple[Dict[str, Any], bytes]:
+        op = header.get("op")
+        if op == "ping":
+            return {"status": "ok", "loaded_models": list(self.model_manager.loaded_models.keys())}, b""
+
+        model_name = header.get("model")
+        if not model_name:
+            return {"status": "error", "error": "Missing model name"}, b""
+        if model_name not in self.model_manager.loaded_models:
+            # Hot-swaps only need the new model loaded here, never in the workers
+            with self.load_lock:
+                if not self.model_manager.load_model(model_name):
+                    return {"status": "error", "error": f"Failed to load model '{model_name}'"}, b""
+        if op == "load":
+            return {"status": "ok"}, b""
+        if op == "predict":
+            x = _array_from_frame(header, body)
+            output = self.model_manager._forward(self.model_manager.loaded_models[model_name], x)
+            array_header, payload = _array_to_frame(np.asarray(output, dtype=np.float32))
+            return {"status": "ok", **array_header}, payload
+        return {"status": "error", "error": f"Unknown op '{op}'"}, b""
+
+
+class _UnixInferenceServer(_InferenceServerMixin, socketserver.ThreadingUnixStreamServer):
+    pass
+
+
+class _TCPInferenceServer(_InferenceServerMixin, socketserver.ThreadingTCPServer):
+    pass
+
+
+def _check_bind_host(host: str) -> None:
+    """Refuse TCP addresses reachable from outside the host or a private network"""
+    try:
+        ip = ipaddress.ip_address(socket.gethostbyname(host))
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot resolve inference server host {host}: {e}") from e
+    if ip.is_unspecified or not (ip.is_loopback or ip.is_private):
+        raise ValueError(
+            f"Refusing to bind the unauthenticated inference server to {host} ({ip}); "
+            f"use a loopback or private network address"
+        )
+
+
+def create_server(address: str, model_manager, max_body_bytes: int = MAX_BODY_BYTES) -> socketserver.BaseServer:
+    """
+    Create a threaded inference server bound to address
+
+    Args:
+        address: "unix:///path/to.sock" or "tcp://host:port" (loopback or private address)
+        model_manager: Local-mode ModelManager that owns the models
+        max_body_bytes: Largest request body accepted
+
+    Returns:
+        socketserver.BaseServer: Server ready for serve_forever()
+
+    Raises:
+        ValueError: If a TCP address is public or unspecified (0.0.0.0)
+    """
+    family, bind_address = parse_address(address)
+    if family == socket.AF_UNIX:
+        if os.path.exists(bind_address):
+            os.unlink(bind_address)
+        server = _UnixInferenceServer(bind_address, _InferenceRequestHandler)
+    else:
+        _check_bind_host(bind_address[0])
+        server = _TCPInferenceServer(bind_address, _InferenceRequestHandler)
+    server.model_manager = model_manager
+    server.max_body_bytes = max_body_bytes
+    server.load_lock = threading.Lock()
+    return server
+
+
+class InferenceClient:
+    """
+    Thread-safe client for the inference server
+
+    Each thread keeps its own persistent connection; a broken connection is
+    re-established once before the request fails.
+    """
+
+    def __init__(self, address: str, timeout: float = 5.0):
+        self.address = address
+        self.timeout = timeout
+        self.family, self.connect_address = parse_address(address)
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        if self.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.connect(self.connect_address)
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _request(self, header: Dict[str, Any], body: bytes = b"") -> Tuple[Dict[str, Any], bytearray]:
+        for attempt in range(2):
+            try:
+                sock = getattr(self._local, "sock", None)
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                send_frame(sock, header, body)
+                frame = recv_frame(sock)
+                if frame is None:
+                    raise ConnectionError("Inference server closed the connection")
+                break
+            except OSError as e:
+                self._close()
+                if attempt:
+                    raise InferenceServerError(f"Inference server {self.address} unavailable: {e}") from e
+        response, payload = frame
+        if response.get("status") != "ok":
+            raise InferenceServerError(response.get("error", "Unknown inference server error"))
+        return response, payload
+
+    def ping(self) -> Dict[str, Any]:
+        return self._request({"op": "ping"})[0]
+
+    def load(self, model_name: str) -> None:
+        self._request({"op": "load", "model": model_name})
+
+    def predict(self, model_name: str, x: np.ndarray) -> np.ndarray:
+        """
+        Run a forward pass on the server
+
+        Args:
+            model_name: Model to run
+            x: Prepared input array of shape (n, *input_shape)
+
+        Returns:
+            np.ndarray: Model output for the n input rows
+        """
+        array_header, body = _array_to_frame(x)
+        response, payload = self._request({"op": "predict", "model": model_name, **array_header}, body)
+        return _array_from_frame(response, payload)
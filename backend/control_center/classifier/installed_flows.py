@@ -0,0 +1,191 @@
+"""
+Installed-flow cache shared by the ONOS and ODL flow programming paths
+
+Sniffers reclassify a client port whenever their own flow table forgets it, which
+used to re-send rules that are still installed on the switch. Every rule that a
+controller accepted is remembered in Redis under its identity (rule_key: switch,
+selector/match, treatment/instructions, priority and timeout, but not the
+per-request ODL flow ID), with the result the controller returned. An identical
+push is answered from the cache instead of calling the controller again.
+
+An entry lives for the rule's timeout minus INSTALLED_FLOW_CACHE_MARGIN seconds. A
+switch removes a rule no earlier than its timeout after installation, so a cached
+rule is still installed. Rules without a timeout (or shorter than the margin) are
+not cached.
+
+Hits and misses are counted per controller type in installed_flows:stats and
+served by GET /api/v1/classification-stats/installed-flows/.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import redis
+from django.conf import settings
+
+from .state_manager import state_manager
+
+logger = logging.getLogger(__name__)
+
+INSTALLED_FLOW_CACHE_ENABLED = getattr(settings, 'INSTALLED_FLOW_CACHE_ENABLED', True)
+INSTALLED_FLOW_CACHE_MARGIN = getattr(settings, 'INSTALLED_FLOW_CACHE_MARGIN', 30)
+
+KEY_PREFIX = 'installed_flows:'
+STATS_KEY = f'{KEY_PREFIX}stats'
+
+
+def rule_key(flow: dict) -> str:
+    """
+    Identity of a flow rule
+
+    Args:
+        flow: ONOS flow dict (an entry of the POST /onos/v1/flows "flows" array) or
+            ODL flow request ({"node_id", "table_id", "flow_id", "payload"})
+
+    Returns:
+        str: Canonical JSON; ODL flow IDs and names are unique per request, so they are ignored
+    """
+    if 'payload' in flow:
+        entry = dict(flow['payload']['flow-node-inventory:flow'][0])
+        entry.pop('id', None)
+        entry.pop('flow-name', None)
+        return json.dumps([flow['node_id'], flow['table_id'], entry], sort_keys=True)
+    return json.dumps(flow, sort_keys=True)
+
+
+def flow_timeout(flow: dict) -> int:
+    """Timeout of a rule in seconds; 0 for permanent rules"""
+    if 'payload' in flow:
+        entry = flow['payload']['flow-node-inventory:flow'][0]
+        return int(entry.get('hard-timeout') or entry.get('idle-timeout') or 0)
+    if str(flow.get('isPermanent', 'false')).lower() == 'true':
+        return 0
+    return int(flow.get('timeout') or 0)
+
+
+class InstalledFlowCache:
+    """
+    Redis cache of rules a controller has accepted
+
+    Args:
+        redis_client: Client with decode_responses=True
+        enabled: Whether lookups can hit; disabled caches count every flow as a miss
+        margin_seconds: Subtracted from a rule's timeout to get the entry's TTL
+    """
+
+    def __init__(self, redis_client, enabled: bool = True, margin_seconds: int = 30):
+        self.redis_client = redis_client
+        self.enabled = enabled
+        self.margin_seconds = margin_seconds
+
+    def _key(self, controller_type: str, controller_ip: str, flow: dict) -> str:
+        digest = hashlib.sha1(rule_key(flow).encode('utf-8')).hexdigest()
+        return f"{KEY_PREFIX}{controller_type}:{controller_ip}:{digest}"
+
+    def lookup(self, controller_type: str, controller_ip: str, flows: Sequence[dict]) -> List[Optional[dict]]:
+        """
+        Cached results of flows, aligned with ``flows`` (None for a miss)
+
+        Counts the hits and misses. A Redis failure is treated as all misses.
+        """
+        if not flows:
+            return []
+        cached: List[Optional[dict]] = [None] * len(flows)
+        if self.enabled:
+            try:
+                raw = self.redis_client.mget([self._key(controller_type, controller_ip, flow) for flow in flows])
+                cached = [json.loads(value) if value else None for value in raw]
+            except redis.RedisError as e:
+                logger.warning(f"Installed-flow lookup failed, sending all {len(flows)} flows: {e}")
+        hits = sum(1 for value in cached if value is not None)
+        self._count(controller_type, hits, len(flows) - hits)
+        return cached
+
+    def store(self, controller_type: str, controller_ip: str, flows: Sequence[dict], results: Sequence[dict]):
+        """
+        Remember flows the controller accepted
+
+        Args:
+            controller_type: "onos" or "odl"
+            controller_ip: Controller address
+            flows: Flow dicts as given to lookup()
+            results: JSON-serialisable result per flow, returned on later hits
+        """
+        if not self.enabled:
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            stored = 0
+            for flow, result in zip(flows, results):
+                ttl = flow_timeout(flow) - self.margin_seconds
+                if ttl > 0:
+                    pipe.set(self._key(controller_type, controller_ip, flow), json.dumps(result), ex=ttl)
+                    stored += 1
+            if stored:
+                pipe.hincrby(STATS_KEY, f'{controller_type}_stored', stored)
+                pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to record {len(flows)} installed flows: {e}")
+
+    def _count(self, controller_type: str, hits: int, misses: int):
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            if hits:
+                pipe.hincrby(STATS_KEY, f'{controller_type}_hits', hits)
+            if misses:
+                pipe.hincrby(STATS_KEY, f'{controller_type}_misses', misses)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.debug(f"Failed to count installed-flow lookups: {e}")
+
+    def get_stats(self) -> Dict[str, dict]:
+        """
+        Hit rates per controller type
+
+        Returns:
+            dict of controller type -> {"hits", "misses", "stored", "hit_rate"}
+        """
+        raw = self.redis_client.hgetall(STATS_KEY)
+        stats = {}
+        for controller_type in ('onos', 'odl'):
+            hits = int(raw.get(f'{controller_type}_hits', 0))
+            misses = int(raw.get(f'{controller_type}_misses', 0))
+            stats[controller_type] = {
+                'hits': hits,
+                'misses': misses,
+                'stored': int(raw.get(f'{controller_type}_stored', 0)),
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        return stats
+
+    def reset_stats(self):
+        self.redis_client.delete(STATS_KEY)
+
+    def clear(self) -> int:
+        """
+        Forget every installed flow so the next push reaches the controller
+
+        Use after a controller restart or a manual flow-table flush.
+
+        Returns:
+            int: Number of entries removed
+        """
+        removed = 0
+        keys = []
+        for key in self.redis_client.scan_iter(match=f"{KEY_PREFIX}*:*:*", count=1000):
+            keys.append(key)
+            if len(keys) >= 1000:
+                removed += self.redis_client.delete(*keys)
+                keys = []
+        if keys:
+            removed += self.redis_client.delete(*keys)
+        return removed
+
+
+installed_flow_cache = InstalledFlowCache(
+    state_manager.redis_client,
+    enabled=INSTALLED_FLOW_CACHE_ENABLED,
+    margin_seconds=INSTALLED_FLOW_CACHE_MARGIN,
+)
@@ -0,0 +1,373 @@
+"""
+Unified IP reputation snapshot
+
+A single read-only file answers the three IP fallback questions used by the
+classifier (known DNS server? VPN range? which ASN?) for IPv4 addresses:
+
+    dns          sorted uint32 DNS server IPs
+    vpn_starts   merged, non-overlapping VPN ranges (uint32 start/end)
+    vpn_ends
+    asn_starts   ASN ranges sorted by end IP (uint32 start/end)
+    asn_ends
+    asn_numbers  ASN per range
+    asn_org_ids  index into the organisation table per range
+    org_offsets  organisation table: UTF-8 blob + offsets
+    org_blob
+
+The file is built from the Redis sets/ZSET by load_dns_servers, load_vpn_networks
+and populate_redis_asn, written to a temp file and renamed into place. Workers
+memory-map it, so every process on the host shares the same pages, and notice a
+new snapshot by its inode/mtime at most every IP_REPUTATION_REFRESH_SECONDS.
+
+File layout: magic (8 bytes) | header length (uint32 LE) | JSON header | padding |
+64-byte aligned arrays at the offsets listed in the header.
+"""
+
+import ipaddress
+import json
+import logging
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b'IPREP001'
+SNAPSHOT_ALIGN = 64
+SNAPSHOT_PATH = getattr(
+    settings, 'IP_REPUTATION_SNAPSHOT_PATH',
+    os.path.join(str(settings.BASE_DIR), 'data', 'ip_reputation.snapshot')
+)
+SNAPSHOT_ENABLED = getattr(settings, 'IP_REPUTATION_SNAPSHOT_ENABLED', True)
+SNAPSHOT_REFRESH_SECONDS = getattr(settings, 'IP_REPUTATION_REFRESH_SECONDS', 30.0)
+
+# Result of one snapshot lookup; asn_info is {'asn', 'organization'} or None
+IPReputation = namedtuple('IPReputation', ['is_dns', 'is_vpn', 'asn_info'])
+
+
+def ipv4_to_int(ip_string: str) -> Optional[int]:
+    """Convert an IPv4 string to an int, None for invalid or IPv6 addresses"""
+    try:
+        ip_addr = ipaddress.ip_address(ip_string)
+    except ValueError:
+        return None
+    return int(ip_addr) if ip_addr.version == 4 else None
+
+
+def cidrs_to_ranges(cidrs: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert IPv4 CIDR strings into (start, end) uint32 arrays, skipping invalid entries
+
+    Plain "a.b.c.d/len" entries are parsed with inet_pton and masked in NumPy;
+    anything else (netmask notation, bad input) goes through ipaddress.
+
+    Returns:
+        Tuple of unsorted start and end arrays
+    """
+    addresses, prefix_lengths = [], []
+    for cidr in cidrs:
+        address, slash, prefix = cidr.partition('/')
+        try:
+            if slash and not (prefix.isdigit() and int(prefix) <= 32):
+                raise ValueError(cidr)
+            prefix_length = int(prefix) if slash else 32
+            address_int = int.from_bytes(socket.inet_pton(socket.AF_INET, address), 'big')
+        except (OSError, ValueError):
+            try:
+                network = ipaddress.IPv4Network(cidr, strict=False)
+            except (ValueError, ipaddress.AddressValueError):
+                logger.warning(f"Invalid CIDR range: {cidr}")
+                continue
+            address_int, prefix_length = int(network.network_address), network.prefixlen
+        addresses.append(address_int)
+        prefix_lengths.append(prefix_length)
+
+    addresses = np.asarray(addresses, dtype=np.int64)
+    host_masks = (np.int64(1) << (32 - np.asarray(prefix_lengths, dtype=np.int64))) - 1
+    starts = addresses & ~host_masks
+    return starts.astype(np.uint32), (starts | host_masks).astype(np.uint32)
+
+
+def merge_ranges(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Merge overlapping or adjacent inclusive ranges
+
+    Args:
+        starts: Range start addresses
+        ends: Range end addresses (inclusive)
+
+    Returns:
+        Tuple of sorted, non-overlapping uint32 start and end arrays
+    """
+    if len(starts) == 0:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint32)
+    order = np.argsort(starts, kind='stable')
+    starts = np.asarray(starts, dtype=np.int64)[order]
+    ends = np.asarray(ends, dtype=np.int64)[order]
+    running_end = np.maximum.accumulate(ends)
+    # A new merged range begins where a start is beyond everything seen so far (+1 merges adjacency)
+    new_group = np.empty(len(starts), dtype=bool)
+    new_group[0] = True
+    new_group[1:] = starts[1:] > running_end[:-1] + 1
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], len(starts)) - 1
+    return starts[group_starts].astype(np.uint32), running_end[group_ends].astype(np.uint32)
+
+
+def ranges_contain(starts: np.ndarray, ends: np.ndarray, ip_ints: np.ndarray) -> np.ndarray:
+    """
+    Vectorised membership test against merged, sorted ranges
+
+    Returns:
+        Boolean array, True where the IP falls inside a range
+    """
+    ip_ints = np.asarray(ip_ints, dtype=np.uint32)
+    if len(starts) == 0:
+        return np.zeros(len(ip_ints), dtype=bool)
+    # Rightmost range starting at or before the IP
+    idx = np.searchsorted(starts, ip_ints, side='right') - 1
+    safe_idx = np.maximum(idx, 0)
+    return (idx >= 0) & (ip_ints <= ends[safe_idx])
+
+
+class IPReputationSnapshot:
+    """Read-only, memory-mapped view of a snapshot file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not an IP reputation snapshot")
+        (header_len,) = struct.unpack_from('<I', self._mmap, len(SNAPSHOT_MAGIC))
+        header_start = len(SNAPSHOT_MAGIC) + 4
+        self.header = json.loads(self._mmap[header_start:header_start + header_len])
+        self.version = self.header.get('version')
+        arrays = {
+            name: np.frombuffer(self._mmap, dtype=np.dtype(meta['dtype']), count=meta['count'], offset=meta['offset'])
+            for name, meta in self.header['arrays'].items()
+        }
+        self.dns = arrays['dns']
+        self.vpn_starts, self.vpn_ends = arrays['vpn_starts'], arrays['vpn_ends']
+        self.asn_starts, self.asn_ends = arrays['asn_starts'], arrays['asn_ends']
+        self.asn_numbers, self.asn_org_ids = arrays['asn_numbers'], arrays['asn_org_ids']
+        self._org_offsets, self._org_blob = arrays['org_offsets'], arrays['org_blob']
+        self._org_cache: Dict[int, str] = {}
+
+    def organization(self, org_id: int) -> str:
+        name = self._org_cache.get(org_id)
+        if name is None:
+            start, end = int(self._org_offsets[org_id]), int(self._org_offsets[org_id + 1])
+            name = self._org_cache[org_id] = self._org_blob[start:end].tobytes().decode('utf-8')
+        return name
+
+    def lookup_ints(self, ip_ints: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Answer all three questions for a uint32 array of IPv4 addresses
+
+        Returns:
+            Tuple of (is_dns bool array, is_vpn bool array, ASN row index array with -1 for none)
+        """
+        ip_ints = np.asarray(ip_ints, dtype=np.uint32)
+        if len(self.dns):
+            dns_idx = np.minimum(np.searchsorted(self.dns, ip_ints), len(self.dns) - 1)
+            is_dns = self.dns[dns_idx] == ip_ints
+        else:
+            is_dns = np.zeros(len(ip_ints), dtype=bool)
+        is_vpn = ranges_contain(self.vpn_starts, self.vpn_ends, ip_ints)
+        if len(self.asn_ends):
+            # First ASN range whose end >= IP, as in the ZRANGEBYSCORE lookup
+            asn_idx = np.searchsorted(self.asn_ends, ip_ints, side='left')
+            in_bounds = asn_idx < len(self.asn_ends)
+            safe_idx = np.where(in_bounds, asn_idx, 0)
+            asn_rows = np.where(in_bounds & (self.asn_starts[safe_idx] <= ip_ints), safe_idx, -1)
+        else:
+            asn_rows = np.full(len(ip_ints), -1, dtype=np.int64)
+        return is_dns, is_vpn, asn_rows
+
+    def lookup_many(self, ip_strings: Sequence[str]) -> List[Optional[IPReputation]]:
+        """
+        Look up a batch of IPs in one vectorised pass
+
+        Returns:
+            IPReputation per IP, or None for addresses the snapshot cannot answer (IPv6/invalid)
+        """
+        ip_ints = [ipv4_to_int(ip) for ip in ip_strings]
+        valid = [i for i, ip_int in enumerate(ip_ints) if ip_int is not None]
+        results: List[Optional[IPReputation]] = [None] * len(ip_ints)
+        if not valid:
+            return results
+        is_dns, is_vpn, asn_rows = self.lookup_ints(
+            np.fromiter((ip_ints[i] for i in valid), dtype=np.uint32, count=len(valid))
+        )
+        for j, i in enumerate(valid):
+            row = int(asn_rows[j])
+            asn_info = None
+            if row >= 0:
+                asn_info = {
+                    'asn': int(self.asn_numbers[row]),
+                    'organization': self.organization(int(self.asn_org_ids[row]))
+                }
+            results[i] = IPReputation(bool(is_dns[j]), bool(is_vpn[j]), asn_info)
+        return results
+
+    def lookup(self, ip_string: str) -> Optional[IPReputation]:
+        return self.lookup_many([ip_string])[0]
+
+
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], version: int) -> None:
+    """Write arrays to path atomically (temp file + rename)"""
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'count': int(array.size), 'offset': offset}
+        offset += -(-array.nbytes // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+    def encode_header(data_start: int) -> bytes:
+        shifted = {name: {**meta, 'offset': meta['offset'] + data_start} for name, meta in layout.items()}
+        return json.dumps({'version': version, 'created': time.time(), 'arrays': shifted}).encode('utf-8')
+
+    # The header length depends on the offsets it contains; iterate until stable
+    data_start = 0
+    while True:
+        header = encode_header(data_start)
+        needed = -(-(len(SNAPSHOT_MAGIC) + 4 + len(header)) // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+        if needed == data_start:
+            break
+        data_start = needed
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack('<I', len(header)) + header)
+        f.write(b'\0' * (data_start - f.tell()))
+        for name, array in arrays.items():
+            f.write(np.ascontiguousarray(array).tobytes())
+            f.write(b'\0' * (-array.nbytes % SNAPSHOT_ALIGN))
+    os.replace(tmp_path, path)
+
+
+def build_snapshot(redis_conn, path: Optional[str] = None) -> Dict[str, int]:
+    """
+    Build the snapshot from the DNS set, VPN set and ASN ZSET in Redis
+
+    Args:
+        redis_conn: Redis client with decode_responses=True
+        path: Output file (defaults to IP_REPUTATION_SNAPSHOT_PATH)
+
+    Returns:
+        Dict with the snapshot version and entry counts
+    """
+    from utils.ip_lookup_service import ASNIndex
+    from .dns_loader import REDIS_DNS_KEY
+    from .vpn_loader import REDIS_VPN_KEY
+
+    dns_ints = {ip_int for ip_int in (ipv4_to_int(ip) for ip in redis_conn.smembers(REDIS_DNS_KEY)) if ip_int is not None}
+    dns = np.sort(np.fromiter(dns_ints, dtype=np.uint32, count=len(dns_ints)))
+
+    vpn_starts, vpn_ends = merge_ranges(*cidrs_to_ranges(redis_conn.smembers(REDIS_VPN_KEY)))
+
+    asn_index = ASNIndex.from_redis(redis_conn)
+    encoded = [org.encode('utf-8') for org in asn_index.organizations]
+    org_offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    if encoded:
+        org_offsets[1:] = np.cumsum([len(org) for org in encoded])
+    org_blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    version = int(redis_conn.incr('ip_reputation:version'))
+    write_snapshot(path or SNAPSHOT_PATH, {
+        'dns': dns,
+        'vpn_starts': vpn_starts,
+        'vpn_ends': vpn_ends,
+        'asn_starts': asn_index.starts,
+        'asn_ends': asn_index.ends,
+        'asn_numbers': asn_index.asns,
+        'asn_org_ids': asn_index.org_ids,
+        'org_offsets': org_offsets,
+        'org_blob': org_blob,
+    }, version)
+    return {
+        'version': version,
+        'dns': len(dns),
+        'vpn_ranges': len(vpn_starts),
+        'asn_ranges': len(asn_index),
+    }
+
+
+def rebuild_snapshot(redis_conn, stdout, style) -> Optional[Dict[str, int]]:
+    """
+    build_snapshot for management commands: reports the result instead of raising
+
+    Called by the commands that load the DNS set, VPN set or ASN ZSET.
+
+    Args:
+        redis_conn: Redis client with decode_responses=True
+        stdout: The command's output wrapper
+        style: The command's style (SUCCESS and WARNING are used)
+
+    Returns:
+        Dict from build_snapshot, or None if the snapshot could not be written
+    """
+    try:
+        snapshot_info = build_snapshot(redis_conn)
+    except Exception as e:
+        stdout.write(style.WARNING(f'Could not write IP reputation snapshot: {e}'))
+        return None
+    stdout.write(style.SUCCESS(
+        f"IP reputation snapshot v{snapshot_info['version']} written: "
+        f"{snapshot_info['dns']:,} DNS, {snapshot_info['vpn_ranges']:,} VPN ranges, "
+        f"{snapshot_info['asn_ranges']:,} ASN ranges"
+    ))
+    return snapshot_info
+
+
+_snapshot: Optional[IPReputationSnapshot] = None
+_snapshot_checked_at = float("-inf")
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> Optional[IPReputationSnapshot]:
+    """
+    Return the mapped snapshot for this process, remapping when the file was replaced
+
+    Returns:
+        IPReputationSnapshot or None when disabled or no snapshot file exists
+    """
+    global _snapshot, _snapshot_checked_at
+    if not SNAPSHOT_ENABLED:
+        return None
+    now = time.monotonic()
+    if now - _snapshot_checked_at < SNAPSHOT_REFRESH_SECONDS:
+        return _snapshot
+
+    with _snapshot_lock:
+        if now - _snapshot_checked_at < SNAPSHOT_REFRESH_SECONDS:
+            return _snapshot
+        _snapshot_checked_at = now
+        try:
+            stat = os.stat(SNAPSHOT_PATH)
+        except FileNotFoundError:
+            _snapshot = None
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if _snapshot is None or _snapshot.identity != identity:
+            try:
+                from .asn_matcher import clear_match_cache
+
+                _snapshot = IPReputationSnapshot(SNAPSHOT_PATH)
+                # The snapshot carries the ASN data; memoised matches may be stale
+                clear_match_cache()
+                logger.info(f"Mapped IP reputation snapshot version {_snapshot.version} from {SNAPSHOT_PATH}")
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Could not map IP reputation snapshot {SNAPSHOT_PATH}: {e}")
+        return _snapshot
@@ -0,0 +1,129 @@
+"""
+Mergeable log-linear latency histogram
+
+Values are recorded in integer microseconds into HDR-style buckets: every power of
+two is split into 2**SUB_BUCKET_BITS linear sub-buckets, so a bucket is at most
+1/32 (~3%) wide relative to its value, from 1 us up to hours, in under a thousand
+buckets. A histogram is just {bucket index: count} plus the exact sum, so histograms
+from different processes or periods merge by adding counts. In Redis it lives in a
+hash of bucket counters (HINCRBY per bucket); on ClassificationStats it is stored
+as JSON via to_dict()/from_dict().
+"""
+
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+HISTOGRAM_FORMAT_VERSION = 1
+
+# Hash field holding the exact sum of recorded values (in ms); all other fields are bucket indices
+SUM_FIELD = 'sum_ms'
+
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket_index(value_us: int) -> int:
+    """Bucket index for a value in microseconds"""
+    if value_us < SUB_BUCKETS:
+        return max(0, value_us)
+    shift = value_us.bit_length() - SUB_BUCKET_BITS - 1
+    return ((shift + 1) << SUB_BUCKET_BITS) + (value_us >> shift) - SUB_BUCKETS
+
+
+def bucket_bounds(index: int) -> tuple:
+    """Inclusive (lowest, highest) microsecond values that fall into a bucket"""
+    if index < SUB_BUCKETS:
+        return index, index
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    mantissa = (index & (SUB_BUCKETS - 1)) + SUB_BUCKETS
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+def percentile_key(percentile: float) -> str:
+    """Response key for a percentile: 50 -> 'p50', 99.9 -> 'p999'"""
+    return 'p' + f'{percentile:g}'.replace('.', '')
+
+
+class LatencyHistogram:
+    """Log-linear histogram of latencies in milliseconds"""
+
+    def __init__(self, counts: Optional[Mapping[int, int]] = None, sum_ms: float = 0.0):
+        self.counts: Dict[int, int] = {int(k): int(v) for k, v in (counts or {}).items() if int(v)}
+        self.sum_ms = float(sum_ms)
+
+    def record(self, value_ms: float, count: int = 1):
+        """Record a latency in milliseconds"""
+        index = bucket_index(int(value_ms * 1000))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.sum_ms += value_ms * count
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Add another histogram's counts into this one (returns self)"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.sum_ms += other.sum_ms
+        return self
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def mean(self) -> float:
+        total = self.total
+        return self.sum_ms / total if total else 0.0
+
+    def __bool__(self) -> bool:
+        return bool(self.counts)
+
+    def percentile(self, percentile: float) -> float:
+        """
+        Value at a percentile, in milliseconds
+
+        Returns the midpoint of the bucket holding the requested rank, so the error
+        is bounded by half a bucket (~1.5%). 0.0 for an empty histogram.
+        """
+        total = self.total
+        if not total:
+            return 0.0
+        rank = max(1, -(-total * percentile // 100))  # ceil without float drift at 100%
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                low, high = bucket_bounds(index)
+                return (low + high) / 2 / 1000
+        low, high = bucket_bounds(max(self.counts))
+        return (low + high) / 2 / 1000
+
+    def percentiles(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        """Percentiles keyed 'p50', 'p90', 'p99', 'p999' (milliseconds)"""
+        return {percentile_key(p): self.percentile(p) for p in percentiles}
+
+    def to_redis_fields(self) -> Dict[str, Any]:
+        """Hash fields for HINCRBY (buckets) and HINCRBYFLOAT (sum)"""
+        return {str(index): count for index, count in self.counts.items()}
+
+    @classmethod
+    def from_redis_hash(cls, data: Optional[Mapping[str, Any]]) -> 'LatencyHistogram':
+        """Build from an HGETALL result (string field names and values)"""
+        data = data or {}
+        counts = {int(field): int(value) for field, value in data.items() if field != SUM_FIELD}
+        return cls(counts, float(data.get(SUM_FIELD) or 0.0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serialisable form stored on ClassificationStats"""
+        return {
+            'version': HISTOGRAM_FORMAT_VERSION,
+            'sub_bucket_bits': SUB_BUCKET_BITS,
+            'unit': 'us',
+            'sum_ms': self.sum_ms,
+            'counts': {str(index): count for index, count in sorted(self.counts.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Optional[Mapping[str, Any]]) -> 'LatencyHistogram':
+        """Inverse of to_dict(); empty or missing data gives an empty histogram"""
+        if not data:
+            return cls()
+        return cls(data.get('counts') or {}, data.get('sum_ms') or 0.0)
@@ -0,0 +1,72 @@
+import os
+import time
+
+import numpy as np
+
+from django.core.management.base import BaseCommand
+
+from classifier.compiled_model import CompiledModel, UnsupportedModelError, verify_against_keras
+from classifier.models import ModelConfiguration
+
+
+class Command(BaseCommand):
+    help = 'Check that the NumPy inference backend matches Keras for the configured models'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            type=str,
+            help='Only check this model (default: all keras_h5 models)'
+        )
+        parser.add_argument(
+            '--samples',
+            type=int,
+            default=256,
+            help='Number of random inputs to compare'
+        )
+        parser.add_argument(
+            '--atol',
+            type=float,
+            default=1e-4,
+            help='Maximum allowed absolute difference'
+        )
+
+    def handle(self, *args, **options):
+        import keras
+
+        configs = ModelConfiguration.objects.filter(model_type='keras_h5')
+        if options.get('model'):
+            configs = configs.filter(name=options['model'])
+
+        for config in configs:
+            if not os.path.exists(config.model_path):
+                self.stdout.write(self.style.WARNING(f'{config.name}: model file not found, skipping'))
+                continue
+            try:
+                compiled = CompiledModel.from_h5(config.model_path, name=config.name)
+            except UnsupportedModelError as e:
+                self.stdout.write(self.style.WARNING(f'{config.name}: not supported by the numpy backend ({e})'))
+                continue
+
+            keras_model = keras.models.load_model(config.model_path)
+            try:
+                max_diff = verify_against_keras(
+                    compiled, keras_model, config.input_shape,
+                    samples=options['samples'], atol=options['atol']
+                )
+            except UnsupportedModelError as e:
+                self.stdout.write(self.style.ERROR(f'{config.name}: {e}'))
+                continue
+
+            single = np.zeros((1, *config.input_shape), dtype=np.float32)
+            timings = {}
+            for label, model in (('keras', keras_model), ('numpy', compiled)):
+                start = time.perf_counter()
+                for _ in range(20):
+                    model.predict(single, verbose=0)
+                timings[label] = (time.perf_counter() - start) / 20 * 1000
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{config.name}: OK (max abs diff {max_diff:.2e}, '
+                f'single-flow predict keras {timings["keras"]:.2f} ms vs numpy {timings["numpy"]:.2f} ms)'
+            ))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from classifier import model_manager as model_manager_module
+from classifier.inference_server import MAX_BODY_BYTES, create_server
+from classifier.model_manager import ModelManager
+
+
+class Command(BaseCommand):
+    help = 'Run the out-of-process inference server that owns the classification models'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--address',
+            type=str,
+            default=None,
+            help='unix:///path/to.sock or tcp://host:port (default: CLASSIFIER_INFERENCE_SERVER)'
+        )
+        parser.add_argument(
+            '--preload',
+            nargs='*',
+            default=[],
+            help='Additional model names to load at startup (the active model is always loaded)'
+        )
+
+    def handle(self, *args, **options):
+        address = options.get('address') or getattr(settings, 'CLASSIFIER_INFERENCE_SERVER', '')
+        if not address:
+            self.stdout.write(self.style.ERROR(
+                'No address given. Pass --address or set CLASSIFIER_INFERENCE_SERVER.'
+            ))
+            return
+
+        # The server always holds the models itself, even though it shares the
+        # workers' .env where CLASSIFIER_INFERENCE_SERVER is set
+        manager = ModelManager(client_mode=False)
+        model_manager_module._model_manager = manager
+
+        for model_name in options.get('preload') or []:
+            if manager.load_model(model_name):
+                self.stdout.write(self.style.SUCCESS(f'Loaded model: {model_name}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Failed to load model: {model_name}'))
+
+        try:
+            server = create_server(
+                address, manager,
+                max_body_bytes=getattr(settings, 'CLASSIFIER_INFERENCE_MAX_BODY_BYTES', MAX_BODY_BYTES),
+            )
+        except ValueError as e:
+            self.stdout.write(self.style.ERROR(str(e)))
+            return
+        loaded = ', '.join(manager.loaded_models.keys()) or 'none'
+        self.stdout.write(self.style.SUCCESS(f'Inference server listening on {address} (models: {loaded})'))
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('Shutting down inference server...')
+        finally:
+            server.server_close()
+            for model_name in list(manager.loaded_models.keys()):
+                manager.unload_model(model_name)
@@ -6,6 +6,7 @@ This command displays classification statistics for models.
 
 from django.core.management.base import BaseCommand
 from classifier.models import ClassificationStats, ModelConfiguration
+from classifier.latency_histogram import LatencyHistogram
 from django.utils import timezone
 from datetime import timedelta
 from django.db.models import Sum, Avg
@@ -101,6 +102,11 @@ class Command(BaseCommand):
         self.stdout.write(f'\nTotal Classifications: {total_count:,}')
         avg_time = totals["avg_prediction_time"] or 0.0
         self.stdout.write(f'Average Prediction Time: {avg_time:.2f} ms')
+        histogram = LatencyHistogram()
+        for data in stats_query.values_list('prediction_time_histogram', flat=True):
+            histogram.merge(LatencyHistogram.from_dict(data))
+        if histogram:
+            self.stdout.write('Prediction Time Percentiles: ' + self._format_percentiles(histogram.percentiles()))
         
         self.stdout.write(f'\n📈 CONFIDENCE BREAKDOWN:')
         self.stdout.write(f'  High Confidence:      {totals["high_confidence"]:>8,}  ({(totals["high_confidence"]/total_count)*100:>5.1f}%)')
@@ -140,7 +146,13 @@ class Command(BaseCommand):
             self.stdout.write(f'    Low Confidence: {stat.low_confidence_count:,} ({stat.low_confidence_percentage:.1f}%)')
             self.stdout.write(f'    Multiple Candidates: {stat.multiple_candidates_count:,} ({stat.multiple_candidates_percentage:.1f}%)')
             self.stdout.write(f'    Avg Prediction Time: {stat.avg_prediction_time_ms:.2f} ms')
+            percentiles = stat.prediction_time_percentiles()
+            if percentiles:
+                self.stdout.write(f'    Prediction Time: {self._format_percentiles(percentiles)}')
         
         if stats.count() > 20:
             self.stdout.write(f'\n  ... and {stats.count() - 20} more periods')
-
+    
+    @staticmethod
+    def _format_percentiles(percentiles):
+        return ', '.join(f'{key} {value:.2f} ms' for key, value in percentiles.items())
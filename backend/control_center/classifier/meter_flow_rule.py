@@ -18,9 +18,15 @@
 # For inquiries, contact Keegan White at keeganwhite@taurinetech.com.
 
 
+import logging
 import requests
-from requests.auth import HTTPBasicAuth
 from utils.meter import convert_onos_meter_api_id_to_internal_id
+from onos.onos_client import get_onos_client
+from .installed_flows import installed_flow_cache, rule_key
+
+logger = logging.getLogger(__name__)
+
+ONOS_APP_ID = 'ai.classifier.ratelimiter'
 
 
 class MeterFlowRule(object):
@@ -112,51 +118,111 @@ class MeterFlowRule(object):
         elif direction == 'dst':
             return self.inbound_port_dst
 
-    def _send_flow_rule_request(self, flow_rule, url):
-        """Sends a flow rule POST request and extracts flow IDs from the JSON response."""
-        flow_ids = []
-        rsp = requests.post(url=url, json=flow_rule, auth=HTTPBasicAuth('onos', 'rocks'))
-        if rsp.ok:
-            try:
-                flow_info = rsp.json()  # e.g., {"flows": [{"deviceId": "...", "flowId": "..."}, ...]}
-                for flow in flow_info.get("flows", []):
-                    flow_id = flow.get("flowId")
-                    if flow_id is not None:
-                        flow_ids.append(flow_id)
-            except (ValueError, KeyError):
-                print("Failed to parse flow response.")
-        else:
-            print("Error Response:", rsp.text)
-        return flow_ids
-
-    def make_flow_adjustment(self):
-        app_id = 'ai.classifier.ratelimiter'
-        url = f'http://{self.controller_ip}:8181/onos/v1/flows?appId={app_id}'
+    def build_flow_rules(self):
+        """
+        Build the src and dst flow rules for this classification
 
+        Returns:
+            Tuple (flow_rule_src, flow_rule_dst) of {"flows": [...]} dicts, or None if
+            the meter ID cannot be converted
+        """
         # Convert the meter_id to a proper numeric value
         try:
             numeric_meter_id = convert_onos_meter_api_id_to_internal_id(self.meter_id)
-            print('### CONVERTED METER ID', self.meter_id, 'to', numeric_meter_id)
         except ValueError as e:
-            print(f"Meter ID conversion error: {e}")
-            return []
-
-        flow_ids = []
-        if self.protocol == 'tcp':
-            # Build flow rules for TCP: one for source criteria, one for destination criteria.
-            flow_rule_src = self._build_flow_rule('tcp', 'src', numeric_meter_id)
-            flow_rule_dst = self._build_flow_rule('tcp', 'dst', numeric_meter_id)
-            flow_ids.extend(self._send_flow_rule_request(flow_rule_src, url))
-            flow_ids.extend(self._send_flow_rule_request(flow_rule_dst, url))
-        else:
-            # Build flow rules for UDP: one for source and one for destination.
-            flow_rule_src = self._build_flow_rule('udp', 'src', numeric_meter_id)
-            flow_rule_dst = self._build_flow_rule('udp', 'dst', numeric_meter_id)
-            flow_ids.extend(self._send_flow_rule_request(flow_rule_src, url))
-            flow_ids.extend(self._send_flow_rule_request(flow_rule_dst, url))
-
-        return {
-            "flow_ids": flow_ids,
-            "flow_rule_src": flow_rule_src,
-            "flow_rule_dst": flow_rule_dst
-        }
+            logger.error(f"Meter ID conversion error: {e}")
+            return None
+        protocol = 'tcp' if self.protocol == 'tcp' else 'udp'
+        return (
+            self._build_flow_rule(protocol, 'src', numeric_meter_id),
+            self._build_flow_rule(protocol, 'dst', numeric_meter_id),
+        )
+
+    def make_flow_adjustment(self):
+        """Install the src and dst rules with one POST to the controller"""
+        result = apply_flow_rules([self])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def apply_flow_rules(flow_rules):
+    """
+    Install the rules of several classifications, one POST per controller
+
+    Args:
+        flow_rules: MeterFlowRule instances
+
+    Returns:
+        List aligned with ``flow_rules``: {"flow_ids", "flow_rule_src", "flow_rule_dst"}
+        dicts, [] where the meter ID was invalid, or the exception raised while
+        contacting that rule's controller
+    """
+    results = [[] for _ in flow_rules]
+    # controller IP -> [(rule index, flow_rule_src, flow_rule_dst)]
+    by_controller = {}
+    for index, flow_rule in enumerate(flow_rules):
+        built = flow_rule.build_flow_rules()
+        if built is not None:
+            by_controller.setdefault(flow_rule.controller_ip, []).append((index, *built))
+
+    for controller_ip, entries in by_controller.items():
+        flows = []
+        for _, flow_rule_src, flow_rule_dst in entries:
+            flows.extend(flow_rule_src["flows"])
+            flows.extend(flow_rule_dst["flows"])
+        try:
+            flow_ids = post_flows_once(controller_ip, flows)
+        except requests.RequestException as e:
+            logger.error(f"Error programming {len(flows)} flows on ONOS {controller_ip}: {e}")
+            for index, *_ in entries:
+                results[index] = e
+            continue
+        position = 0
+        for index, flow_rule_src, flow_rule_dst in entries:
+            count = len(flow_rule_src["flows"]) + len(flow_rule_dst["flows"])
+            results[index] = {
+                "flow_ids": [flow_id for flow_id in flow_ids[position:position + count] if flow_id is not None],
+                "flow_rule_src": flow_rule_src,
+                "flow_rule_dst": flow_rule_dst
+            }
+            position += count
+    return results
+
+
+def post_flows_once(controller_ip, flows):
+    """
+    Install ONOS flows, skipping rules that are already installed
+
+    Identical flows are sent once, and flows found in the installed-flow cache are not
+    sent at all.
+
+    Args:
+        controller_ip: Controller address
+        flows: Flow rule dicts (entries of the POST /onos/v1/flows "flows" array)
+
+    Returns:
+        Flow IDs aligned with ``flows`` (None where ONOS returned no ID)
+
+    Raises:
+        requests.RequestException: If the controller cannot be reached
+    """
+    cached = installed_flow_cache.lookup('onos', controller_ip, flows)
+    flow_ids = [entry.get('flow_id') if entry else None for entry in cached]
+    # rule key -> positions in flows, for the flows that have to be sent
+    pending = {}
+    for position, (flow, entry) in enumerate(zip(flows, cached)):
+        if entry is None:
+            pending.setdefault(rule_key(flow), []).append(position)
+    if not pending:
+        return flow_ids
+    sent = [flows[positions[0]] for positions in pending.values()]
+    sent_ids = get_onos_client(controller_ip).post_flows(sent, app_id=ONOS_APP_ID)
+    for positions, flow_id in zip(pending.values(), sent_ids):
+        for position in positions:
+            flow_ids[position] = flow_id
+    accepted = [(flow, flow_id) for flow, flow_id in zip(sent, sent_ids) if flow_id is not None]
+    installed_flow_cache.store(
+        'onos', controller_ip, [flow for flow, _ in accepted], [{'flow_id': flow_id} for _, flow_id in accepted]
+    )
+    return flow_ids
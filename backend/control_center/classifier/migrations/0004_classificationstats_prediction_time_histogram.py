@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifier', '0003_classificationstats_vpn_detections'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classificationstats',
+            name='prediction_time_histogram',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
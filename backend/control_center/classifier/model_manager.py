@@ -5,6 +5,7 @@ This module provides a high-performance, database-driven system for managing
 multiple classification models with Redis-based state management for instant changes.
 """
 
+import asyncio
 import os
 import json
 import logging
@@ -12,16 +13,25 @@ from typing import Dict, List, Optional, Tuple, Any
 from django.conf import settings
 from django.utils import timezone
 from django.db import close_old_connections
+from asgiref.sync import sync_to_async
 from datetime import timedelta
-import keras
+from concurrent.futures import Future
+import queue
 import threading
+import time
 import numpy as np
 import redis
 
 from .models import ModelConfiguration, ModelState, ClassificationStats
 from .state_manager import state_manager
-from utils.ip_lookup_service import get_asn_from_ip
+from utils.ip_lookup_service import get_asn_from_ip, lookup_many
 from .vpn_loader import VPNNetworkLoader, REDIS_VPN_KEY
+from .inference_server import InferenceClient, InferenceServerError
+from .asn_matcher import clear_match_cache, get_matcher, match_asn
+from .ip_reputation import get_snapshot, IPReputation
+from .compiled_model import CompiledModel, UnsupportedModelError, verify_against_keras
+from .latency_histogram import LatencyHistogram
+from .stage_timing import span
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +39,8 @@ logger = logging.getLogger(__name__)
 REDIS_DNS_KEY = "dns_servers:ip_set"
 # VPN Redis key - same as in vpn_loader.py
 REDIS_VPN_KEY = "vpn_networks:cidr_set"
+# Critical DNS servers that are always recognised, even without Redis
+FALLBACK_DNS_SERVERS = frozenset({'8.8.8.8', '8.8.4.4', '1.1.1.1', '1.0.0.1'})
 
 def _run_in_thread(func):
         """Run a callable in a dedicated thread and return its result, raising exceptions.
@@ -53,18 +65,171 @@ def _run_in_thread(func):
             raise result_holder['exc']
         return result_holder['res']
 
+
+class InferenceBatcher:
+    """
+    Dynamic micro-batching scheduler for a single loaded model.
+
+    Prediction requests submitted concurrently from request threads are queued and
+    gathered by one worker thread into a single input tensor. The batch is closed
+    once it holds ``max_batch_size`` rows or ``max_wait_ms`` has elapsed since the
+    first request arrived, then run through one ``model.predict`` call. Each caller
+    receives only the rows that belong to its own request.
+
+    The worker thread is the only thread that touches the model, so Keras never
+    sees concurrent ``predict`` calls. A request is either queued before ``stop()``
+    (and then served or failed by the worker) or rejected, never left unresolved.
+    """
+
+    def __init__(self, model, max_batch_size: int = 64, max_wait_ms: float = 2.0, name: str = "model"):
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Future]]]" = queue.Queue()
+        self._stopped = threading.Event()
+        # Makes the stopped check and the put in submit() atomic with stop()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(
+            target=self._run,
+            name=f"inference-batcher:{name}",
+            daemon=True
+        )
+        self._worker.start()
+
+    def predict(self, x: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Queue ``x`` for the next forward pass and block until its predictions are ready
+
+        Args:
+            x: Input array of shape (n, *input_shape); n rows are returned
+            timeout: Optional number of seconds to wait for the result
+
+        Returns:
+            np.ndarray: Model output rows for this request only
+        """
+        return self.submit(x).result(timeout=timeout)
+    
+    def submit(self, x: np.ndarray) -> Future:
+        """
+        Queue ``x`` for the next forward pass without waiting
+        
+        Returns:
+            Future resolving to the model output rows for this request (async callers
+            await it with asyncio.wrap_future)
+        """
+        future: Future = Future()
+        with self._lock:
+            if self._stopped.is_set():
+                raise RuntimeError(f"Inference batcher for '{self.name}' has been stopped")
+            self._queue.put((x, future))
+        return future
+
+    def stop(self):
+        """Stop the worker thread; queued requests still pending receive an error"""
+        with self._lock:
+            self._stopped.set()
+            self._queue.put(None)
+
+    def _collect_batch(self) -> List[Tuple[np.ndarray, Future]]:
+        """Block for the first request, then gather more until the batch is full or the wait expires"""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        rows = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Stop requested: serve what has been collected, then exit the loop
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _dispatch(self, batch: List[Tuple[np.ndarray, Future]]):
+        """Run one forward pass over the whole batch and hand each caller its slice"""
+        # Skip requests cancelled while queued (e.g. an async caller that timed out);
+        # the rest can no longer be cancelled, so setting their result cannot fail
+        batch = [(x, future) for x, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        inputs = [x for x, _ in batch]
+        try:
+            stacked = inputs[0] if len(inputs) == 1 else np.concatenate(inputs, axis=0)
+            predictions = self.model.predict(stacked, verbose=0, batch_size=len(stacked))
+        except Exception as e:  # noqa: BLE001
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for x, future in batch:
+            n = len(x)
+            future.set_result(predictions[offset:offset + n])
+            offset += n
+
+        if len(batch) > 1:
+            logger.debug(f"[InferenceBatcher:{self.name}] Served {len(batch)} requests ({offset} rows) in one forward pass")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                batch = self._collect_batch()
+                if batch:
+                    self._dispatch(batch)
+            except Exception:
+                logger.exception(f"[InferenceBatcher:{self.name}] Unexpected error in batching loop")
+
+        # Fail anything still queued at stop() so callers do not hang; submit() cannot
+        # add more once _stopped is set
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError(f"Inference batcher for '{self.name}' has been stopped"))
+
+
 class ModelManager:
     """
     Production-grade model manager with database persistence and Redis caching.
     """
     
-    def __init__(self):
+    def __init__(self, client_mode: Optional[bool] = None):
+        """
+        Args:
+            client_mode: Forward predictions to the inference server instead of loading
+                models in this process. Defaults to True when CLASSIFIER_INFERENCE_SERVER is set.
+        """
         self.loaded_models: Dict[str, Any] = {}
+        inference_server = getattr(settings, 'CLASSIFIER_INFERENCE_SERVER', '')
+        if client_mode is None:
+            client_mode = bool(inference_server)
+        self.inference_client: Optional[InferenceClient] = None
+        # Upper bound on waiting for a forward pass, remote or micro-batched
+        self.inference_timeout = getattr(settings, 'CLASSIFIER_INFERENCE_TIMEOUT', 5.0)
+        if client_mode:
+            self.inference_client = InferenceClient(inference_server, timeout=self.inference_timeout)
+        # Micro-batching of concurrent predict calls (see InferenceBatcher)
+        self.batching_enabled = getattr(settings, 'CLASSIFIER_BATCHING_ENABLED', True)
+        self.batch_max_size = getattr(settings, 'CLASSIFIER_BATCH_MAX_SIZE', 64)
+        self.batch_max_wait_ms = getattr(settings, 'CLASSIFIER_BATCH_MAX_WAIT_MS', 2.0)
+        # "numpy" runs supported models through CompiledModel instead of Keras
+        self.inference_backend = getattr(settings, 'CLASSIFIER_INFERENCE_BACKEND', 'keras')
+        self.compiled_verify = getattr(settings, 'CLASSIFIER_COMPILED_VERIFY', True)
         # Initialize Redis connection for DNS lookups (separate from state_manager)
         self._init_redis_connection()
         
-        # Classification stats are now tracked in Redis (shared across processes)
-        # No in-memory counters needed - using state_manager.increment_classification_stat()
+        # Classification stats are recorded with state_manager.record_classification(), which
+        # buffers them per process (ClassificationStatsAccumulator) and flushes them to Redis
         
         self._initialize_from_database()
 
@@ -274,27 +439,51 @@ class ModelManager:
                 logger.error(f"Model '{model_name}' not found in database")
                 return False
         
+        if self.inference_client is not None:
+            return self._register_remote_model(model_name, config_dict)
+        
         try:
             model_path = config_dict['model_path']
             if not os.path.exists(model_path):
                 logger.error(f"Model file not found: {model_path}")
                 return False
             
-            # Load model based on type
-            if config_dict['model_type'] == "keras_h5":
-                model = keras.models.load_model(model_path)
-            elif config_dict['model_type'] == "tensorflow_saved_model":
-                model = keras.models.load_model(model_path)
-            else:
-                logger.error(f"Unsupported model type: {config_dict['model_type']}")
-                return False
+            model = None
+            if self.inference_backend == 'numpy' and config_dict['model_type'] == "keras_h5":
+                model = self._load_compiled_model(model_name, config_dict)
+            
+            if model is None:
+                # Deferred so client-mode and compiled-backend workers never import TensorFlow
+                import keras
+                
+                # Load model based on type
+                if config_dict['model_type'] == "keras_h5":
+                    model = keras.models.load_model(model_path)
+                elif config_dict['model_type'] == "tensorflow_saved_model":
+                    model = keras.models.load_model(model_path)
+                else:
+                    logger.error(f"Unsupported model type: {config_dict['model_type']}")
+                    return False
+            
+            batcher = None
+            if self.batching_enabled:
+                batcher = InferenceBatcher(
+                    model,
+                    max_batch_size=self.batch_max_size,
+                    max_wait_ms=self.batch_max_wait_ms,
+                    name=model_name
+                )
             
             # Store in memory
             self.loaded_models[model_name] = {
                 'model': model,
+                'batcher': batcher,
+                'backend': 'numpy' if isinstance(model, CompiledModel) else 'keras',
                 'config': config_dict,
                 'class_names': config_dict['categories']
             }
+            # ASN matches are memoised per model name; its categories may have changed
+            clear_match_cache()
             
             # Update Redis state
             state_manager.add_loaded_model(model_name)
@@ -306,6 +495,66 @@ class ModelManager:
             logger.error(f"Error loading model '{model_name}': {e}")
             return False
     
+    def _load_compiled_model(self, model_name: str, config_dict: Dict[str, Any]) -> Optional[Any]:
+        """
+        Compile a .h5 model to the NumPy backend, optionally checking it against Keras
+        
+        Args:
+            model_name: Name of the model
+            config_dict: Model configuration
+            
+        Returns:
+            CompiledModel on success, the Keras model if verification failed
+            (it is already loaded), or None to fall back to a normal Keras load
+        """
+        try:
+            compiled = CompiledModel.from_h5(config_dict['model_path'], name=model_name)
+        except (UnsupportedModelError, OSError, KeyError, ValueError) as e:
+            logger.warning(f"Model '{model_name}' cannot use the numpy backend, falling back to Keras: {e}")
+            return None
+        
+        if not self.compiled_verify:
+            logger.debug(f"Compiled model '{model_name}' ({len(compiled.layer_types)} layers) without verification")
+            return compiled
+        
+        import keras
+        keras_model = keras.models.load_model(config_dict['model_path'])
+        try:
+            max_diff = verify_against_keras(compiled, keras_model, config_dict.get('input_shape') or [225, 5])
+        except UnsupportedModelError as e:
+            logger.error(f"Compiled model '{model_name}' failed verification, using Keras: {e}")
+            return keras_model
+        logger.debug(f"Compiled model '{model_name}' matches Keras (max abs diff {max_diff:.2e})")
+        return compiled
+    
+    def _register_remote_model(self, model_name: str, config_dict: Dict[str, Any]) -> bool:
+        """
+        Register a model served by the inference server (client mode)
+        
+        Args:
+            model_name: Name of the model
+            config_dict: Model configuration
+            
+        Returns:
+            bool: Always True; the server loads the model on first use if warm-up fails
+        """
+        try:
+            self.inference_client.load(model_name)
+        except InferenceServerError as e:
+            logger.warning(f"Inference server could not preload '{model_name}': {e}")
+        
+        self.loaded_models[model_name] = {
+            'model': None,
+            'batcher': None,
+            'remote': True,
+            'config': config_dict,
+            'class_names': config_dict['categories']
+        }
+        clear_match_cache()
+        state_manager.add_loaded_model(model_name)
+        logger.debug(f"Registered remote model: {model_name}")
+        return True
+    
     def unload_model(self, model_name: str) -> bool:
         """
         Unload a model from memory
@@ -317,7 +566,10 @@ class ModelManager:
             bool: True if model unloaded successfully, False otherwise
         """
         if model_name in self.loaded_models:
+            batcher = self.loaded_models[model_name].get('batcher')
             del self.loaded_models[model_name]
+            if batcher:
+                batcher.stop()
             state_manager.remove_loaded_model(model_name)
             logger.debug(f"Unloaded model: {model_name}")
             return True
@@ -486,6 +738,52 @@ class ModelManager:
         # Ensure standard fallback categories are always available
         return self._with_fallback_categories(categories)
     
+    @staticmethod
+    def input_shape_of(model_data: Optional[Dict[str, Any]]) -> List[int]:
+        """
+        Input shape of a loaded model
+
+        Request handlers look the active model up once and pass this shape to every
+        prepare_input() call, so decoding a batch does no Redis or database I/O.
+
+        Args:
+            model_data: Entry of loaded_models (as returned by get_active_model), or None
+
+        Returns:
+            List[int]: The configured input shape, [225, 5] without a model
+        """
+        return model_data['config']['input_shape'] if model_data else [225, 5]
+
+    def prepare_input(self, packet_arr: Any, input_shape: Optional[List[int]] = None) -> np.ndarray:
+        """
+        Convert one flow payload into a normalised model input row
+        
+        Args:
+            packet_arr: Packet matrix as nested lists (ints or decimal strings) or an ndarray
+            input_shape: Model input shape, defaults to the active model's configured shape
+            
+        Returns:
+            np.ndarray: float32 array of shape input_shape scaled to [0, 1]
+            
+        Raises:
+            ValueError: If the payload cannot be reshaped to input_shape
+        """
+        if input_shape is None:
+            input_shape = self.input_shape_of(self.get_active_model())
+        if len(input_shape) != 2:
+            # Fallback to default shape
+            logger.error("[ModelManager] Fallback to default shape")
+            input_shape = [225, 5]
+        
+        packet_array = np.asarray(packet_arr)
+        if packet_array.dtype == np.float32 and packet_array.shape == tuple(input_shape):
+            # Already prepared
+            return packet_array
+        try:
+            return packet_array.astype(np.float32).reshape(input_shape) / np.float32(255)
+        except ValueError as e:
+            raise ValueError(f"Invalid payload shape {packet_array.shape}, expected {tuple(input_shape)}: {e}")
+    
     def predict_flow(self, packet_arr: List[List[int]], client_ip_address: Optional[str] = None) -> Tuple[str, float]:
         """
         Predict flow classification using the active model
@@ -497,165 +795,282 @@ class ModelManager:
         Returns:
             Tuple of (prediction, time_elapsed)
         """
-        import time
-        
-        active_model_data = self.get_active_model()
-        if not active_model_data:
-            raise ValueError("No active model available for prediction")
+        return self.predict_flows([packet_arr], [client_ip_address])[0]
+    
+    def predict_flows(self, packet_arrs: List[Any], client_ip_addresses: Optional[List[Optional[str]]] = None) -> List[Tuple[str, float]]:
+        """
+        Predict classifications for a batch of flows with a single model forward pass
         
-        model = active_model_data['model']
-        config = active_model_data['config']
-        class_names = active_model_data['class_names']
+        All payloads are stacked into one (N, *input_shape) array. Confidence levels
+        are computed for the whole batch at once; DNS/VPN/ASN fallbacks then run
+        per flow for the results that need them.
         
-        # Ensure standard fallback categories are always available (appended to preserve indices)
-        class_names = self._with_fallback_categories(class_names)
+        Args:
+            packet_arrs: List of packet arrays (nested lists or prepared ndarrays)
+            client_ip_addresses: Optional list of client IPs for ASN lookup, aligned with packet_arrs
+            
+        Returns:
+            List of (prediction, time_elapsed) tuples in input order. time_elapsed is
+            the forward pass time amortised over the batch.
+        """
+        if not packet_arrs:
+            return []
+        batch = self._start_batch(self.get_active_model(), packet_arrs, client_ip_addresses)
         
-        start_time = time.time()
+        # Make prediction (coalesced with concurrent requests when batching is enabled)
+        with span('inference'):
+            predictions = self._forward(batch['model_data'], batch['x'])
+        return self._finish_batch(batch, predictions)
+    
+    async def apredict_flows(self, packet_arrs: List[Any], client_ip_addresses: Optional[List[Optional[str]]] = None) -> List[Tuple[str, float]]:
+        """
+        Awaitable predict_flows for the async classify views
         
-        # Prepare input data with dynamic shape from configuration
-        input_shape = config['input_shape']
-        if len(input_shape) == 2:
-            # Reshape to (batch_size, *input_shape)
-            packet_array = np.array(packet_arr).reshape(-1, *input_shape)
-        else:
-            # Fallback to default shape
-            logger.error("[ModelManager] Fallback to default shape")
-            packet_array = np.array(packet_arr).reshape(-1, 225, 5)
+        The forward pass is awaited on the micro-batcher's future, so the event loop
+        keeps serving other requests meanwhile. The IP fallbacks (Redis, DNS and ASN
+        lookups) run in a worker thread.
+        """
+        if not packet_arrs:
+            return []
+        batch = self._start_batch(await self.aget_active_model(), packet_arrs, client_ip_addresses)
         
-        x_test = packet_array.astype(int) / 255
+        with span('inference'):
+            predictions = await self._aforward(batch['model_data'], batch['x'])
+        return await sync_to_async(self._finish_batch, thread_sensitive=False)(batch, predictions)
+    
+    def _start_batch(self, active_model_data: Optional[Dict[str, Any]], packet_arrs: List[Any],
+                     client_ip_addresses: Optional[List[Optional[str]]]) -> Dict[str, Any]:
+        """Validate a prediction batch and stack its inputs"""
+        if client_ip_addresses is None:
+            client_ip_addresses = [None] * len(packet_arrs)
+        if len(client_ip_addresses) != len(packet_arrs):
+            raise ValueError("client_ip_addresses must be aligned with packet_arrs")
         
-        # Make prediction
-        predictions = model.predict(x_test, verbose=0)
-        y_prediction = np.argmax(predictions)
+        if not active_model_data:
+            raise ValueError("No active model available for prediction")
         
-        end_time = time.time()
-        time_elapsed = end_time - start_time
+        config = active_model_data['config']
         
-        # Get probabilities
-        probabilities = predictions[0] if len(predictions.shape) > 1 else predictions
+        # Prepare input data with dynamic shape from configuration
+        start_time = time.time()
+        input_shape = config['input_shape']
+        return {
+            'model_data': active_model_data,
+            'client_ip_addresses': client_ip_addresses,
+            'start_time': start_time,
+            'x': np.stack([self.prepare_input(p, input_shape) for p in packet_arrs]),
+        }
+    
+    def _finish_batch(self, batch: Dict[str, Any], predictions: np.ndarray) -> List[Tuple[str, float]]:
+        """Confidence levels, IP fallbacks and stats for a batch's model output"""
+        active_model_data = batch['model_data']
+        client_ip_addresses = batch['client_ip_addresses']
+        x_test = batch['x']
+        start_time = batch['start_time']
+        config = active_model_data['config']
         
-        # Log classification results
-        # logger.info("**********************************************")
-        # logger.info("Top 5 Classification Percentages:")
-        # logger.info("**********************************************")
+        # Ensure standard fallback categories are always available (appended to preserve indices)
+        class_names = self._with_fallback_categories(active_model_data['class_names'])
         
-        # Create list of (class_name, probability) tuples and sort by probability
-        class_probabilities = list(zip(class_names, probabilities))
-        class_probabilities.sort(key=lambda x: x[1], reverse=True)
+        predictions = np.asarray(predictions).reshape(len(x_test), -1)
         
-        # Log top 5
-        # for i, (class_name, probability) in enumerate(class_probabilities[:5]):
-        #     percentage = probability * 100
-        #     logger.info(f"{i+1}. {class_name}: {percentage:.2f}%")
+        time_elapsed = (time.time() - start_time) / len(x_test)
         
-        logger.debug("**********************************************")
+        # Only probabilities that have a class name can be selected (zip semantics of the single-flow path)
+        probabilities = predictions[:, :len(class_names)]
         
-        # Confidence analysis
-        max_probability = class_probabilities[0][1]
-        second_highest_probability = class_probabilities[1][1] if len(class_probabilities) > 1 else 0
+        # Top-2 per row without sorting the full class vector
+        if probabilities.shape[1] > 1:
+            top2_idx = np.argpartition(probabilities, -2, axis=1)[:, -2:]
+            top2 = np.take_along_axis(probabilities, top2_idx, axis=1)
+            max_probability = top2.max(axis=1)
+            second_highest_probability = top2.min(axis=1)
+        else:
+            max_probability = probabilities[:, 0]
+            second_highest_probability = np.zeros_like(max_probability)
+        y_prediction = np.argmax(probabilities, axis=1)
         
         # Check confidence thresholds
         high_confidence = max_probability > config['confidence_threshold']
         low_confidence = max_probability < 0.5
         
         # Check for multiple candidates
-        multiple_candidates = (max_probability - second_highest_probability) < 0.2 and second_highest_probability > 0.3
+        multiple_candidates = ((max_probability - second_highest_probability) < 0.2) & (second_highest_probability > 0.3)
+        
+        # Determine confidence levels and final predictions
+        accepted = high_confidence & ~multiple_candidates
+        confidence_levels = np.where(
+            accepted, 'HIGH',
+            np.where(low_confidence, 'LOW',
+                     np.where(multiple_candidates, 'MULTIPLE_CANDIDATES', 'UNCERTAIN'))
+        )
+        class_names_arr = np.asarray(class_names, dtype=object)
+        final_predictions = np.where(accepted, class_names_arr[y_prediction], 'Unknown')
+        
+        # Resolve every flow that may need the IP fallbacks in one bulk lookup: the shared
+        # reputation snapshot answers DNS/VPN/ASN together, otherwise only ASN is prefetched
+        fallback_ips = sorted({
+            ip for ip, prediction in zip(client_ip_addresses, final_predictions)
+            if ip and prediction in ("Unknown", "QUIC")
+        })
+        asn_lookup = None
+        if fallback_ips:
+            try:
+                with span('ip_lookup'):
+                    snapshot = get_snapshot()
+                    if snapshot is not None:
+                        asn_lookup = {
+                            ip: reputation for ip, reputation in zip(fallback_ips, snapshot.lookup_many(fallback_ips))
+                            if reputation is not None
+                        }
+                    else:
+                        asn_lookup = dict(zip(fallback_ips, lookup_many(fallback_ips)))
+            except Exception as e:
+                logger.error(f"Bulk IP lookup failed: {e}")
+        
+        results = []
+        for i, client_ip_address in enumerate(client_ip_addresses):
+            final_prediction = str(final_predictions[i])
+            confidence_level = str(confidence_levels[i])
+            logger.debug(f"Confidence Level: {confidence_level}")
+            logger.debug(f"Final Prediction: {final_prediction}")
+            
+            with span('ip_fallback'):
+                final_prediction, dns_detected, vpn_detected, asn_used = self._apply_ip_fallbacks(
+                    final_prediction, client_ip_address, class_names, asn_lookup, config.get('name')
+                )
+            
+            # Track classification stats
+            self._increment_stats(confidence_level, time_elapsed, dns_detected=dns_detected, vpn_detected=vpn_detected, asn_used=asn_used)
+            results.append((final_prediction, time_elapsed))
         
-        # Determine final prediction
-        if high_confidence and not multiple_candidates:
-            final_prediction = class_names[y_prediction]
-            confidence_level = "HIGH"
-        else:
-            final_prediction = "Unknown"
-            if low_confidence:
-                confidence_level = "LOW"
-            elif multiple_candidates:
-                confidence_level = "MULTIPLE_CANDIDATES"
-            else:
-                confidence_level = "UNCERTAIN"
+        return results
+    
+    def _apply_ip_fallbacks(self, final_prediction: str, client_ip_address: Optional[str], class_names: List[str],
+                            asn_lookup: Optional[Dict[str, Any]] = None, model_name: Optional[str] = None) -> Tuple[str, bool, bool, bool]:
+        """
+        Refine an Unknown or QUIC prediction using DNS, VPN and ASN lookups on the client IP
         
-        # logger.info(f"Max Probability: {max_probability:.3f}")
-        # logger.info(f"Second Highest: {second_highest_probability:.3f}")
-        logger.debug(f"Confidence Level: {confidence_level}")
-        logger.debug(f"Final Prediction: {final_prediction}")
-        logger.debug("************************************************")
+        Args:
+            final_prediction: Prediction from the model after confidence checks
+            client_ip_address: Public IP of the flow, or None
+            class_names: Available categories (including fallbacks)
+            asn_lookup: Pre-fetched results keyed by IP, either ASN dicts (from lookup_many)
+                or IPReputation entries from the snapshot
+            model_name: Active model name, used to memoise ASN matches per model
+            
+        Returns:
+            Tuple of (prediction, dns_detected, vpn_detected, asn_used)
+        """
+        # Enhanced ASN-based category matching with DNS and VPN detection
+        if not client_ip_address or final_prediction not in ("Unknown", "QUIC"):
+            return final_prediction, False, False, False
         
-        # Track DNS, VPN, and ASN usage
-        dns_detected = False
-        vpn_detected = False
         asn_used = False
-        
-        # Enhanced ASN-based category matching with DNS and VPN detection
-        if client_ip_address and (final_prediction == "Unknown" or final_prediction == "QUIC"):
-            try:
-                # First check if it's a known DNS server IP
+        prefetched = asn_lookup.get(client_ip_address, False) if asn_lookup is not None else False
+        reputation = prefetched if isinstance(prefetched, IPReputation) else None
+        try:
+            # First check if it's a known DNS server IP
+            if reputation is not None:
+                is_dns = reputation.is_dns or client_ip_address in FALLBACK_DNS_SERVERS
+                dns_category = 'DNS' if is_dns and 'DNS' in class_names else None
+            else:
                 dns_category = self._check_dns_ip(client_ip_address, class_names)
-                if dns_category:
-                    final_prediction = dns_category
-                    dns_detected = True
-                    logger.debug(f"DNS server detected: {client_ip_address} -> {dns_category}")
-                    logger.debug("************************************************")
-                    # Track stats before returning
-                    self._increment_stats(confidence_level, time_elapsed, dns_detected=True, vpn_detected=False, asn_used=False)
-                    return final_prediction, time_elapsed
-                
-                # If not DNS, check if it's a VPN IP
+            if dns_category:
+                logger.debug(f"DNS server detected: {client_ip_address} -> {dns_category}")
+                return dns_category, True, False, False
+            
+            # If not DNS, check if it's a VPN IP
+            if reputation is not None:
+                vpn_category = 'VPN' if reputation.is_vpn and 'VPN' in class_names else None
+            else:
                 vpn_category = self._check_vpn_ip(client_ip_address, class_names)
-                if vpn_category:
-                    final_prediction = vpn_category
-                    vpn_detected = True
-                    logger.debug(f"VPN network detected: {client_ip_address} -> {vpn_category}")
-                    logger.debug("************************************************")
-                    # Track stats before returning
-                    self._increment_stats(confidence_level, time_elapsed, dns_detected=False, vpn_detected=True, asn_used=False)
-                    return final_prediction, time_elapsed
-                
-                # If not DNS or VPN, proceed with ASN lookup
+            if vpn_category:
+                logger.debug(f"VPN network detected: {client_ip_address} -> {vpn_category}")
+                return vpn_category, False, True, False
+            
+            # If not DNS or VPN, proceed with ASN lookup
+            if reputation is not None:
+                asn_info = reputation.asn_info
+            elif prefetched is not False:
+                asn_info = prefetched
+            else:
                 asn_info = get_asn_from_ip(client_ip_address)
+            
+            if asn_info:
+                logger.debug(f"ASN lookup for {client_ip_address}: {asn_info['asn']} ({asn_info['organization']})")
                 
-                if asn_info:
-                    logger.debug("**********************************************")
-                    logger.debug("ASN Lookup Results for Enhanced Category Matching:")
-                    logger.debug(f"Client IP: {client_ip_address}")
-                    logger.debug(f"ASN: {asn_info['asn']}")
-                    logger.debug(f"Organization: {asn_info['organization']}")
-                    
-                    # Enhanced category matching logic
-                    organization_lower = asn_info['organization'].lower()
-                    logger.debug(f"Available categories in model: {class_names}")
-                    # original_prediction = final_prediction
-                    
-                    if final_prediction == "Unknown":
-                        # Try to match ASN organization to available categories
-                        matched_category = self._match_asn_to_category(organization_lower, class_names)
-                        if matched_category:
-                            final_prediction = matched_category
-                            asn_used = True
-                            logger.debug(f"ASN Match Found: '{asn_info['organization']}' -> '{matched_category}'")
-                        else:
-                            logger.debug(f"No ASN match found for '{asn_info['organization']}', keeping as 'Unknown'")
-                    
-                    elif final_prediction == "QUIC":
-                        # Special QUIC handling with ASN matching
-                        quic_category = self._match_quic_asn_to_category(organization_lower, class_names)
-                        if quic_category:
-                            final_prediction = quic_category
-                            asn_used = True
-                            logger.debug(f"QUIC ASN Match: '{asn_info['organization']}' -> '{quic_category}'")
-                        else:
-                            logger.debug(f"No QUIC ASN match found for '{asn_info['organization']}', keeping as 'QUIC'")
-                    
-                    logger.debug(f"Final Prediction After ASN Matching: {final_prediction}")
-                    logger.debug("**********************************************")
-                else:
-                    logger.debug(f"ASN lookup failed for IP: {client_ip_address}")
-            except Exception as e:
-                logger.error(f"Error during ASN lookup for IP {client_ip_address}: {e}")
+                # Enhanced category matching logic (memoised per ASN and model)
+                if final_prediction == "Unknown":
+                    # Try to match ASN organization to available categories
+                    matched_category = match_asn(asn_info['asn'], asn_info['organization'], 'default', model_name, class_names)
+                    if matched_category:
+                        final_prediction = matched_category
+                        asn_used = True
+                        logger.debug(f"ASN Match Found: '{asn_info['organization']}' -> '{matched_category}'")
+                    else:
+                        logger.debug(f"No ASN match found for '{asn_info['organization']}', keeping as 'Unknown'")
+                
+                elif final_prediction == "QUIC":
+                    # Special QUIC handling with ASN matching
+                    quic_category = match_asn(asn_info['asn'], asn_info['organization'], 'quic', model_name, class_names)
+                    if quic_category:
+                        final_prediction = quic_category
+                        asn_used = True
+                        logger.debug(f"QUIC ASN Match: '{asn_info['organization']}' -> '{quic_category}'")
+                    else:
+                        logger.debug(f"No QUIC ASN match found for '{asn_info['organization']}', keeping as 'QUIC'")
+            else:
+                logger.debug(f"ASN lookup failed for IP: {client_ip_address}")
+        except Exception as e:
+            logger.error(f"Error during ASN lookup for IP {client_ip_address}: {e}")
         
-        # Track classification stats
-        self._increment_stats(confidence_level, time_elapsed, dns_detected=dns_detected, vpn_detected=vpn_detected, asn_used=asn_used)
+        return final_prediction, False, False, asn_used
+    
+    def _forward(self, model_data: Dict[str, Any], x: np.ndarray) -> np.ndarray:
+        """
+        Run the model forward pass, on the inference server in client mode or
+        through the micro-batcher when one is attached
         
-        return final_prediction, time_elapsed
+        Args:
+            model_data: Entry from loaded_models
+            x: Prepared input array of shape (n, *input_shape)
+            
+        Returns:
+            np.ndarray: Model output for the n input rows
+        """
+        if model_data.get('remote'):
+            return self.inference_client.predict(model_data['config']['name'], x)
+        batcher = model_data.get('batcher')
+        if batcher is not None:
+            return batcher.predict(x, timeout=self.inference_timeout)
+        return model_data['model'].predict(x, verbose=0)
+    
+    async def _aforward(self, model_data: Dict[str, Any], x: np.ndarray) -> np.ndarray:
+        """_forward for async callers: awaits the micro-batcher, other paths run in a worker thread"""
+        batcher = model_data.get('batcher')
+        if batcher is not None and not model_data.get('remote'):
+            return await asyncio.wait_for(asyncio.wrap_future(batcher.submit(x)), self.inference_timeout)
+        return await sync_to_async(self._forward, thread_sensitive=False)(model_data, x)
+    
+    async def aget_active_model(self) -> Optional[Dict[str, Any]]:
+        """
+        get_active_model for async callers
+        
+        The active model name is read with the async Redis client; restoring it from
+        the database or loading the model falls back to get_active_model in a thread.
+        """
+        active_model_name = await state_manager.aget_active_model()
+        if active_model_name and active_model_name in self.loaded_models:
+            return self.loaded_models[active_model_name]
+        return await sync_to_async(self.get_active_model)()
+    
+    async def aget_active_model_name(self) -> Optional[str]:
+        """active_model for async callers"""
+        active_model_name = await state_manager.aget_active_model()
+        if active_model_name:
+            return active_model_name
+        return await sync_to_async(lambda: self.active_model)()
     
     def list_models(self) -> List[Dict[str, Any]]:
         """
@@ -672,6 +1087,7 @@ class ModelManager:
         for model in db_models:
             # Check if model is loaded in memory
             is_loaded = model.name in self.loaded_models
+            backend = self.loaded_models[model.name].get('backend', 'remote') if is_loaded else None
             
             # Check if file exists
             file_exists = os.path.exists(model.model_path)
@@ -687,6 +1103,7 @@ class ModelManager:
                 'confidence_threshold': model.confidence_threshold,
                 'is_active': model.is_active,
                 'is_loaded': is_loaded,
+                'backend': backend,
                 'file_exists': file_exists,
                 'input_shape': model.input_shape
             }
@@ -772,99 +1189,8 @@ class ModelManager:
         Returns:
             Matched category name or None if no match found
         """
-        # Define ASN organization to category mappings
-        asn_mappings = {
-            'google': ['Google', 'GoogleServices', 'YouTube'],
-            'youtube': ['YouTube'],
-            'facebook': ['Facebook', 'FbookReelStory'],
-            'meta': ['Facebook', 'FbookReelStory'],
-            'instagram': ['Instagram'],
-            'whatsapp': ['WhatsApp', 'WhatsAppFiles'],
-            'amazon': ['AmazonAWS'],
-            'microsoft': ['Microsoft'],
-            'netflix': ['NetFlix'],
-            'spotify': ['Spotify'],
-            'tiktok': ['TikTok'],
-            'huawei': ['HuaweiCloud'],
-            'apple': ['Apple'],
-            'cloudflare': ['Cloudflare'],
-            'twitter': ['Twitter'],
-            'snapchat': ['Snapchat'],
-            'xiaomi': ['Xiaomi'],
-            'gmail': ['GMail'],
-            'microsoft office': ['Microsoft'],
-            'office 365': ['Microsoft'],
-            'azure': ['Microsoft'],
-            'aws': ['AmazonAWS'],
-            'amazon web services': ['AmazonAWS'],
-            'google cloud': ['GoogleCloud'],
-            'google docs': ['GoogleDocs'],
-            'google drive': ['GoogleServices'],
-            'google maps': ['GoogleServices'],
-            'google play': ['GoogleServices'],
-            'google photos': ['GoogleServices'],
-            'google calendar': ['GoogleServices'],
-            'google meet': ['GoogleServices'],
-            'google chat': ['GoogleServices'],
-            'google workspace': ['GoogleServices'],
-            'g suite': ['GoogleServices'],
-            'facebook messenger': ['Messenger'],
-            'messenger': ['Messenger'],
-            'facebook reels': ['FbookReelStory'],
-            'facebook stories': ['FbookReelStory'],
-            'instagram reels': ['FbookReelStory'],
-            'instagram stories': ['FbookReelStory'],
-            'whatsapp web': ['WhatsApp'],
-            'whatsapp business': ['WhatsApp'],
-            'whatsapp files': ['WhatsAppFiles'],
-            'windows update': ['WindowsUpdate'],
-            'microsoft update': ['WindowsUpdate'],
-            'cybersec': ['Cybersec'],
-            'cyber security': ['Cybersec'],
-            'security': ['Cybersec'],
-            'tls': ['TLS'],
-            'ssl': ['TLS'],
-            'http': ['HTTP'],
-            'https': ['HTTP'],
-            'bittorrent': ['BitTorrent'],
-            'torrent': ['BitTorrent'],
-            'ads': ['ADS_Analytic_Track'],
-            'analytics': ['ADS_Analytic_Track'],
-            'tracking': ['ADS_Analytic_Track'],
-            'advertising': ['ADS_Analytic_Track'],
-            # Remove 'unknown' mapping to avoid circular logic
-            # 'unknown': ['Unknown']
-        }
-        
-        # Try exact matches first
-        for org_key, categories in asn_mappings.items():
-            if org_key in organization_lower:
-                logger.debug(f"Exact match found: '{org_key}' in '{organization_lower}'")
-                # Find the first matching category that's available in the model
-                for category in categories:
-                    if category in available_categories:
-                        logger.debug(f"Returning category '{category}' from exact match")
-                        return category
-                    else:
-                        logger.debug(f"Category '{category}' not available in model")
-        
-        # Try partial matches for more flexible matching (word boundaries)
-        for org_key, categories in asn_mappings.items():
-            # Split both strings into words and check for word-level matches
-            org_words = set(org_key.split())
-            org_lower_words = set(organization_lower.replace('-', ' ').replace('_', ' ').split())
-            
-            # Check if any word from org_key appears as a complete word in organization_lower
-            if org_words.intersection(org_lower_words):
-                logger.debug(f"Partial match found: '{org_key}' words in '{organization_lower}'")
-                for category in categories:
-                    if category in available_categories:
-                        logger.debug(f"Returning category '{category}' from partial match")
-                        return category
-                    else:
-                        logger.debug(f"Category '{category}' not available in model")
-        
-        return None
+        # Keyword tables live in asn_category_mappings.json; the matcher is compiled once per category set
+        return get_matcher('default', available_categories).match(organization_lower)
     
     def _match_quic_asn_to_category(self, organization_lower: str, available_categories: List[str]) -> Optional[str]:
         """
@@ -877,25 +1203,7 @@ class ModelManager:
         Returns:
             Matched category name or None if no match found
         """
-        # Special QUIC ASN mappings
-        quic_asn_mappings = {
-            'meta': 'FbookReelStory',
-            'facebook': 'FbookReelStory',
-            'google': 'YouTube',
-            'youtube': 'YouTube'
-        }
-        
-        # Check for exact matches first
-        for org_key, category in quic_asn_mappings.items():
-            if org_key in organization_lower and category in available_categories:
-                return category
-        
-        # Check for partial matches
-        for org_key, category in quic_asn_mappings.items():
-            if any(word in organization_lower for word in org_key.split()) and category in available_categories:
-                return category
-        
-        return None
+        return get_matcher('quic', available_categories).match(organization_lower)
     
     def _check_dns_ip(self, ip_address: str, available_categories: List[str]) -> Optional[str]:
         """
@@ -931,8 +1239,7 @@ class ModelManager:
         
         # Always check fallback DNS servers (critical infrastructure)
         # This runs when: Redis is None, Redis failed, or Redis didn't find the IP
-        fallback_dns_servers = {'8.8.8.8', '8.8.4.4', '1.1.1.1', '1.0.0.1'}
-        if ip_address in fallback_dns_servers:
+        if ip_address in FALLBACK_DNS_SERVERS:
             if redis_lookup_successful:
                 logger.info(f"Critical DNS server detected via fallback: {ip_address}")
             else:
@@ -974,7 +1281,7 @@ class ModelManager:
     
     def _increment_stats(self, confidence_level: str, prediction_time: float, dns_detected: bool = False, vpn_detected: bool = False, asn_used: bool = False):
         """
-        Increment classification statistics counters in Redis (cross-process safe)
+        Count one classification (buffered per process, flushed to Redis in one pipeline)
         
         Args:
             confidence_level: One of 'HIGH', 'LOW', 'MULTIPLE_CANDIDATES', 'UNCERTAIN'
@@ -984,32 +1291,11 @@ class ModelManager:
             asn_used: Whether ASN fallback was used
         """
         try:
-            # Increment total (shared across all processes via Redis)
-            state_manager.increment_classification_stat('total', 1)
-            
-            # Increment confidence level
-            if confidence_level == 'HIGH':
-                state_manager.increment_classification_stat('high_confidence', 1)
-            elif confidence_level == 'LOW':
-                state_manager.increment_classification_stat('low_confidence', 1)
-            elif confidence_level == 'MULTIPLE_CANDIDATES':
-                state_manager.increment_classification_stat('multiple_candidates', 1)
-            elif confidence_level == 'UNCERTAIN':
-                state_manager.increment_classification_stat('uncertain', 1)
-            
-            # Increment detection methods
-            if dns_detected:
-                state_manager.increment_classification_stat('dns_detections', 1)
-            
-            if vpn_detected:
-                state_manager.increment_classification_stat('vpn_detections', 1)
-            
-            if asn_used:
-                state_manager.increment_classification_stat('asn_fallback', 1)
-            
-            # Store prediction time (convert to milliseconds)
-            state_manager.add_prediction_time(prediction_time * 1000)
-            
+            # Prediction time is stored in milliseconds
+            state_manager.record_classification(
+                confidence_level, prediction_time * 1000,
+                dns_detected=dns_detected, vpn_detected=vpn_detected, asn_used=asn_used
+            )
         except Exception:
             logger.exception("Error incrementing stats")
     
@@ -1060,9 +1346,9 @@ class ModelManager:
                 # Get model configuration
                 model_config = ModelConfiguration.objects.get(name=active_model_name)
                 
-                # Calculate average prediction time
-                prediction_times = redis_stats.get('prediction_times', [])
-                avg_prediction_time = sum(prediction_times) / len(prediction_times) if prediction_times else 0.0
+                # Average prediction time over every classification in the period (exact sum / count)
+                histogram = redis_stats.get('prediction_time_histogram') or LatencyHistogram()
+                avg_prediction_time = histogram.mean
                 
                 # Get period start from Redis (or use 5 minutes ago as fallback)
                 period_end = timezone.now()
@@ -1089,7 +1375,8 @@ class ModelManager:
                     dns_detections=redis_stats['dns_detections'],
                     vpn_detections=redis_stats.get('vpn_detections', 0),
                     asn_fallback_count=redis_stats['asn_fallback'],
-                    avg_prediction_time_ms=avg_prediction_time
+                    avg_prediction_time_ms=avg_prediction_time,
+                    prediction_time_histogram=histogram.to_dict()
                 )
                 
                 logger.debug(
@@ -21,6 +21,8 @@ from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 import json
 
+from .latency_histogram import LatencyHistogram
+
 
 class ModelConfiguration(models.Model):
     """Database model for storing model configurations"""
@@ -148,6 +150,8 @@ class ClassificationStats(models.Model):
     
     # Average prediction time
     avg_prediction_time_ms = models.FloatField(default=0.0)
+    # Log-linear prediction latency histogram for the period (LatencyHistogram.to_dict())
+    prediction_time_histogram = models.JSONField(default=dict, blank=True)
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
@@ -190,3 +194,10 @@ class ClassificationStats(models.Model):
         if self.total_classifications == 0:
             return 0.0
         return (self.uncertain_count / self.total_classifications) * 100
+    
+    def prediction_time_percentiles(self):
+        """p50/p90/p99/p999 prediction time in ms (None for periods saved without a histogram)"""
+        histogram = LatencyHistogram.from_dict(self.prediction_time_histogram)
+        if not histogram:
+            return None
+        return histogram.percentiles()
@@ -0,0 +1,327 @@
+"""
+Per-stage latency instrumentation for the classify pipelines
+
+A request is wrapped in ``trace_request(pipeline)``; code anywhere below it (views,
+ModelManager.predict_flows, OnosClient, OdlMeterFlowRule) opens ``span(stage)``
+blocks. The current trace is carried in a ContextVar, so nested code needs no extra
+arguments and spans outside a sampled request cost one ContextVar lookup.
+
+Each stage's time is summed over the request (a batch of flows spends one "predict"
+but many "flow_programming" spans) and recorded once per request into a
+process-local LatencyHistogram per (pipeline, stage). A daemon thread merges them
+into Redis hashes (stage_metrics:<pipeline>:<stage>) every
+STAGE_METRICS_FLUSH_INTERVAL seconds, so all workers report into the same
+histograms. Nested spans are reported as their own stages; they are not
+subtracted from the enclosing one.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+import redis
+from django.conf import settings
+
+from .latency_histogram import LatencyHistogram, bucket_bounds, DEFAULT_PERCENTILES
+from .state_manager import state_manager, add_histogram_to_pipeline
+
+logger = logging.getLogger(__name__)
+
+STAGE_METRICS_KEY_PREFIX = "stage_metrics:"
+# Set of "<pipeline>:<stage>" names that have a histogram hash
+STAGE_METRICS_INDEX_KEY = "stage_metrics:index"
+
+# Bucket boundaries (seconds) used for the Prometheus histogram
+PROMETHEUS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_trace: ContextVar[Optional['RequestTrace']] = ContextVar('classify_stage_trace', default=None)
+
+
+class RequestTrace:
+    """Stage durations (seconds) of one sampled request"""
+
+    __slots__ = ('pipeline', 'durations')
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.durations: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+
+class _Span:
+    __slots__ = ('trace', 'stage', 'start')
+
+    def __init__(self, trace: RequestTrace, stage: str):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(stage: str):
+    """
+    Time a block as ``stage`` of the current request (no-op outside a sampled request)
+
+    Usage:
+        with span('predict'):
+            predictions = model_manager.predict_flows(...)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, stage)
+
+
+class _RequestTracer:
+    __slots__ = ('pipeline', 'trace', 'token', 'start')
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.trace = None
+
+    def __enter__(self) -> Optional[RequestTrace]:
+        if recorder.enabled and (recorder.sample_rate >= 1.0 or random.random() < recorder.sample_rate):
+            self.trace = RequestTrace(self.pipeline)
+            self.token = _current_trace.set(self.trace)
+            self.start = time.perf_counter()
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.add('total', time.perf_counter() - self.start)
+            _current_trace.reset(self.token)
+            recorder.record(self.trace)
+        return False
+
+
+def trace_request(pipeline: str) -> _RequestTracer:
+    """
+    Trace one request of ``pipeline`` (e.g. "onos_classify")
+
+    Sampled with probability STAGE_METRICS_SAMPLE_RATE; the whole request is
+    recorded under the "total" stage in addition to its spans.
+
+    Usage:
+        with trace_request('onos_classify'):
+            ...
+    """
+    return _RequestTracer(pipeline)
+
+
+def traced(pipeline: str):
+    """Decorator running a view (sync or async) inside trace_request(pipeline)"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with trace_request(pipeline):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_request(pipeline):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class StageMetricsRecorder:
+    """Process-local stage histograms, merged into Redis by a daemon thread"""
+
+    def __init__(self, redis_client, enabled: bool = True, sample_rate: float = 1.0, flush_interval: float = 5.0):
+        self.redis_client = redis_client
+        self.enabled = enabled
+        self.sample_rate = min(1.0, max(0.0, float(sample_rate)))
+        self.flush_interval = max(0.1, float(flush_interval))
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self._pid = os.getpid()
+        self._flusher: Optional[threading.Thread] = None
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._histograms = {}
+            self._flusher = None
+
+    def record(self, trace: RequestTrace):
+        self._check_fork()
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._run, name="stage-metrics-flusher", daemon=True)
+                    self._flusher.start()
+        with self._lock:
+            for stage, seconds in trace.durations.items():
+                histogram = self._histograms.get((trace.pipeline, stage))
+                if histogram is None:
+                    histogram = self._histograms[(trace.pipeline, stage)] = LatencyHistogram()
+                histogram.record(seconds * 1000)
+
+    def record_duration(self, pipeline: str, stage: str, seconds: float):
+        """
+        Record one duration outside a request trace (not sampled)
+
+        Used for per-call latencies such as the ODL RESTCONF client's requests,
+        which run in worker threads that have no current trace.
+        """
+        if not self.enabled:
+            return
+        trace = RequestTrace(pipeline)
+        trace.add(stage, seconds)
+        self.record(trace)
+
+    def flush(self) -> bool:
+        """Merge local histograms into Redis (kept locally if Redis is unavailable)"""
+        self._check_fork()
+        with self._lock:
+            if not self._histograms:
+                return True
+            histograms, self._histograms = self._histograms, {}
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for (pipeline, stage), histogram in histograms.items():
+                add_histogram_to_pipeline(pipe, histogram, key=f"{STAGE_METRICS_KEY_PREFIX}{pipeline}:{stage}")
+            pipe.sadd(STAGE_METRICS_INDEX_KEY, *(f"{pipeline}:{stage}" for pipeline, stage in histograms))
+            pipe.execute()
+            return True
+        except redis.exceptions.RedisError:
+            logger.exception("Error flushing stage metrics")
+            with self._lock:
+                for key, histogram in histograms.items():
+                    self._histograms.setdefault(key, LatencyHistogram()).merge(histogram)
+            return False
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Stage metrics flusher error")
+
+    def read(self) -> Dict[str, Dict[str, LatencyHistogram]]:
+        """
+        Cluster-wide histograms from Redis
+
+        Returns:
+            Dict of pipeline -> stage -> LatencyHistogram
+        """
+        self.flush()
+        names = sorted(self.redis_client.smembers(STAGE_METRICS_INDEX_KEY))
+        if not names:
+            return {}
+        pipe = self.redis_client.pipeline(transaction=False)
+        for name in names:
+            pipe.hgetall(f"{STAGE_METRICS_KEY_PREFIX}{name}")
+        result: Dict[str, Dict[str, LatencyHistogram]] = {}
+        for name, data in zip(names, pipe.execute()):
+            pipeline, _, stage = name.partition(':')
+            histogram = LatencyHistogram.from_redis_hash(data)
+            if histogram:
+                result.setdefault(pipeline, {})[stage] = histogram
+        return result
+
+    def reset(self):
+        """Delete all stage histograms (local and in Redis)"""
+        with self._lock:
+            self._histograms = {}
+        names = self.redis_client.smembers(STAGE_METRICS_INDEX_KEY)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for name in names:
+            pipe.delete(f"{STAGE_METRICS_KEY_PREFIX}{name}")
+        pipe.delete(STAGE_METRICS_INDEX_KEY)
+        pipe.execute()
+
+
+recorder = StageMetricsRecorder(
+    state_manager.redis_client,
+    enabled=getattr(settings, 'STAGE_METRICS_ENABLED', True),
+    sample_rate=getattr(settings, 'STAGE_METRICS_SAMPLE_RATE', 1.0),
+    flush_interval=getattr(settings, 'STAGE_METRICS_FLUSH_INTERVAL', 5.0),
+)
+
+
+def get_stage_summary() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    Per-stage count, mean and percentiles (ms) for every pipeline
+
+    Returns:
+        Dict of pipeline -> stage -> {'count', 'mean_ms', 'p50', 'p90', 'p99', 'p999'}
+    """
+    summary = {}
+    for pipeline, stages in recorder.read().items():
+        summary[pipeline] = {
+            stage: {
+                'count': histogram.total,
+                'mean_ms': round(histogram.mean, 3),
+                **{key: round(value, 3) for key, value in histogram.percentiles().items()},
+            }
+            for stage, histogram in sorted(stages.items())
+        }
+    return summary
+
+
+def render_prometheus() -> str:
+    """Stage histograms in the Prometheus text exposition format (seconds)"""
+    histograms = recorder.read()
+    name = 'sdn_classify_stage_duration_seconds'
+    lines = [
+        f'# HELP {name} Time spent per request in each stage of the classify pipelines',
+        f'# TYPE {name} histogram',
+    ]
+    for pipeline, stages in sorted(histograms.items()):
+        for stage, histogram in sorted(stages.items()):
+            labels = f'pipeline="{pipeline}",stage="{stage}"'
+            # Bucket upper bounds in seconds, sorted; a log-linear bucket is counted under
+            # the first boundary at or above its upper edge
+            edges = sorted((bucket_bounds(index)[1] / 1e6, count) for index, count in histogram.counts.items())
+            position, cumulative = 0, 0
+            for boundary in PROMETHEUS_BUCKETS:
+                while position < len(edges) and edges[position][0] <= boundary:
+                    cumulative += edges[position][1]
+                    position += 1
+                lines.append(f'{name}_bucket{{{labels},le="{boundary:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.total}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.sum_ms / 1000:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.total}')
+    quantile_name = 'sdn_classify_stage_duration_quantile_seconds'
+    lines.append(f'# HELP {quantile_name} Stage duration percentiles from the log-linear histograms')
+    lines.append(f'# TYPE {quantile_name} gauge')
+    for pipeline, stages in sorted(histograms.items()):
+        for stage, histogram in sorted(stages.items()):
+            for percentile in DEFAULT_PERCENTILES:
+                lines.append(
+                    f'{quantile_name}{{pipeline="{pipeline}",stage="{stage}",quantile="{percentile / 100:g}"}} '
+                    f'{histogram.percentile(percentile) / 1000:.6f}'
+                )
+    return '\n'.join(lines) + '\n'
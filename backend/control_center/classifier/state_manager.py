@@ -1,23 +1,188 @@
+import asyncio
+import atexit
 import json
 import logging
+import os
+import threading
 from typing import Any, Dict, Optional
 from django.conf import settings
 import redis
+import redis.asyncio
+
+from .latency_histogram import LatencyHistogram, SUM_FIELD
 
 logger = logging.getLogger(__name__)
 
+CLASSIFICATION_STAT_FIELDS = (
+    'total', 'high_confidence', 'low_confidence', 'multiple_candidates',
+    'uncertain', 'dns_detections', 'vpn_detections', 'asn_fallback',
+)
+CONFIDENCE_STAT_FIELDS = {
+    'HIGH': 'high_confidence',
+    'LOW': 'low_confidence',
+    'MULTIPLE_CANDIDATES': 'multiple_candidates',
+    'UNCERTAIN': 'uncertain',
+}
+# Hash of latency histogram bucket counters (see latency_histogram.py)
+PREDICTION_TIME_HISTOGRAM_KEY = "classification_stats:prediction_time_hist"
+
+
+def add_histogram_to_pipeline(pipe, histogram: LatencyHistogram, key: str = PREDICTION_TIME_HISTOGRAM_KEY):
+    """Queue HINCRBYs merging a latency histogram into a Redis hash"""
+    if not histogram:
+        return
+    for field, count in histogram.to_redis_fields().items():
+        pipe.hincrby(key, field, count)
+    pipe.hincrbyfloat(key, SUM_FIELD, histogram.sum_ms)
+
+
+class ClassificationStatsAccumulator:
+    """
+    Process-local buffer for classification statistics
+
+    Counters and prediction times are merged in memory under a lock and written to
+    the classification_stats:* keys in one pipeline, either once ``flush_events``
+    classifications are pending or every ``flush_interval`` seconds (a daemon thread
+    flushes idle processes), so Redis traffic scales with time instead of flow rate.
+    The Redis keys keep their existing layout, so readers and the snapshot/reset
+    path are unchanged; they just see each process's data up to one interval late.
+    """
+
+    def __init__(self, redis_client, flush_interval: float = 1.0, flush_events: int = 500):
+        self.redis_client = redis_client
+        self.flush_interval = max(0.05, float(flush_interval))
+        self.flush_events = max(1, int(flush_events))
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._reset_buffers()
+        self._pid = os.getpid()
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _reset_buffers(self):
+        self._counters = dict.fromkeys(CLASSIFICATION_STAT_FIELDS, 0)
+        self._histogram = LatencyHistogram()
+        self._pending = 0
+
+    def _check_fork(self):
+        """Drop state inherited from the parent process (its buffer is flushed by the parent)"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._lock = threading.Lock()
+            self._flush_lock = threading.Lock()
+            self._reset_buffers()
+            # Threads do not survive fork; the child starts its own flusher
+            self._flusher = None
+
+    def _ensure_flusher(self):
+        """Start the timer thread on first use"""
+        self._check_fork()
+        if self._flusher is None:
+            with self._flush_lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._run, name="classification-stats-flusher", daemon=True)
+                    self._flusher.start()
+
+    def record(self, confidence_level: str, prediction_time_ms: float, dns_detected: bool = False,
+               vpn_detected: bool = False, asn_used: bool = False):
+        """
+        Count one classification
+
+        Args:
+            confidence_level: One of 'HIGH', 'LOW', 'MULTIPLE_CANDIDATES', 'UNCERTAIN'
+            prediction_time_ms: Prediction time in milliseconds
+            dns_detected: Whether DNS detection was used
+            vpn_detected: Whether VPN detection was used
+            asn_used: Whether ASN fallback was used
+        """
+        self._ensure_flusher()
+        with self._lock:
+            counters = self._counters
+            counters['total'] += 1
+            field = CONFIDENCE_STAT_FIELDS.get(confidence_level)
+            if field:
+                counters[field] += 1
+            if dns_detected:
+                counters['dns_detections'] += 1
+            if vpn_detected:
+                counters['vpn_detections'] += 1
+            if asn_used:
+                counters['asn_fallback'] += 1
+            self._histogram.record(prediction_time_ms)
+            self._pending += 1
+            flush_now = self._pending >= self.flush_events
+        if flush_now:
+            self.flush()
+
+    def flush(self) -> bool:
+        """
+        Write buffered stats to Redis in a single pipeline
+
+        Returns:
+            bool: False if the write failed (the stats are kept for the next flush)
+        """
+        self._check_fork()
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return True
+                counters, histogram = self._counters, self._histogram
+                self._reset_buffers()
+            try:
+                pipe = self.redis_client.pipeline(transaction=False)
+                for field, value in counters.items():
+                    if value:
+                        pipe.incrby(f"classification_stats:{field}", value)
+                add_histogram_to_pipeline(pipe, histogram)
+                pipe.execute()
+                return True
+            except redis.exceptions.RedisError:
+                logger.exception("Error flushing classification stats")
+                self._merge_back(counters, histogram)
+                return False
+
+    def _merge_back(self, counters: Dict[str, int], histogram: LatencyHistogram):
+        with self._lock:
+            for field, value in counters.items():
+                self._counters[field] += value
+            self._histogram.merge(histogram)
+            self._pending += counters['total']
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Classification stats flusher error")
+
+    def stop(self):
+        """Stop the timer thread and flush what is left"""
+        self._stopped.set()
+        self.flush()
+
 
 class ModelStateManager:
     """Redis-based state manager for fast model state access"""
     
     def __init__(self):
+        self.redis_host = getattr(settings, 'CHANNEL_REDIS_HOST', 'redis')
+        self.redis_port = getattr(settings, 'CHANNEL_REDIS_PORT', 6379)
         self.redis_client = redis.Redis(
-            host=getattr(settings, 'CHANNEL_REDIS_HOST', 'redis'),
-            port=getattr(settings, 'CHANNEL_REDIS_PORT', 6379),
+            host=self.redis_host,
+            port=self.redis_port,
             decode_responses=True
         )
+        # redis.asyncio client for the async views, bound to the event loop it was created in
+        self._async_redis_client = None
+        self._async_redis_loop = None
         self.cache_prefix = "model_state:"
         self.cache_ttl = 3600  # 1 hour
+        self.stats_buffered = getattr(settings, 'CLASSIFICATION_STATS_BUFFERED', True)
+        self.stats_accumulator = ClassificationStatsAccumulator(
+            self.redis_client,
+            flush_interval=getattr(settings, 'CLASSIFICATION_STATS_FLUSH_INTERVAL', 1.0),
+            flush_events=getattr(settings, 'CLASSIFICATION_STATS_FLUSH_EVENTS', 500)
+        )
     
     def get_active_model(self) -> Optional[str]:
         """Get the currently active model name"""
@@ -27,6 +192,27 @@ class ModelStateManager:
             logger.error(f"Error getting active model from Redis: {e}")
             return None
     
+    @property
+    def async_redis_client(self) -> redis.asyncio.Redis:
+        """redis.asyncio client for the running event loop (created on first use)"""
+        loop = asyncio.get_running_loop()
+        if self._async_redis_loop is not loop:
+            self._async_redis_client = redis.asyncio.Redis(
+                host=self.redis_host,
+                port=self.redis_port,
+                decode_responses=True
+            )
+            self._async_redis_loop = loop
+        return self._async_redis_client
+    
+    async def aget_active_model(self) -> Optional[str]:
+        """Get the currently active model name without blocking the event loop"""
+        try:
+            return await self.async_redis_client.get(f"{self.cache_prefix}active_model")
+        except Exception as e:
+            logger.error(f"Error getting active model from Redis: {e}")
+            return None
+    
     def set_active_model(self, model_name: str) -> bool:
         """Set the active model name"""
         try:
@@ -151,19 +337,46 @@ class ModelStateManager:
             logger.exception("Error incrementing classification stat")
     
     def add_prediction_time(self, time_ms: float):
-        """Add a prediction time to the list in Redis (atomic operation)"""
+        """Add a prediction time to the latency histogram in Redis"""
         try:
-            key = "classification_stats:prediction_times"
-            # Store as list with max 1000 entries (rolling window), atomically
+            histogram = LatencyHistogram()
+            histogram.record(time_ms)
             pipe = self.redis_client.pipeline()
-            pipe.lpush(key, time_ms)
-            pipe.ltrim(key, 0, 999)  # Keep only last 1000
+            add_histogram_to_pipeline(pipe, histogram)
             pipe.execute()
         except redis.exceptions.RedisError:
             logger.exception("Error adding prediction time")
     
+    def record_classification(self, confidence_level: str, prediction_time_ms: float, dns_detected: bool = False,
+                              vpn_detected: bool = False, asn_used: bool = False):
+        """Count one classification (buffered per process unless CLASSIFICATION_STATS_BUFFERED is off)"""
+        if self.stats_buffered:
+            self.stats_accumulator.record(confidence_level, prediction_time_ms, dns_detected, vpn_detected, asn_used)
+            return
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.incrby("classification_stats:total", 1)
+            field = CONFIDENCE_STAT_FIELDS.get(confidence_level)
+            if field:
+                pipe.incrby(f"classification_stats:{field}", 1)
+            for flag, field in ((dns_detected, 'dns_detections'), (vpn_detected, 'vpn_detections'),
+                                (asn_used, 'asn_fallback')):
+                if flag:
+                    pipe.incrby(f"classification_stats:{field}", 1)
+            histogram = LatencyHistogram()
+            histogram.record(prediction_time_ms)
+            add_histogram_to_pipeline(pipe, histogram)
+            pipe.execute()
+        except redis.exceptions.RedisError:
+            logger.exception("Error recording classification stats")
+
+    def flush_classification_stats(self) -> bool:
+        """Write this process's buffered classification stats to Redis now"""
+        return self.stats_accumulator.flush()
+
     def get_classification_stats(self) -> dict:
         """Get all classification statistics from Redis (optimized with MGET)"""
+        self.flush_classification_stats()
         try:
             # Use MGET to fetch all counters in a single network round trip
             keys = [
@@ -185,9 +398,10 @@ class ModelStateManager:
                 [int(v or 0) for v in vals]
             ))
             
-            # Get prediction times
-            times = self.redis_client.lrange("classification_stats:prediction_times", 0, -1)
-            stats['prediction_times'] = [float(t) for t in times] if times else []
+            # Get prediction time histogram
+            stats['prediction_time_histogram'] = LatencyHistogram.from_redis_hash(
+                self.redis_client.hgetall(PREDICTION_TIME_HISTOGRAM_KEY)
+            )
             
             return stats
         except redis.exceptions.RedisError:
@@ -226,6 +440,8 @@ class ModelStateManager:
         Returns:
             dict: Snapshot of classification statistics before reset
         """
+        # Include this process's buffered stats; other processes flush theirs within one interval
+        self.flush_classification_stats()
         try:
             # Lua script for atomic read-and-reset
             # All operations execute atomically on Redis server - no TOCTOU race condition
@@ -248,17 +464,17 @@ class ModelStateManager:
                 result[i] = tonumber(v) or 0
             end
             
-            -- Read prediction_times list (capped list, snapshot all entries)
-            local times = redis.call('LRANGE', 'classification_stats:prediction_times', 0, -1)
+            -- Read the prediction time histogram hash (flat field/value list)
+            local hist = redis.call('HGETALL', 'classification_stats:prediction_time_hist')
             
-            -- Reset phase: delete all counters and the list
+            -- Reset phase: delete all counters and the histogram
             for _, k in ipairs(keys) do
                 redis.call('DEL', k)
             end
-            redis.call('DEL', 'classification_stats:prediction_times')
+            redis.call('DEL', 'classification_stats:prediction_time_hist')
             
-            -- Return snapshot [counters..., times]
-            return {result[1], result[2], result[3], result[4], result[5], result[6], result[7], result[8], times}
+            -- Return snapshot [counters..., histogram]
+            return {result[1], result[2], result[3], result[4], result[5], result[6], result[7], result[8], hist}
             """
             
             # Register and execute Lua script
@@ -275,7 +491,9 @@ class ModelStateManager:
                 'dns_detections': int(data[5]),
                 'vpn_detections': int(data[6]),
                 'asn_fallback': int(data[7]),
-                'prediction_times': [float(x) for x in data[8]] if data[8] else [],
+                'prediction_time_histogram': LatencyHistogram.from_redis_hash(
+                    dict(zip(data[8][::2], data[8][1::2]))
+                ),
             }
             
         except redis.exceptions.RedisError:
@@ -289,3 +507,4 @@ class ModelStateManager:
 
 # Global state manager instance
 state_manager = ModelStateManager()
+atexit.register(state_manager.stats_accumulator.stop)
@@ -43,3 +43,29 @@ def save_classification_statistics():
         logger.exception("Error in save_classification_statistics task")
         raise
 
+
+
+@shared_task(bind=True, max_retries=None)
+def drain_flow_programming_queue(self, controller_type, controller_ip):
+    """
+    Program the queued flow rules of one controller (see classifier.flow_programming).
+    Only one drainer runs per controller; if another holds it, try again shortly. The
+    scheduled flag lets at most one drainer per controller wait like this.
+    """
+    from .flow_programming import drain_queue, ControllerBusy
+
+    try:
+        processed = drain_queue(controller_type, controller_ip)
+    except ControllerBusy:
+        raise self.retry(countdown=1)
+    logger.debug(f"Programmed {processed} queued flow jobs on {controller_type} {controller_ip}")
+    return processed
+
+
+@shared_task
+def requeue_flow_jobs(controller_type, controller_ip, jobs):
+    """Put flow-programming jobs back on their controller's queue after a backoff delay"""
+    from .flow_programming import enqueue_flow_jobs
+
+    enqueue_flow_jobs(controller_type, controller_ip, jobs)
+    return len(jobs)
@@ -28,21 +28,27 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from utils.permissions import HasAPIKeyOrIsAuthenticated
 from knox.auth import TokenAuthentication
-from django.http import JsonResponse
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.http import JsonResponse, HttpResponse
+from django.conf import settings
+from asgiref.sync import sync_to_async
 from django.views.decorators.csrf import csrf_exempt
 import json
 from classifier.classification import create_classification_from_json
-from classifier.meter_flow_rule import MeterFlowRule
+from classifier.meter_flow_rule import MeterFlowRule, apply_flow_rules
+from classifier.installed_flows import installed_flow_cache
+from classifier.flow_notifier import flow_notifier
+from classifier.flow_programming import FLOW_PROGRAMMING_ASYNC, queue_meter_flow_rules, get_flow_programming_status
 from classifier.model_manager import model_manager
 from classifier.models import ClassificationStats, ModelConfiguration
+from classifier.latency_histogram import LatencyHistogram
+from classifier.stage_timing import span, traced, get_stage_summary, render_prometheus, recorder as stage_recorder
 from general.models import Controller, Device
 from software_plugin.models import PluginInstallation, Plugin
 from onos.models import Category, Meter
+from onos.meter_policy import METER_POLICY_INDEX_ENABLED, get_meter_policy_index, meter_policy_from_meter, select_meter
 import os
 from network_data.tasks import create_flow_entry
-from network_device.models import NetworkDevice
+from network_device.registry import device_error, device_registry
 from network_data.tasks import create_flow_entries_batch
 import logging
 import ipaddress
@@ -63,138 +69,345 @@ def is_private_ip(ip):
 def post_flow_classification(request):
     if request.method == 'POST':
         data = json.loads(request.body)
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            'flow_updates',
-            {
-                'type': 'flow_message',
-                'flow': data
-            }
-        )
+        # Sent to the flow_updates group with the other flows of the current window
+        flow_notifier.publish(data)
         return JsonResponse({'message': 'received'}, status=status.HTTP_200_OK)
 
 
-@csrf_exempt
-def classify(request):
-    if request.method == 'POST':
-        # Accept both a single object and a list of objects
-        try:
+def _select_meter(application, switch_ip, src_mac):
+    """
+    Select the ONOS meter to apply to a classified flow
+
+    Served from the in-memory meter policy index unless METER_POLICY_INDEX_ENABLED
+    is False, in which case the meter is resolved with database queries.
+
+    Args:
+        application: Predicted category name
+        switch_ip: LAN IP of the switch that saw the flow
+        src_mac: Client MAC address
+
+    Returns:
+        MeterPolicy or None if the metering plugin is not installed or no meter applies
+    """
+    if METER_POLICY_INDEX_ENABLED:
+        return select_meter(application, switch_ip, src_mac)
+    meter = _select_meter_from_db(application, switch_ip, src_mac)
+    return meter_policy_from_meter(meter) if meter is not None else None
+
+
+def _select_meter_from_db(application, switch_ip, src_mac):
+    """Query-based meter selection (one flow, about ten queries)"""
+    meter_plugin = Plugin.objects.get(name='tau-onos-metre-traffic-classification')
+    if not PluginInstallation.objects.filter(plugin=meter_plugin).exists():
+        return None
+    switch_device = Device.objects.get(lan_ip_address=switch_ip, device_type='switch')
+    controller = Controller.objects.get(switches=switch_device, type='onos')
+    if not Meter.objects.filter(categories__name=application, controller_device=controller.device).exists():
+        return None
+    current_time = now().time()
+    current_day = now().weekday()
+    matching_meters = Meter.objects.filter(
+        categories__name=application,
+        controller_device=controller.device
+    )
+    valid_meters = matching_meters
+    if matching_meters.filter(network_device__mac_address=src_mac).exists():
+        valid_meters = valid_meters.filter(network_device__mac_address=src_mac)
+    if current_day < 5:
+        weekday_meters = matching_meters.filter(
+            Q(activation_period="weekday") & Q(start_time__lte=current_time) & Q(end_time__gte=current_time)
+        )
+        valid_meters = valid_meters | weekday_meters if weekday_meters.exists() else valid_meters
+    else:
+        weekend_meters = matching_meters.filter(
+            Q(activation_period="weekend") & Q(start_time__lte=current_time) & Q(end_time__gte=current_time)
+        )
+        valid_meters = valid_meters | weekend_meters if weekend_meters.exists() else valid_meters
+    return valid_meters.first()
+
+
+def _parse_classify_body(request):
+    """
+    Decode a classify request body into a list of items
+
+    Returns:
+        Tuple (items, None) or (None, JsonResponse with the error)
+    """
+    # Accept both a single object and a list of objects
+    try:
+        with span('parse'):
             data = json.loads(request.body)
+    except Exception as e:
+        return None, JsonResponse({'status': 'error', 'message': f'Invalid JSON: {e}'}, status=400)
+
+    # Always work with a list
+    if isinstance(data, dict):
+        return [data], None
+    if isinstance(data, list):
+        return data, None
+    return None, JsonResponse({'status': 'error', 'message': 'Invalid input format'}, status=400)
+
+
+def _no_active_model_response(data_list):
+    return JsonResponse([{
+        "status": "error",
+        "message": "No active classification model available"
+    } for _ in data_list], safe=False, status=200)
+
+
+def _drop_invalid_devices(pending, predictions, results):
+    """Fail the items whose client MAC cannot be stored, so the device upsert of the batch is not rejected"""
+    valid, valid_predictions = [], []
+    for entry, prediction in zip(pending, predictions):
+        error = device_error(entry[1].get('src_mac'), None)
+        if error:
+            results[entry[0]] = {'status': 'error', 'message': error}
+        else:
+            valid.append(entry)
+            valid_predictions.append(prediction)
+    return valid, valid_predictions
+
+
+def _decode_classify_items(data_list, results, input_shape):
+    """
+    Parse and validate every item first so the whole request can be classified
+    with a single model forward pass
+
+    Args:
+        input_shape: Input shape of the active model, looked up once per request (the
+            helper does no I/O, so the async view can call it in the event loop)
+
+    Returns:
+        List of (index, item, classification, model_input, public_ip_for_asn); failed
+        items get an error in ``results``
+    """
+    pending = []
+    for index, item in enumerate(data_list):
+        try:
+            with span('decode'):
+                classification = create_classification_from_json(item)
+                model_input = model_manager.prepare_input(classification.payload, input_shape)
+            
+            client_ip = item.get('src_ip')
+            dst_ip = item.get('dst_ip')
+            public_ip_for_asn = None
+            if client_ip and not is_private_ip(client_ip):
+                public_ip_for_asn = client_ip
+            elif dst_ip and not is_private_ip(dst_ip):
+                public_ip_for_asn = dst_ip
+            pending.append((index, item, classification, model_input, public_ip_for_asn))
+        except Exception as e:
+            results[index] = {'status': 'error', 'message': str(e)}
+    return pending
+
+
+def _build_meter_flow_rules(pending, predictions, results, flow_entries_to_log, select=_select_meter):
+    """
+    Record each classification and build the flow rule of the flows that get a meter
+
+    Args:
+        select: Meter selection callable (application, switch_ip, src_mac) -> MeterPolicy or None
+
+    Returns:
+        List of (index, MeterFlowRule) to install together
+    """
+    flow_rules = []
+    for (index, item, classification, _, _), predicted_app_tuple in zip(pending, predictions):
+        try:
+            port_to_router = item.get('port_to_router')
+            port_to_client = item.get('port_to_client')
+            switch_ip = item.get('lan_ip_address')
+            application = predicted_app_tuple[0]
+            flow_data = {
+                'src_ip': item.get('src_ip'),
+                'dst_ip': item.get('dst_ip'),
+                'src_mac': item.get('src_mac'),
+                'dst_mac': item.get('dst_mac'),
+                'src_port': item.get('src_port'),
+                'dst_port': item.get('dst_port'),
+                'classification': application,
+            }
+            flow_entries_to_log.append(flow_data)
+            flow_results = []
+            with span('meter_selection'):
+                meter = select(application, switch_ip, item.get('src_mac'))
+            if meter is not None:
+                proto = 'udp'
+                if item.get('tcp') == 1:
+                    proto = 'tcp'
+                flow_rule = MeterFlowRule(
+                    proto=proto,
+                    client_port=classification.client_port,
+                    inbound_port_src=port_to_client,
+                    outbound_port_src=port_to_router,
+                    inbound_port_dst=port_to_router,
+                    outbound_port_dst=port_to_client,
+                    category=application,
+                    src_mac=classification.src_mac,
+                    dst_mac=item.get('dst_mac'),
+                    controller_ip=meter.controller_ip,
+                    meter_id=meter.meter_id,
+                    switch_id=meter.switch_id
+                )
+                # Installed below together with the rest of the batch
+                flow_rules.append((index, flow_rule))
+            results[index] = {
+                'status': 'success',
+                'classification': application,
+                'flow_results': flow_results
+            }
         except Exception as e:
-            return JsonResponse({'status': 'error', 'message': f'Invalid JSON: {e}'}, status=400)
+            results[index] = {'status': 'error', 'message': str(e)}
+    return flow_rules
+
 
-        # Always work with a list
-        if isinstance(data, dict):
-            data_list = [data]
-        elif isinstance(data, list):
-            data_list = data
+def _program_meter_flow_rules(flow_rules, results):
+    """Install (or queue) the rules of a request and merge the outcome into ``results``"""
+    with span('flow_programming'):
+        if FLOW_PROGRAMMING_ASYNC:
+            # Answer now; the rules are installed by the flow_programming workers
+            flow_results = queue_meter_flow_rules([flow_rule for _, flow_rule in flow_rules])
+        else:
+            # Every rule of the request in one POST per controller
+            flow_results = apply_flow_rules([flow_rule for _, flow_rule in flow_rules])
+    for (index, _), flow_result in zip(flow_rules, flow_results):
+        if isinstance(flow_result, Exception):
+            results[index] = {'status': 'error', 'message': str(flow_result)}
         else:
-            return JsonResponse({'status': 'error', 'message': 'Invalid input format'}, status=400)
+            results[index]['flow_results'] = flow_result
+            if flow_result and 'handle' in flow_result:
+                results[index]['flow_handle'] = flow_result['handle']
+
+
+@csrf_exempt
+@traced('onos_classify')
+def classify(request):
+    if request.method == 'POST':
+        data_list, error_response = _parse_classify_body(request)
+        if error_response is not None:
+            return error_response
 
-        results = []
+        results = [None] * len(data_list)
         flow_entries_to_log = []
-        for item in data_list:
+        
+        # Check if we have an active model
+        active_model_data = model_manager.get_active_model()
+        if not active_model_data:
+            return _no_active_model_response(data_list)
+        
+        pending = _decode_classify_items(data_list, results, model_manager.input_shape_of(active_model_data))
+        
+        predictions = []
+        if pending:
             try:
-                port_to_router = item.get('port_to_router')
-                port_to_client = item.get('port_to_client')
-                meter_plugin = Plugin.objects.get(name='tau-onos-metre-traffic-classification')
-                meter_plugin_installed = PluginInstallation.objects.filter(plugin=meter_plugin).exists()
-                model_name = item.get('model_name')
-                switch_ip = item.get('lan_ip_address')
-                classification = create_classification_from_json(item)
-                
-                # Check if we have an active model
-                if not model_manager.get_active_model():
-                    results.append({
-                        "status": "error",
-                        "message": "No active classification model available"
-                    })
-                    continue
-                
-                
-                
-                client_ip = item.get('src_ip')
-                dst_ip = item.get('dst_ip')
-                public_ip_for_asn = None
-                if client_ip and not is_private_ip(client_ip):
-                    public_ip_for_asn = client_ip
-                elif dst_ip and not is_private_ip(dst_ip):
-                    public_ip_for_asn = dst_ip
-                
                 # Use model_manager for prediction
-                predicted_app_tuple = model_manager.predict_flow(classification.payload, public_ip_for_asn)
-                application = predicted_app_tuple[0]
-                flow_data = {
-                    'src_ip': item.get('src_ip'),
-                    'dst_ip': item.get('dst_ip'),
-                    'src_mac': item.get('src_mac'),
-                    'dst_mac': item.get('dst_mac'),
-                    'src_port': item.get('src_port'),
-                    'dst_port': item.get('dst_port'),
-                    'classification': application,
-                }
-                flow_entries_to_log.append(flow_data)
-                exists = NetworkDevice.objects.filter(mac_address=item.get('src_mac')).exists()
-                if not exists:
-                    NetworkDevice.objects.create(mac_address=item.get('src_mac'), device_type='end_user').save()
-                flow_results = []
-                if meter_plugin_installed:
-                    switch_device = Device.objects.get(lan_ip_address=switch_ip, device_type='switch')
-                    controller = Controller.objects.get(switches=switch_device, type='onos')
-                    if Meter.objects.filter(categories__name=application, controller_device=controller.device).exists():
-                        current_time = now().time()
-                        current_day = now().weekday()
-                        matching_meters = Meter.objects.filter(
-                            categories__name=application,
-                            controller_device=controller.device
-                        )
-                        valid_meters = matching_meters
-                        src_mac = item.get('src_mac')
-                        if matching_meters.filter(network_device__mac_address=src_mac).exists():
-                            valid_meters = valid_meters.filter(network_device__mac_address=src_mac)
-                        if current_day < 5:
-                            weekday_meters = matching_meters.filter(
-                                Q(activation_period="weekday") & Q(start_time__lte=current_time) & Q(end_time__gte=current_time)
-                            )
-                            valid_meters = valid_meters | weekday_meters if weekday_meters.exists() else valid_meters
-                        else:
-                            weekend_meters = matching_meters.filter(
-                                Q(activation_period="weekend") & Q(start_time__lte=current_time) & Q(end_time__gte=current_time)
-                            )
-                            valid_meters = valid_meters | weekend_meters if weekend_meters.exists() else valid_meters
-                        if valid_meters.exists():
-                            meter = valid_meters.first()
-                            proto = 'udp'
-                            if item.get('tcp') == 1:
-                                proto = 'tcp'
-                            flow_rule = MeterFlowRule(
-                                proto=proto,
-                                client_port=classification.client_port,
-                                inbound_port_src=port_to_client,
-                                outbound_port_src=port_to_router,
-                                inbound_port_dst=port_to_router,
-                                outbound_port_dst=port_to_client,
-                                category=application,
-                                src_mac=classification.src_mac,
-                                dst_mac=item.get('dst_mac'),
-                                controller_ip=meter.controller_device.lan_ip_address,
-                                meter_id=meter.meter_id,
-                                switch_id=meter.switch_id
-                            )
-                            flow_results = flow_rule.make_flow_adjustment()
-                results.append({
-                    'status': 'success',
-                    'classification': application,
-                    'flow_results': flow_results
-                })
+                with span('predict'):
+                    predictions = model_manager.predict_flows(
+                        [entry[3] for entry in pending],
+                        [entry[4] for entry in pending]
+                    )
             except Exception as e:
-                results.append({'status': 'error', 'message': str(e)})
+                for index, *_ in pending:
+                    results[index] = {'status': 'error', 'message': str(e)}
+                pending = []
+        
+        if pending:
+            try:
+                # One upsert for the MACs of the batch that are not cached yet
+                pending, predictions = _drop_invalid_devices(pending, predictions, results)
+                with span('device_lookup'):
+                    device_registry.ensure_devices((entry[1].get('src_mac'), None) for entry in pending)
+            except Exception as e:
+                logger.exception("Error registering end-user devices")
+                for index, *_ in pending:
+                    results[index] = {'status': 'error', 'message': str(e)}
+                pending = []
+
+        flow_rules = _build_meter_flow_rules(pending, predictions, results, flow_entries_to_log)
+        if flow_rules:
+            _program_meter_flow_rules(flow_rules, results)
         # Batch log the flow entries
         logger.debug(f"[CLASSIFIER] Batching {len(flow_entries_to_log)} flow entries")
-        create_flow_entries_batch.delay(flow_entries_to_log)
+        with span('dispatch'):
+            create_flow_entries_batch.delay(flow_entries_to_log)
         return JsonResponse(results, safe=False, status=200)
 
 
+@csrf_exempt
+@traced('onos_classify')
+async def classify_async(request):
+    """
+    Native async version of classify, served when CLASSIFY_ASYNC_VIEWS is enabled
+
+    Inference is awaited on the micro-batcher and the active model is read with the
+    async Redis client. Cached devices and meter policies are resolved in the event
+    loop; device upserts, IP fallbacks, flow programming and the Celery dispatch run
+    in worker threads, so a request holds no thread while it waits.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Method not allowed'}, status=405)
+    data_list, error_response = _parse_classify_body(request)
+    if error_response is not None:
+        return error_response
+
+    results = [None] * len(data_list)
+    flow_entries_to_log = []
+    
+    active_model_data = await model_manager.aget_active_model()
+    if not active_model_data:
+        return _no_active_model_response(data_list)
+    
+    pending = _decode_classify_items(data_list, results, model_manager.input_shape_of(active_model_data))
+    
+    predictions = []
+    if pending:
+        try:
+            with span('predict'):
+                predictions = await model_manager.apredict_flows(
+                    [entry[3] for entry in pending],
+                    [entry[4] for entry in pending]
+                )
+        except Exception as e:
+            for index, *_ in pending:
+                results[index] = {'status': 'error', 'message': str(e)}
+            pending = []
+    
+    if pending:
+        try:
+            pending, predictions = _drop_invalid_devices(pending, predictions, results)
+            with span('device_lookup'):
+                await device_registry.aensure_devices([(entry[1].get('src_mac'), None) for entry in pending])
+        except Exception as e:
+            logger.exception("Error registering end-user devices")
+            for index, *_ in pending:
+                results[index] = {'status': 'error', 'message': str(e)}
+            pending = []
+
+    if pending and METER_POLICY_INDEX_ENABLED:
+        # Refreshing the index may query the database; selection itself is in memory
+        try:
+            meter_index = await sync_to_async(get_meter_policy_index)()
+        except Exception as e:
+            logger.exception("Error loading the meter policy index")
+            for index, *_ in pending:
+                results[index] = {'status': 'error', 'message': str(e)}
+            pending = []
+        flow_rules = _build_meter_flow_rules(
+            pending, predictions, results, flow_entries_to_log,
+            select=lambda application, switch_ip, src_mac: meter_index.select(application, switch_ip, src_mac)
+        )
+    elif pending:
+        flow_rules = await sync_to_async(_build_meter_flow_rules)(pending, predictions, results, flow_entries_to_log)
+    else:
+        flow_rules = []
+    if flow_rules:
+        await sync_to_async(_program_meter_flow_rules, thread_sensitive=False)(flow_rules, results)
+    logger.debug(f"[CLASSIFIER] Batching {len(flow_entries_to_log)} flow entries")
+    with span('dispatch'):
+        await sync_to_async(create_flow_entries_batch.delay, thread_sensitive=False)(flow_entries_to_log)
+    return JsonResponse(results, safe=False, status=200)
+
+
 class ClassificationStatsView(APIView):
     """
     API endpoint to view classification statistics
@@ -288,11 +501,14 @@ class ClassificationStatsView(APIView):
             total_count = totals['total_classifications'] or 0
             
             # Calculate weighted average for prediction time (weight by classification count)
+            # and merge the per-period latency histograms for range-wide percentiles
             # Use separate query to avoid aggregate-in-aggregate issues
             weighted_sum = 0
+            merged_histogram = LatencyHistogram()
             if total_count > 0:
-                for stat in stats_query.values('avg_prediction_time_ms', 'total_classifications'):
+                for stat in stats_query.values('avg_prediction_time_ms', 'total_classifications', 'prediction_time_histogram'):
                     weighted_sum += (stat['avg_prediction_time_ms'] or 0) * (stat['total_classifications'] or 0)
+                    merged_histogram.merge(LatencyHistogram.from_dict(stat['prediction_time_histogram']))
                 weighted_avg = weighted_sum / total_count
             else:
                 weighted_avg = 0
@@ -301,6 +517,10 @@ class ClassificationStatsView(APIView):
             summary = {
                 'total_classifications': total_count,
                 'avg_prediction_time_ms': round(weighted_avg, 2),
+                # Only covers periods saved with a histogram; None if there are none
+                'prediction_time_percentiles_ms': {
+                    key: round(value, 3) for key, value in merged_histogram.percentiles().items()
+                } if merged_histogram else None,
                 'confidence_breakdown': {
                     'high_confidence': {
                         'count': totals['high_confidence'] or 0,
@@ -352,6 +572,7 @@ class ClassificationStatsView(APIView):
             if not summary_only:
                 periods = []
                 for stat in stats[:100]:  # Limit to 100 most recent periods
+                    percentiles = stat.prediction_time_percentiles()
                     periods.append({
                         'period_start': stat.period_start.isoformat(),
                         'period_end': stat.period_end.isoformat(),
@@ -367,7 +588,10 @@ class ClassificationStatsView(APIView):
                         'dns_detections': stat.dns_detections,
                         'vpn_detections': stat.vpn_detections,
                         'asn_fallback_count': stat.asn_fallback_count,
-                        'avg_prediction_time_ms': round(stat.avg_prediction_time_ms, 2)
+                        'avg_prediction_time_ms': round(stat.avg_prediction_time_ms, 2),
+                        'prediction_time_percentiles_ms': {
+                            key: round(value, 3) for key, value in percentiles.items()
+                        } if percentiles else None
                     })
                 
                 response_data['data']['periods'] = periods
@@ -387,3 +611,138 @@ class ClassificationStatsView(APIView):
                 'message': 'Internal server error'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+
+class FlowProgrammingStatusView(APIView):
+    """
+    API endpoint for the state of flows queued by the classify pipelines
+    
+    Authentication: Required (Knox Token or API Key)
+    
+    GET returns the status of a flow_handle from a classify response: queued,
+    retrying, installed or failed, with the controller's result once programmed.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (HasAPIKeyOrIsAuthenticated,)
+    
+    def get(self, request, handle):
+        try:
+            flow_status = get_flow_programming_status(handle)
+        except Exception:
+            logger.exception("Error retrieving flow programming status")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if flow_status is None:
+            return Response({
+                'status': 'error',
+                'message': 'Unknown or expired flow handle'
+            }, status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'success', 'data': flow_status})
+
+
+class StageTimingStatsView(APIView):
+    """
+    API endpoint for per-stage latency of the classify pipelines
+    
+    Authentication: Required (Knox Token or API Key)
+    
+    GET returns count, mean and p50/p90/p99/p999 (ms) per pipeline and stage,
+    accumulated across all workers since the last reset. DELETE resets them.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (HasAPIKeyOrIsAuthenticated,)
+    
+    def get(self, request):
+        try:
+            return Response({
+                'status': 'success',
+                'data': {
+                    'enabled': stage_recorder.enabled,
+                    'sample_rate': stage_recorder.sample_rate,
+                    'pipelines': get_stage_summary()
+                }
+            })
+        except Exception:
+            logger.exception("Error retrieving stage timing stats")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def delete(self, request):
+        try:
+            stage_recorder.reset()
+            return Response({'status': 'success', 'message': 'Stage timing stats reset'})
+        except Exception:
+            logger.exception("Error resetting stage timing stats")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class StageTimingPrometheusView(APIView):
+    """
+    Stage latency histograms in the Prometheus text format
+    
+    Authentication: Required (Knox Token or API Key)
+    Only available when STAGE_METRICS_PROMETHEUS_ENABLED is set.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (HasAPIKeyOrIsAuthenticated,)
+    
+    def get(self, request):
+        if not getattr(settings, 'STAGE_METRICS_PROMETHEUS_ENABLED', False):
+            return JsonResponse({'status': 'error', 'message': 'Prometheus endpoint is disabled'}, status=404)
+        try:
+            return HttpResponse(render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+        except Exception:
+            logger.exception("Error rendering stage timing metrics")
+            return HttpResponse('# error rendering metrics\n', status=500, content_type='text/plain')
+
+
+class InstalledFlowCacheStatsView(APIView):
+    """
+    API endpoint for the installed-flow cache of the flow programming paths
+    
+    Authentication: Required (Knox Token or API Key)
+    
+    GET returns hits, misses, stored entries and hit rate per controller type.
+    DELETE resets the counters; with ?flows=true it also forgets the installed
+    flows (after a controller restart), so the next pushes reach the controllers.
+    """
+    authentication_classes = (TokenAuthentication,)
+    permission_classes = (HasAPIKeyOrIsAuthenticated,)
+    
+    def get(self, request):
+        try:
+            return Response({
+                'status': 'success',
+                'data': {
+                    'enabled': installed_flow_cache.enabled,
+                    'controllers': installed_flow_cache.get_stats()
+                }
+            })
+        except Exception:
+            logger.exception("Error retrieving installed-flow cache stats")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def delete(self, request):
+        try:
+            installed_flow_cache.reset_stats()
+            message = 'Installed-flow cache stats reset'
+            if request.query_params.get('flows', '').lower() in ('1', 'true', 'yes'):
+                removed = installed_flow_cache.clear()
+                message = f'{message}, {removed} installed flows forgotten'
+            return Response({'status': 'success', 'message': message})
+        except Exception:
+            logger.exception("Error resetting installed-flow cache")
+            return Response({
+                'status': 'error',
+                'message': 'Internal server error'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -11,10 +11,13 @@ import os
 import logging
 import uuid
 import ipaddress
-from typing import Tuple, Set, Optional, List
+from typing import Tuple, Set, Optional, Sequence, Union
+import numpy as np
 from django.conf import settings
 import redis
 
+from .ip_reputation import cidrs_to_ranges, merge_ranges, ranges_contain, ipv4_to_int
+
 logger = logging.getLogger(__name__)
 
 # Redis configuration - same as DNS pattern
@@ -57,8 +60,10 @@ class VPNNetworkLoader:
                 retry_on_timeout=True,      # Automatically retry once on timeout
             )
         
-        # Cache for sorted networks (loaded on first access)
-        self._sorted_networks: Optional[List[ipaddress.IPv4Network]] = None
+        # Merged, sorted uint32 VPN ranges (loaded on first access)
+        self._range_starts: Optional[np.ndarray] = None
+        self._range_ends: Optional[np.ndarray] = None
+        self._source_count = 0
 
     
     def load_vpn_networks(self, batch_size: int = 1000) -> Tuple[bool, int, str]:
@@ -167,44 +172,57 @@ class VPNNetworkLoader:
             logger.exception(error_msg)
             return False, 0, error_msg
     
-    def _load_networks_cache(self) -> List[ipaddress.IPv4Network]:
+    def _load_networks_cache(self) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Load and cache sorted networks from Redis for efficient binary search.
-        Networks are cached in memory to avoid repeated Redis lookups.
+        Load VPN CIDRs from Redis and cache them as merged uint32 ranges.
+        Overlapping and adjacent CIDRs collapse into one range, so a lookup is a
+        single searchsorted over two flat arrays instead of a list of IPv4Network objects.
         
         Returns:
-            Sorted list of IPv4Network objects
+            Tuple of sorted, non-overlapping start and end arrays
         """
-        # Check if cache is still valid (reload if Redis key was updated)
         try:
-            # Get all CIDR ranges from Redis
             cidr_ranges = self.redis_conn.smembers(REDIS_VPN_KEY)
-            
-            # Convert to IPv4Network objects and sort by network address
-            networks = []
-            for cidr in cidr_ranges:
-                try:
-                    network = ipaddress.IPv4Network(cidr, strict=False)
-                    networks.append(network)
-                except (ValueError, ipaddress.AddressValueError):
-                    logger.warning(f"Invalid CIDR range in Redis: {cidr}")
-                    continue
-            
-            # Sort by network address for efficient binary search
-            networks.sort(key=lambda n: int(n.network_address))
-            
-            self._sorted_networks = networks
-            logger.debug(f"Cached {len(networks)} VPN networks for efficient lookup")
-            return networks
+            starts, ends = merge_ranges(*cidrs_to_ranges(cidr_ranges))
+            self._range_starts, self._range_ends = starts, ends
+            self._source_count = len(cidr_ranges)
+            logger.debug(f"Cached {len(cidr_ranges)} VPN networks as {len(starts)} merged ranges")
+            return starts, ends
             
         except Exception as e:
             logger.exception(f"Error loading VPN networks cache: {e}")
-            return []
+            # Cache the empty ranges so lookups return False instead of retrying Redis per flow
+            self._range_starts, self._range_ends = np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint32)
+            self._source_count = 0
+            return self._range_starts, self._range_ends
+    
+    def verify_vpn_ips(self, ip_addresses: Union[Sequence[str], np.ndarray]) -> np.ndarray:
+        """
+        Check many IP addresses against the VPN CIDR ranges in one vectorised call.
+        
+        Args:
+            ip_addresses: IPv4 strings, or an integer array of IPv4 addresses
+            
+        Returns:
+            np.ndarray: Boolean array aligned with ip_addresses (False for invalid/IPv6)
+        """
+        if self._range_starts is None:
+            self._load_networks_cache()
+        
+        if isinstance(ip_addresses, np.ndarray) and ip_addresses.dtype.kind in 'ui':
+            return ranges_contain(self._range_starts, self._range_ends, ip_addresses)
+        
+        ip_ints = [ipv4_to_int(ip) for ip in ip_addresses]
+        valid = np.fromiter((ip_int is not None for ip_int in ip_ints), dtype=bool, count=len(ip_ints))
+        result = np.zeros(len(ip_ints), dtype=bool)
+        if valid.any():
+            packed = np.fromiter((ip_int for ip_int in ip_ints if ip_int is not None), dtype=np.uint32)
+            result[valid] = ranges_contain(self._range_starts, self._range_ends, packed)
+        return result
     
     def verify_vpn_ip(self, ip_address: str) -> bool:
         """
         Verify if a specific IP address falls within any VPN CIDR range stored in Redis.
-        Uses binary search on sorted networks for O(log n) lookup performance.
         
         Args:
             ip_address: IP address to check
@@ -212,77 +230,10 @@ class VPNNetworkLoader:
         Returns:
             bool: True if IP is in any VPN CIDR range, False otherwise
         """
-        try:
-            # Validate IP address
-            ip = ipaddress.IPv4Address(ip_address)
-            ip_int = int(ip)
-            
-            # Load networks cache if not already loaded
-            if self._sorted_networks is None:
-                self._sorted_networks = self._load_networks_cache()
-            
-            if not self._sorted_networks:
-                return False
-            
-            # Use binary search to find potential matches
-            # Since networks are sorted by network_address, we can use bisect
-            # to find networks where network_address <= ip <= broadcast_address
-            
-            # Find insertion point for IP (networks sorted by network_address)
-            # We need to check networks that could contain this IP
-            # A network contains IP if: network_address <= IP <= broadcast_address
-            
-            # Binary search for networks that start before or at our IP
-            # Then check if IP falls within any of those networks
-            networks = self._sorted_networks
-            
-            # Find the rightmost network where network_address <= IP
-            # This gives us a starting point to check
-            left = 0
-            right = len(networks) - 1
-            best_idx = -1
-            counter = 0
-            
-            while left <= right:
-                counter += 1
-                mid = (left + right) // 2
-                if int(networks[mid].network_address) <= ip_int:
-                    best_idx = mid
-                    left = mid + 1
-                else:
-                    right = mid - 1
-            logger.debug(f" [VPN Loader] Binary search completed in {counter} iterations.")
-            # Check networks backwards from best_idx
-            # Since networks are sorted by network_address and best_idx is the rightmost
-            # network where network_address <= ip_int, all networks we check will have
-            # network_address <= ip_int, so we only need to check if IP is within broadcast_address
-            for i in range(best_idx, -1, -1):
-                network = networks[i]
-                # Check if IP is in this network (network_address <= IP <= broadcast_address)
-                if ip_int <= int(network.broadcast_address) and ip in network:
-                    return True
-            
-            return False
-            
-        except (ValueError, ipaddress.AddressValueError) as e:
-            logger.warning(f"Invalid IP address for VPN check: {ip_address} - {e}")
-            return False
-        except Exception as e:
-            logger.exception(f" [VPN Loader] Error verifying VPN IP: {e}. Fallback to simple iteration.")
-            # Fallback to simple iteration if binary search fails
-            try:
-                cidr_ranges = self.redis_conn.smembers(REDIS_VPN_KEY)
-                ip = ipaddress.IPv4Address(ip_address)
-                for cidr in cidr_ranges:
-                    try:
-                        network = ipaddress.IPv4Network(cidr, strict=False)
-                        if ip in network:
-                            return True
-                    except (ValueError, ipaddress.AddressValueError):
-                        continue
-            except Exception:
-                pass
+        if ipv4_to_int(ip_address) is None:
+            logger.warning(f"Invalid IP address for VPN check: {ip_address}")
             return False
+        return bool(self.verify_vpn_ips([ip_address])[0])
     
     def get_vpn_count(self) -> int:
         """
@@ -302,13 +253,14 @@ class VPNNetworkLoader:
         Get the status of the in-memory network cache.
         
         Returns:
-            dict: Dictionary with 'is_loaded' (bool) and 'count' (int) keys.
+            dict: Dictionary with 'is_loaded' (bool), 'count' (int) and 'merged_ranges' (int) keys.
                   'is_loaded' indicates if cache is populated, 'count' is the
-                  number of networks in cache (0 if not loaded or empty).
+                  number of CIDRs loaded (0 if not loaded or empty) and
+                  'merged_ranges' the number of ranges after merging.
         """
-        if self._sorted_networks is None:
-            return {'is_loaded': False, 'count': 0}
-        return {'is_loaded': True, 'count': len(self._sorted_networks)}
+        if self._range_starts is None:
+            return {'is_loaded': False, 'count': 0, 'merged_ranges': 0}
+        return {'is_loaded': True, 'count': self._source_count, 'merged_ranges': len(self._range_starts)}
     
     def get_sample_vpn_networks(self, count: int = 10) -> Set[str]:
         """
@@ -44,6 +44,10 @@ TELEGRAM_API_KEY=env('TELEGRAM_API_KEY')
 
 # Celery Config:
 CELERY_BROKER_URL=env("CELERY_BROKER_URL")
+CELERY_TASK_ROUTES = {
+    'classifier.tasks.drain_flow_programming_queue': {'queue': 'flow_programming'},
+    'classifier.tasks.requeue_flow_jobs': {'queue': 'flow_programming'},
+}
 # CELERY_BEAT_SCHEDULE = {
 #     'aggregate-flows-every-60-seconds': {
 #         'task': 'network_data.tasks.aggregate_flows',
@@ -64,6 +68,130 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Classifier inference micro-batching: concurrent predict calls are coalesced into
+# a single forward pass of up to CLASSIFIER_BATCH_MAX_SIZE rows, waiting at most
+# CLASSIFIER_BATCH_MAX_WAIT_MS for the batch to fill.
+CLASSIFIER_BATCHING_ENABLED = env.bool("CLASSIFIER_BATCHING_ENABLED", default=True)
+CLASSIFIER_BATCH_MAX_SIZE = env.int("CLASSIFIER_BATCH_MAX_SIZE", default=64)
+CLASSIFIER_BATCH_MAX_WAIT_MS = env.float("CLASSIFIER_BATCH_MAX_WAIT_MS", default=2.0)
+
+# Optional out-of-process inference server (manage.py run_inference_server). When set,
+# web and Celery workers forward forward-passes to it instead of loading the models.
+# Format: unix:///path/to.sock or tcp://host:port. The protocol is unauthenticated, so a
+# tcp:// server only binds to loopback or private addresses.
+CLASSIFIER_INFERENCE_SERVER = env("CLASSIFIER_INFERENCE_SERVER", default="")
+# Largest request body the server accepts (64 MiB: ~14,900 rows of 225 x 5 float32)
+CLASSIFIER_INFERENCE_MAX_BODY_BYTES = env.int("CLASSIFIER_INFERENCE_MAX_BODY_BYTES", default=64 * 1024 * 1024)
+# Seconds to wait for a forward pass, on the inference server or the local micro-batcher
+CLASSIFIER_INFERENCE_TIMEOUT = env.float("CLASSIFIER_INFERENCE_TIMEOUT", default=5.0)
+
+# Inference backend for locally loaded models: "keras" or "numpy" (pure-NumPy forward
+# pass for Sequential Conv1D/Dense models, falls back to Keras for anything else).
+# CLASSIFIER_COMPILED_VERIFY checks the compiled output against Keras at load time;
+# disable it to keep TensorFlow out of the process entirely.
+CLASSIFIER_INFERENCE_BACKEND = env("CLASSIFIER_INFERENCE_BACKEND", default="keras")
+CLASSIFIER_COMPILED_VERIFY = env.bool("CLASSIFIER_COMPILED_VERIFY", default=True)
+
+# In-process ASN index (utils.ip_lookup_service): loaded once from the ip_asn_map ZSET
+# and reloaded when populate_redis_asn bumps the version key, polled at this interval.
+ASN_INDEX_ENABLED = env.bool("ASN_INDEX_ENABLED", default=True)
+ASN_INDEX_REFRESH_SECONDS = env.float("ASN_INDEX_REFRESH_SECONDS", default=30.0)
+# Memoised ASN organisation -> category matches, keyed by (asn, model, table)
+ASN_MATCH_CACHE_SIZE = env.int("ASN_MATCH_CACHE_SIZE", default=4096)
+
+# Memory-mapped IP reputation snapshot (DNS + VPN + ASN), rebuilt by load_dns_servers,
+# load_vpn_networks and populate_redis_asn. Workers without the file fall back to Redis.
+IP_REPUTATION_SNAPSHOT_ENABLED = env.bool("IP_REPUTATION_SNAPSHOT_ENABLED", default=True)
+IP_REPUTATION_SNAPSHOT_PATH = env("IP_REPUTATION_SNAPSHOT_PATH", default=os.path.join(BASE_DIR, "data", "ip_reputation.snapshot"))
+IP_REPUTATION_REFRESH_SECONDS = env.float("IP_REPUTATION_REFRESH_SECONDS", default=30.0)
+
+# Classification stats are accumulated per process and written to Redis in one pipeline
+# every CLASSIFICATION_STATS_FLUSH_INTERVAL seconds or after CLASSIFICATION_STATS_FLUSH_EVENTS
+# classifications, whichever comes first. Disable to write every classification directly.
+CLASSIFICATION_STATS_BUFFERED = env.bool("CLASSIFICATION_STATS_BUFFERED", default=True)
+CLASSIFICATION_STATS_FLUSH_INTERVAL = env.float("CLASSIFICATION_STATS_FLUSH_INTERVAL", default=1.0)
+CLASSIFICATION_STATS_FLUSH_EVENTS = env.int("CLASSIFICATION_STATS_FLUSH_EVENTS", default=500)
+
+# Per-stage latency of the classify pipelines (classifier.stage_timing). A fraction
+# STAGE_METRICS_SAMPLE_RATE of requests is timed; histograms are merged into Redis every
+# STAGE_METRICS_FLUSH_INTERVAL seconds and served at /api/v1/classification-stats/stages/
+# (and in Prometheus format at .../stages/metrics/ when STAGE_METRICS_PROMETHEUS_ENABLED).
+STAGE_METRICS_ENABLED = env.bool("STAGE_METRICS_ENABLED", default=True)
+STAGE_METRICS_SAMPLE_RATE = env.float("STAGE_METRICS_SAMPLE_RATE", default=1.0)
+STAGE_METRICS_FLUSH_INTERVAL = env.float("STAGE_METRICS_FLUSH_INTERVAL", default=5.0)
+STAGE_METRICS_PROMETHEUS_ENABLED = env.bool("STAGE_METRICS_PROMETHEUS_ENABLED", default=False)
+
+# ONOS/ODL meter selection from in-memory indexes (onos.meter_policy, odl.meter_resolver). Model signals
+# bump a Redis version key; each process checks it at most every METER_POLICY_REFRESH_SECONDS.
+METER_POLICY_INDEX_ENABLED = env.bool("METER_POLICY_INDEX_ENABLED", default=True)
+METER_POLICY_REFRESH_SECONDS = env.float("METER_POLICY_REFRESH_SECONDS", default=2.0)
+
+# End-user devices seen by the classify paths (network_device.registry): MACs are trusted
+# for DEVICE_REGISTRY_TTL_SECONDS; unseen MACs and IP changes are upserted once per batch.
+# Device edits clear the cache of every process, checked at most every DEVICE_REGISTRY_REFRESH_SECONDS.
+DEVICE_REGISTRY_TTL_SECONDS = env.float("DEVICE_REGISTRY_TTL_SECONDS", default=300.0)
+DEVICE_REGISTRY_MAX_ENTRIES = env.int("DEVICE_REGISTRY_MAX_ENTRIES", default=100000)
+DEVICE_REGISTRY_REFRESH_SECONDS = env.float("DEVICE_REGISTRY_REFRESH_SECONDS", default=2.0)
+
+# ONOS REST API (onos.onos_client): one keep-alive session per controller; a classify
+# request installs all of its flow rules with a single POST /onos/v1/flows per controller.
+ONOS_USERNAME = env("ONOS_USERNAME", default="onos")
+ONOS_PASSWORD = env("ONOS_PASSWORD", default="rocks")
+ONOS_REST_PORT = env.int("ONOS_REST_PORT", default=8181)
+ONOS_REQUEST_TIMEOUT = env.float("ONOS_REQUEST_TIMEOUT", default=10.0)
+ONOS_POOL_MAXSIZE = env.int("ONOS_POOL_MAXSIZE", default=10)
+
+# OpenDaylight RESTCONF (odl.odl_client): one keep-alive session per controller; flow PUTs
+# of a classify batch run concurrently, at most ODL_MAX_CONCURRENCY per controller and worker.
+ODL_USERNAME = env("ODL_USERNAME", default="admin")
+ODL_PASSWORD = env("ODL_PASSWORD", default="admin")
+ODL_REST_PORT = env.int("ODL_REST_PORT", default=8181)
+ODL_REQUEST_TIMEOUT = env.float("ODL_REQUEST_TIMEOUT", default=15.0)
+ODL_MAX_CONCURRENCY = env.int("ODL_MAX_CONCURRENCY", default=8)
+
+# Asynchronous flow programming (classifier.flow_programming): classify answers with a
+# flow_handle and the rules are installed by workers consuming the "flow_programming"
+# queue, one drainer per controller. Off by default: rules are installed in the request.
+FLOW_PROGRAMMING_ASYNC = env.bool("FLOW_PROGRAMMING_ASYNC", default=False)
+FLOW_PROGRAMMING_BATCH_SIZE = env.int("FLOW_PROGRAMMING_BATCH_SIZE", default=200)
+FLOW_PROGRAMMING_MAX_ATTEMPTS = env.int("FLOW_PROGRAMMING_MAX_ATTEMPTS", default=5)
+FLOW_PROGRAMMING_RETRY_BACKOFF = env.float("FLOW_PROGRAMMING_RETRY_BACKOFF", default=2.0)
+FLOW_PROGRAMMING_RESULT_TTL = env.int("FLOW_PROGRAMMING_RESULT_TTL", default=3600)
+
+# Installed-flow cache (classifier.installed_flows): a rule identical to one the controller
+# accepted less than its timeout minus INSTALLED_FLOW_CACHE_MARGIN seconds ago is not sent again.
+INSTALLED_FLOW_CACHE_ENABLED = env.bool("INSTALLED_FLOW_CACHE_ENABLED", default=True)
+INSTALLED_FLOW_CACHE_MARGIN = env.int("INSTALLED_FLOW_CACHE_MARGIN", default=30)
+
+# Serve /api/v1/classify/ and /api/v1/odl/classify/ with the native async views: requests
+# await inference and hold no worker thread while they wait (needs an ASGI server).
+CLASSIFY_ASYNC_VIEWS = env.bool("CLASSIFY_ASYNC_VIEWS", default=False)
+
+# flow_updates WebSocket notifications (classifier.flow_notifier): each process sends the flows
+# classified in a FLOW_UPDATES_COALESCE_MS window as one message with per-category counts
+# and a sample of up to FLOW_UPDATES_SAMPLE_SIZE flows.
+FLOW_UPDATES_COALESCE_MS = env.int("FLOW_UPDATES_COALESCE_MS", default=250)
+FLOW_UPDATES_SAMPLE_SIZE = env.int("FLOW_UPDATES_SAMPLE_SIZE", default=20)
+
+# Port link speeds for OpenFlow metric reports (device_monitoring.link_speeds): cached per
+# process and reloaded after Port/Device changes, checked at most every LINK_SPEED_REFRESH_SECONDS.
+LINK_SPEED_REFRESH_SECONDS = env.float("LINK_SPEED_REFRESH_SECONDS", default=5.0)
+
+# Write-behind telemetry (device_monitoring.telemetry_buffer): device and port stats reports are
+# appended to a Redis stream and stored in bulk by `manage.py flush_telemetry` every
+# TELEMETRY_FLUSH_INTERVAL_MS. Off by default: reports are written in the request. An entry the
+# database rejects on its TELEMETRY_MAX_DELIVERIES-th delivery moves to the stream telemetry:dead.
+TELEMETRY_WRITE_BEHIND = env.bool("TELEMETRY_WRITE_BEHIND", default=False)
+TELEMETRY_FLUSH_INTERVAL_MS = env.int("TELEMETRY_FLUSH_INTERVAL_MS", default=500)
+TELEMETRY_FLUSH_BATCH_SIZE = env.int("TELEMETRY_FLUSH_BATCH_SIZE", default=2000)
+TELEMETRY_CLAIM_IDLE_MS = env.int("TELEMETRY_CLAIM_IDLE_MS", default=30000)
+TELEMETRY_STREAM_MAXLEN = env.int("TELEMETRY_STREAM_MAXLEN", default=1000000)
+TELEMETRY_MAX_DELIVERIES = env.int("TELEMETRY_MAX_DELIVERIES", default=5)
+
+# Hypertable ingestion (utils.db_utils.copy_rows): load FlowStat, Flow, DeviceStats,
+# PortUtilizationStats and DevicePingStats rows with COPY; False falls back to bulk_create.
+DB_BULK_LOAD_COPY = env.bool("DB_BULK_LOAD_COPY", default=True)
+
 INSTALLED_APPS = [
     'daphne',
     'celery',
@@ -18,24 +18,28 @@
 # For inquiries, contact Keegan White at keeganwhite@taurinetech.com.
 
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from ovs_management.views import GetBridgePortsView
 from ovs_install.views import InstallOvsView
 from ovs_management.views import EditBridge, GetDevicePorts, CreateBridge, GetDeviceBridges, DeleteBridge, DeleteControllerView, GetUnassignedDevicePorts
 from controller.views import InstallControllerView
-from classifier.views import classify, ClassificationStatsView
+from classifier.views import classify, classify_async, ClassificationStatsView, StageTimingStatsView, StageTimingPrometheusView, FlowProgrammingStatusView, InstalledFlowCacheStatsView
 from onos.views import MeterListView, CreateMeterView, SwitchList, MeterListByIdView, update_meter, delete_meter
 from device_monitoring.views import post_device_stats, post_openflow_metrics, install_system_stats_monitor, install_ovs_qos_monitor, install_sniffer
 from general.views import (AddDeviceView, DeviceDetailView, DeviceListView, PluginListView, InstallPluginDatabaseAlterView, UninstallPluginDatabaseAlterView, CheckPluginInstallation, InstallPluginView,
                            CheckDeviceConnectionView, DeleteDeviceView, ForceDeleteDeviceView, UpdateDeviceView,
                             CategoryListView)
 from network_map.views import OnosNetworkMap, OvsNetworkMap
-from odl.views import CreateOpenDaylightMeterView, odl_classify_and_apply_policy, OdlMeterDetailView, OdlMeterListView, OdlControllerNodesView, ModelManagementView, ModelLoadView, ModelInfoView
+from odl.views import CreateOpenDaylightMeterView, odl_classify_and_apply_policy, odl_classify_and_apply_policy_async, OdlMeterDetailView, OdlMeterListView, OdlControllerNodesView, ModelManagementView, ModelLoadView, ModelInfoView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
 
 from knox import views as knox_views
 from .views import LoginView
+
+# Native async classify views (see classifier.views.classify_async)
+CLASSIFY_ASYNC_VIEWS = getattr(settings, 'CLASSIFY_ASYNC_VIEWS', False)
 urlpatterns = [
     path('admin/', admin.site.urls),
 
@@ -91,8 +95,12 @@ urlpatterns = [
     path('api/v1/install-controller/<str:controller_type>/', InstallControllerView.as_view(), name='install-controller'),
 
     # ---- CLASSIFIER ----
-    path('api/v1/classify/', classify, name='classify'),
+    path('api/v1/classify/', classify_async if CLASSIFY_ASYNC_VIEWS else classify, name='classify'),
     path('api/v1/classification-stats/', ClassificationStatsView.as_view(), name='classification-stats'),
+    path('api/v1/classification-stats/stages/', StageTimingStatsView.as_view(), name='classification-stage-stats'),
+    path('api/v1/classification-stats/stages/metrics/', StageTimingPrometheusView.as_view(), name='classification-stage-metrics'),
+    path('api/v1/classification-stats/installed-flows/', InstalledFlowCacheStatsView.as_view(), name='installed-flow-cache-stats'),
+    path('api/v1/flow-programming/<str:handle>/', FlowProgrammingStatusView.as_view(), name='flow-programming-status'),
 
     # ---- DEVICES ----
     path('api/v1/devices/', DeviceListView.as_view(), name='device-list'),
@@ -113,7 +121,7 @@ urlpatterns = [
 
     # ---- ODL ----
     path('api/v1/odl/create-meter/', CreateOpenDaylightMeterView.as_view(), name='odl-create-meter'),
-    path('api/v1/odl/classify/', odl_classify_and_apply_policy, name='odl-classify'),
+    path('api/v1/odl/classify/', odl_classify_and_apply_policy_async if CLASSIFY_ASYNC_VIEWS else odl_classify_and_apply_policy, name='odl-classify'),
     path('api/v1/odl/meters/<int:pk>/', OdlMeterDetailView.as_view(), name='odl-meter-detail'),
     path('api/v1/odl/meters/', OdlMeterListView.as_view(), name='odl-meter-list'),
 
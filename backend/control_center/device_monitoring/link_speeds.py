@@ -0,0 +1,102 @@
+"""
+Port link speeds and utilisation for OpenFlow metric reports
+
+qos.py reports every port of a switch once a second. Instead of querying the Port
+table per port, link speeds are served from a process-wide map of
+(device_ip, port_name) -> link_speed, loaded with one query and rebuilt when Port or
+Device rows change (device_monitoring.signals bumps a Redis version key, which every
+process checks at most every LINK_SPEED_REFRESH_SECONDS).
+
+Usage:
+    from device_monitoring.link_speeds import get_link_speed_map, compute_port_utilization
+
+    rows = compute_port_utilization(device_ip, stats, get_link_speed_map())
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+
+from general.models import Port
+from utils.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+LINK_SPEED_REFRESH_SECONDS = getattr(settings, 'LINK_SPEED_REFRESH_SECONDS', 5.0)
+LINK_SPEED_VERSION_KEY = 'device_monitoring:link_speeds:version'
+
+LinkSpeedMap = Dict[Tuple[str, str], int]
+
+
+def load_link_speed_map(version: Optional[str] = None) -> LinkSpeedMap:
+    """
+    Read the link speed of every port that has one
+
+    Args:
+        version: Version the map is built for (unused, passed by VersionedCache)
+
+    Returns:
+        dict of (device LAN IP, port name) -> link speed in Mb/s
+    """
+    rows = Port.objects.filter(link_speed__gt=0).values_list('device__lan_ip_address', 'name', 'link_speed')
+    return {(device_ip, name): link_speed for device_ip, name, link_speed in rows if device_ip}
+
+
+_cache: VersionedCache[LinkSpeedMap] = VersionedCache(
+    'port link speeds', LINK_SPEED_VERSION_KEY, load_link_speed_map, LINK_SPEED_REFRESH_SECONDS,
+)
+
+
+def get_link_speed_map(force_refresh: bool = False) -> LinkSpeedMap:
+    """Return the process-wide link speed map, reloading it when the version changes"""
+    return _cache.get(force_refresh)
+
+
+def invalidate_link_speed_map():
+    """
+    Drop this process's map and bump the shared version so every worker reloads
+
+    Called from device_monitoring.signals once the triggering transaction has committed.
+    """
+    _cache.invalidate()
+
+
+def compute_port_utilization(device_ip: str, stats: dict, link_speeds: LinkSpeedMap) -> List[dict]:
+    """
+    Throughput and utilisation of every port in a qos.py report
+
+    Throughput is rx_bytes_diff * 8 / duration_diff in Mb/s (0 when the duration is
+    not positive). Utilisation is throughput / link speed in percent, and 0.0 for ports
+    without a link speed.
+
+    Args:
+        device_ip: LAN IP of the reporting switch
+        stats: port name -> {"rx_bytes_diff", "tx_bytes_diff", "duration_diff"}
+        link_speeds: Map from get_link_speed_map()
+
+    Returns:
+        list of dicts with the PortUtilizationStats fields, in report order
+    """
+    if not stats:
+        return []
+    port_names = list(stats)
+    rx_bytes = np.array([stats[name]['rx_bytes_diff'] for name in port_names], dtype=np.float64)
+    durations = np.array([stats[name]['duration_diff'] for name in port_names], dtype=np.float64)
+    speeds = np.array([link_speeds.get((device_ip, name), 0) for name in port_names], dtype=np.float64)
+
+    throughput = np.divide(rx_bytes * 8, durations * 1_000_000, out=np.zeros_like(rx_bytes), where=durations > 0)
+    utilization = np.divide(throughput * 100, speeds, out=np.zeros_like(throughput), where=speeds > 0)
+
+    return [
+        {
+            'port_name': name,
+            'throughput_mbps': float(throughput[i]),
+            'utilization_percent': float(utilization[i]),
+            'rx_bytes_diff': stats[name]['rx_bytes_diff'],
+            'tx_bytes_diff': stats[name]['tx_bytes_diff'],
+            'duration_diff': stats[name]['duration_diff'],
+        }
+        for i, name in enumerate(port_names)
+    ]
@@ -0,0 +1,95 @@
+import logging
+import os
+import signal
+import socket
+import threading
+
+import redis
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from device_monitoring.telemetry_buffer import TELEMETRY_FLUSH_BATCH_SIZE, telemetry_buffer
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Drain the write-behind telemetry stream into DeviceStats and PortUtilizationStats'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval-ms',
+            type=int,
+            default=getattr(settings, 'TELEMETRY_FLUSH_INTERVAL_MS', 500),
+            help='Time between flushes once the stream is drained (default: TELEMETRY_FLUSH_INTERVAL_MS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=TELEMETRY_FLUSH_BATCH_SIZE,
+            help='Stream entries per bulk insert (default: TELEMETRY_FLUSH_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--consumer',
+            type=str,
+            default=None,
+            help='Consumer name in the group (default: hostname-pid)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain what is buffered now and exit'
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print the stream length and pending entries and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            stats = telemetry_buffer.get_stats()
+            self.stdout.write(f"Stream length: {stats['length']}")
+            self.stdout.write(f"Pending (read, not acknowledged): {stats['pending']}")
+            for consumer in stats['consumers']:
+                self.stdout.write(f"  {consumer['name']}: {consumer['pending']}")
+            self.stdout.write(f"Dead-lettered (rejected by the database): {stats['dead_letters']}")
+            return
+
+        consumer = options['consumer'] or f'{socket.gethostname()}-{os.getpid()}'
+        batch_size = max(1, options['batch_size'])
+        interval = max(10, options['interval_ms']) / 1000.0
+
+        if options['once']:
+            stored = self._drain(consumer, batch_size)
+            self.stdout.write(self.style.SUCCESS(f'Stored {stored} telemetry entries'))
+            return
+
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+        self.stdout.write(self.style.SUCCESS(
+            f'Flushing telemetry as {consumer} every {int(interval * 1000)} ms (batch size {batch_size})'
+        ))
+        try:
+            while not stopped.is_set():
+                try:
+                    self._drain(consumer, batch_size)
+                except redis.RedisError as e:
+                    logger.error(f"Telemetry flush failed: {e}")
+                stopped.wait(interval)
+        except KeyboardInterrupt:
+            pass
+        # Whatever arrived since the last flush
+        try:
+            self._drain(consumer, batch_size)
+        except redis.RedisError as e:
+            logger.error(f"Final telemetry flush failed, entries stay in the stream: {e}")
+        self.stdout.write('Telemetry flusher stopped')
+
+    def _drain(self, consumer, batch_size):
+        stored = 0
+        while True:
+            count = telemetry_buffer.flush(consumer, count=batch_size)
+            stored += count
+            if count < batch_size:
+                return stored
@@ -0,0 +1,24 @@
+# Generated by Django 5.1 on 2026-10-18 09:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('device_monitoring', '0020_remove_devicepingstats_device_moni_timestamp_is_alive_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicestats',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='portutilizationstats',
+            name='timestamp',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -30,7 +30,8 @@ class DeviceStats(models.Model):
     cpu = models.FloatField(help_text="CPU usage percentage")
     memory = models.FloatField(help_text="Memory usage percentage")
     disk = models.FloatField(help_text="Disk usage percentage")
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set explicitly by the telemetry buffer so buffered rows keep the report time
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         ordering = ['-timestamp']
@@ -71,7 +72,8 @@ class PortUtilizationStats(models.Model):
     rx_bytes_diff = models.BigIntegerField(help_text="Received bytes delta from previous measurement")
     tx_bytes_diff = models.BigIntegerField(help_text="Transmitted bytes delta from previous measurement")
     duration_diff = models.FloatField(help_text="Time period for the measurement in seconds")
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set explicitly by the telemetry buffer so buffered rows keep the report time
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
 
     class Meta:
         ordering = ['-timestamp']
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from general.models import Device, Port
+from .link_speeds import invalidate_link_speed_map
+
+
+@receiver(post_save, sender=Port)
+@receiver(post_delete, sender=Port)
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def link_speeds_changed(sender, instance, **kwargs):
+    # Reload only after commit, so other workers do not read the old rows
+    transaction.on_commit(invalidate_link_speed_map)
@@ -9,6 +9,7 @@ from datetime import timedelta
 import logging
 
 from .models import DeviceStats, DeviceHealthAlert, PortUtilizationStats, PortUtilizationAlert, DevicePingStats
+from utils.db_utils import copy_rows
 from .utils import ping_device, ping_devices_with_fallback
 from notification.models import Notification
 from network_device.models import NetworkDevice
@@ -351,13 +352,11 @@ def ping_all_monitored_devices():
             if ip_address in ip_to_device:
                 device = ip_to_device[ip_address]
                 
-                stats_to_create.append(
-                    DevicePingStats(
-                        device=device,
-                        is_alive=is_alive,
-                        successful_pings=successful_count
-                    )
-                )
+                stats_to_create.append({
+                    'device_id': device.pk,
+                    'is_alive': is_alive,
+                    'successful_pings': successful_count
+                })
                 
                 if is_alive:
                     successful_pings += 1
@@ -372,9 +371,9 @@ def ping_all_monitored_devices():
             else:
                 logger.warning(f"No device found for IP {ip_address}")
         
-        # Bulk create all stats records
+        # Load all stats records with one COPY
         if stats_to_create:
-            DevicePingStats.objects.bulk_create(stats_to_create)
+            copy_rows(DevicePingStats, stats_to_create)
             logger.debug(
                 f"Created {len(stats_to_create)} ping stats records: "
                 f"{successful_pings} alive, {failed_pings} down"
@@ -0,0 +1,340 @@
+"""
+Write-behind buffer for device and port telemetry
+
+system-stats-logger and qos.py report every second per device. With
+TELEMETRY_WRITE_BEHIND enabled, post_device_stats and post_openflow_metrics append
+one compact entry per report to the Redis stream "telemetry:stream" instead of
+writing to TimescaleDB in the request. The flush_telemetry management command
+drains the stream through the consumer group "telemetry_flushers" every
+TELEMETRY_FLUSH_INTERVAL_MS and loads each batch with one COPY per table.
+
+Entries are acknowledged (and deleted) only after the insert committed. Entries of
+a flusher that died before acknowledging stay pending and are claimed by the next
+flush once they have been idle for TELEMETRY_CLAIM_IDLE_MS, so a restart loses
+nothing; a crash between commit and acknowledgement writes the batch twice. Rows
+keep the time of the report, not of the flush.
+
+Entries whose fields do not have the expected types are dropped when parsed. If a
+redelivered batch is rejected by the database again, it is stored in halves until
+the rejected entries are isolated; the others are stored, and an entry rejected on
+its TELEMETRY_MAX_DELIVERIES-th delivery is moved to the stream "telemetry:dead".
+
+If the stream cannot be written (or write-behind is disabled) the report is stored
+directly, as before.
+
+Usage:
+    from device_monitoring.telemetry_buffer import telemetry_buffer
+
+    telemetry_buffer.write_device_stats(ip_address, cpu, memory, disk)
+    telemetry_buffer.flush(consumer='flusher-1')
+"""
+
+import ipaddress
+import json
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Sequence, Tuple
+
+import redis
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+
+from utils.db_utils import copy_rows
+from .models import DeviceStats, PortUtilizationStats
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_WRITE_BEHIND = getattr(settings, 'TELEMETRY_WRITE_BEHIND', False)
+TELEMETRY_STREAM_MAXLEN = getattr(settings, 'TELEMETRY_STREAM_MAXLEN', 1_000_000)
+TELEMETRY_FLUSH_BATCH_SIZE = getattr(settings, 'TELEMETRY_FLUSH_BATCH_SIZE', 2000)
+TELEMETRY_CLAIM_IDLE_MS = getattr(settings, 'TELEMETRY_CLAIM_IDLE_MS', 30000)
+TELEMETRY_MAX_DELIVERIES = getattr(settings, 'TELEMETRY_MAX_DELIVERIES', 5)
+
+STREAM_KEY = 'telemetry:stream'
+GROUP_NAME = 'telemetry_flushers'
+DEAD_LETTER_KEY = 'telemetry:dead'
+
+DEVICE_STATS = 'device_stats'
+PORT_UTILIZATION = 'port_utilization'
+
+
+# The database is unreachable or overloaded: retrying in halves would not help
+DATABASE_UNAVAILABLE = (OperationalError, InterfaceError)
+
+# (entry id, DeviceStats rows, PortUtilizationStats rows) of one stream entry
+ParsedEntry = Tuple[str, List[dict], List[dict]]
+
+
+def _from_epoch(ts: float) -> datetime:
+    return datetime.fromtimestamp(float(ts), tz=dt_timezone.utc)
+
+
+def _ip(value) -> str:
+    return str(ipaddress.ip_address(value))
+
+
+def _device_rows(record: dict, timestamp: datetime) -> List[dict]:
+    return [{
+        'ip_address': _ip(record['ip']), 'cpu': float(record['cpu']), 'memory': float(record['memory']),
+        'disk': float(record['disk']), 'timestamp': timestamp,
+    }]
+
+
+def _port_rows(record: dict, timestamp: datetime) -> List[dict]:
+    ip_address = _ip(record['ip'])
+    return [
+        {
+            'ip_address': ip_address,
+            'port_name': str(row['port_name']),
+            'throughput_mbps': float(row['throughput_mbps']),
+            'utilization_percent': None if row.get('utilization_percent') is None else float(row['utilization_percent']),
+            'rx_bytes_diff': int(row['rx_bytes_diff']),
+            'tx_bytes_diff': int(row['tx_bytes_diff']),
+            'duration_diff': float(row['duration_diff']),
+            'timestamp': timestamp,
+        }
+        for row in record['ports']
+    ]
+
+
+class TelemetryBuffer:
+    """
+    Redis stream of telemetry reports with a bulk-inserting consumer group
+
+    Args:
+        redis_client: Client with decode_responses=True
+        enabled: Append to the stream; when False every report is stored directly
+        maxlen: Approximate stream length cap; the oldest entries are trimmed beyond it
+            (only reached when no flusher runs)
+        claim_idle_ms: Pending entries idle this long are taken over from their consumer
+        max_deliveries: Deliveries after which an entry the database rejects is dead-lettered
+    """
+
+    def __init__(self, redis_client, enabled: bool = False, maxlen: int = 1_000_000, claim_idle_ms: int = 30000,
+                 max_deliveries: int = 5):
+        self.redis_client = redis_client
+        self.enabled = enabled
+        self.maxlen = maxlen
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max(1, max_deliveries)
+        self._group_ready = False
+
+    def write_device_stats(self, ip_address: str, cpu: float, memory: float, disk: float):
+        """Buffer (or store) one system stats report"""
+        now = timezone.now()
+        record = {'ip': ip_address, 'cpu': cpu, 'memory': memory, 'disk': disk, 'ts': now.timestamp()}
+        if self._append(DEVICE_STATS, record):
+            return
+        DeviceStats.objects.create(ip_address=ip_address, cpu=cpu, memory=memory, disk=disk, timestamp=now)
+
+    def write_port_utilization(self, device_ip: str, rows: Sequence[dict]):
+        """
+        Buffer (or store) one qos.py report
+
+        Args:
+            device_ip: LAN IP of the reporting switch
+            rows: PortUtilizationStats fields per port (see link_speeds.compute_port_utilization)
+        """
+        if not rows:
+            return
+        now = timezone.now()
+        record = {'ip': device_ip, 'ports': list(rows), 'ts': now.timestamp()}
+        if self._append(PORT_UTILIZATION, record):
+            return
+        copy_rows(PortUtilizationStats, [dict(row, ip_address=device_ip, timestamp=now) for row in rows])
+
+    def _append(self, kind: str, record: dict) -> bool:
+        if not self.enabled:
+            return False
+        try:
+            self.redis_client.xadd(
+                STREAM_KEY, {'kind': kind, 'data': json.dumps(record)}, maxlen=self.maxlen, approximate=True
+            )
+            return True
+        except redis.RedisError as e:
+            logger.warning(f"Failed to buffer {kind} for {record['ip']}, writing it directly: {e}")
+            return False
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.redis_client.xgroup_create(STREAM_KEY, GROUP_NAME, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_ready = True
+
+    def _read(self, consumer: str, count: int, block_ms: int) -> List[Tuple[str, dict]]:
+        # Entries left pending by a dead flusher (or by a failed insert) come first
+        claimed = self.redis_client.xautoclaim(
+            STREAM_KEY, GROUP_NAME, consumer, self.claim_idle_ms, start_id='0-0', count=count
+        )
+        entries = [entry for entry in claimed[1] if entry and entry[1]]
+        if entries:
+            return entries
+        response = self.redis_client.xreadgroup(
+            GROUP_NAME, consumer, {STREAM_KEY: '>'}, count=count, block=block_ms if block_ms > 0 else None
+        )
+        return response[0][1] if response else []
+
+    def flush(self, consumer: str, count: int = TELEMETRY_FLUSH_BATCH_SIZE, block_ms: int = 0) -> int:
+        """
+        Store up to ``count`` buffered reports and acknowledge them
+
+        Args:
+            consumer: Name of this flusher in the consumer group
+            count: Maximum stream entries per call
+            block_ms: Wait this long for new entries if none are pending (0: do not wait)
+
+        Returns:
+            int: Entries acknowledged (stored, malformed or dead-lettered); 0 if the stream
+            was empty or the insert failed (the entries then stay pending and are retried
+            after claim_idle_ms)
+        """
+        self._ensure_group()
+        try:
+            entries = self._read(consumer, count, block_ms)
+        except redis.ResponseError as e:
+            if 'NOGROUP' not in str(e):
+                raise
+            # The stream was deleted (e.g. Redis flushed); recreate it with the group
+            self._group_ready = False
+            self._ensure_group()
+            entries = self._read(consumer, count, block_ms)
+        if not entries:
+            return 0
+
+        parsed, malformed = self._parse(entries)
+        try:
+            self._store(parsed)
+            done = [entry_id for entry_id, _, _ in parsed]
+        except Exception as e:
+            deliveries = self._delivery_counts(entries)
+            if isinstance(e, DATABASE_UNAVAILABLE) or max(deliveries.values(), default=1) < 2:
+                # First failure or no database: retry the whole batch later
+                logger.exception(f"Failed to store {len(parsed)} telemetry entries, they stay pending")
+                self._ack(malformed)
+                return len(malformed)
+            logger.warning(f"Redelivered batch of {len(parsed)} telemetry entries failed again ({e}), storing it in halves")
+            done, rejected = [], []
+            try:
+                self._store_halves(parsed, done, rejected)
+            except DATABASE_UNAVAILABLE:
+                logger.exception("Database became unavailable, the remaining telemetry entries stay pending")
+                rejected = []
+            dead = [entry_id for entry_id, _, _ in rejected if deliveries.get(entry_id, 0) >= self.max_deliveries]
+            self._dead_letter(dead, dict(entries))
+            done += dead
+
+        self._ack(done + malformed)
+        logger.debug(f"Stored {len(done)} and dropped {len(malformed)} of {len(entries)} telemetry entries")
+        return len(done) + len(malformed)
+
+    def _parse(self, entries: List[Tuple[str, dict]]) -> Tuple[List[ParsedEntry], List[str]]:
+        parsed: List[ParsedEntry] = []
+        malformed: List[str] = []
+        for entry_id, fields in entries:
+            try:
+                record = json.loads(fields['data'])
+                timestamp = _from_epoch(record['ts'])
+                if fields['kind'] == DEVICE_STATS:
+                    parsed.append((entry_id, _device_rows(record, timestamp), []))
+                elif fields['kind'] == PORT_UTILIZATION:
+                    parsed.append((entry_id, [], _port_rows(record, timestamp)))
+                else:
+                    logger.error(f"Dropping telemetry entry {entry_id} of unknown kind {fields.get('kind')}")
+                    malformed.append(entry_id)
+            except (KeyError, TypeError, ValueError, OverflowError):
+                # Acknowledged with the batch so a malformed entry is not retried forever
+                logger.exception(f"Dropping malformed telemetry entry {entry_id}")
+                malformed.append(entry_id)
+        return parsed, malformed
+
+    def _store(self, parsed: List[ParsedEntry]):
+        device_stats = [row for _, rows, _ in parsed for row in rows]
+        port_stats = [row for _, _, rows in parsed for row in rows]
+        with transaction.atomic():
+            if device_stats:
+                copy_rows(DeviceStats, device_stats)
+            if port_stats:
+                copy_rows(PortUtilizationStats, port_stats)
+
+    def _store_halves(self, parsed: List[ParsedEntry], done: List[str], rejected: List[ParsedEntry]):
+        """Store ``parsed`` in ever smaller parts, collecting stored ids and rejected entries"""
+        mid = len(parsed) // 2
+        for part in (parsed[:mid], parsed[mid:]):
+            if not part:
+                continue
+            try:
+                self._store(part)
+                done.extend(entry_id for entry_id, _, _ in part)
+            except DATABASE_UNAVAILABLE:
+                raise
+            except Exception as e:
+                if len(part) > 1:
+                    self._store_halves(part, done, rejected)
+                else:
+                    logger.warning(f"Telemetry entry {part[0][0]} rejected by the database: {e}")
+                    rejected.extend(part)
+
+    def _delivery_counts(self, entries: List[Tuple[str, dict]]) -> Dict[str, int]:
+        pipe = self.redis_client.pipeline(transaction=False)
+        for entry_id, _ in entries:
+            pipe.xpending_range(STREAM_KEY, GROUP_NAME, min=entry_id, max=entry_id, count=1)
+        return {
+            pending[0]['message_id']: pending[0]['times_delivered']
+            for pending in pipe.execute() if pending
+        }
+
+    def _dead_letter(self, entry_ids: List[str], fields_by_id: Dict[str, dict]):
+        if not entry_ids:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        for entry_id in entry_ids:
+            pipe.xadd(DEAD_LETTER_KEY, dict(fields_by_id[entry_id], entry_id=entry_id), maxlen=self.maxlen, approximate=True)
+        pipe.execute()
+        logger.error(f"Moved {len(entry_ids)} telemetry entries rejected {self.max_deliveries} times to {DEAD_LETTER_KEY}")
+
+    def _ack(self, entry_ids: List[str]):
+        if not entry_ids:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.xack(STREAM_KEY, GROUP_NAME, *entry_ids)
+        pipe.xdel(STREAM_KEY, *entry_ids)
+        pipe.execute()
+
+    def get_stats(self) -> dict:
+        """
+        Stream length and entries awaiting acknowledgement
+
+        Returns:
+            dict with "length", "pending", "consumers" and "dead_letters"
+        """
+        self._ensure_group()
+        length = self.redis_client.xlen(STREAM_KEY)
+        pending = self.redis_client.xpending(STREAM_KEY, GROUP_NAME)
+        return {
+            'length': length,
+            'pending': pending.get('pending', 0),
+            'consumers': pending.get('consumers', []),
+            'dead_letters': self.redis_client.xlen(DEAD_LETTER_KEY),
+        }
+
+
+def _redis_client() -> redis.Redis:
+    return redis.Redis(
+        host=getattr(settings, 'CHANNEL_REDIS_HOST', 'redis'),
+        port=getattr(settings, 'CHANNEL_REDIS_PORT', 6379),
+        decode_responses=True,
+    )
+
+
+telemetry_buffer = TelemetryBuffer(
+    _redis_client(),
+    enabled=TELEMETRY_WRITE_BEHIND,
+    maxlen=TELEMETRY_STREAM_MAXLEN,
+    claim_idle_ms=TELEMETRY_CLAIM_IDLE_MS,
+    max_deliveries=TELEMETRY_MAX_DELIVERIES,
+)
@@ -22,13 +22,15 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
-from general.models import Device, Bridge, Port
+from general.models import Device, Bridge
 from django.shortcuts import get_object_or_404
 import json
 import os
 from knox.auth import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from .models import DeviceStats, PortUtilizationStats
+from .models import PortUtilizationStats
+from .link_speeds import compute_port_utilization, get_link_speed_map
+from .telemetry_buffer import telemetry_buffer
 from .serializers import PortUtilizationStatsSerializer, DeviceStatsSerializer
 from network_device.models import NetworkDevice
 from network_device.serializers import NetworkDeviceSerializer
@@ -170,10 +172,10 @@ def post_device_stats(request):
             logger.warning("Received device stats without ip_address")
             return Response({"status": "error", "message": "ip_address is required"}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Persist stats to database
+        # Persist stats to database (through the write-behind buffer when enabled)
         try:
-            DeviceStats.objects.create(
-                ip_address=ip_address,
+            telemetry_buffer.write_device_stats(
+                ip_address,
                 cpu=data.get('cpu', 0.0),
                 memory=data.get('memory', 0.0),
                 disk=data.get('disk', 0.0)
@@ -202,6 +204,10 @@ def post_device_stats(request):
 def post_openflow_metrics(request):
     """
     Receives OpenFlow port metrics from qos.py script and stores port utilization stats.
+
+    Link speeds come from the cached map in device_monitoring.link_speeds, and the
+    report is stored with one COPY, or appended to the telemetry stream when
+    TELEMETRY_WRITE_BEHIND is enabled.
     
     Expected data format from qos.py:
     {
@@ -219,56 +225,24 @@ def post_openflow_metrics(request):
         data = json.loads(request.body)
         device_ip = data['device_ip']
         stats = data['stats']
+        try:
+            link_speeds = get_link_speed_map()
+        except Exception:
+            # Without link speeds utilisation is stored as 0.0, throughput is still recorded
+            logger.exception("Failed to load port link speeds")
+            link_speeds = {}
+        rows = compute_port_utilization(device_ip, stats, link_speeds)
         throughput_data = {
             'ip_address': device_ip,
-            'ports': {}
+            'ports': {row['port_name']: row['throughput_mbps'] for row in rows}
         }
 
-        for port_name, values in stats.items():
-            # Calculate throughput in bytes per second
-            if values['duration_diff'] > 0:
-                throughput_bps = (values['rx_bytes_diff'] * 8) / values['duration_diff']
-                throughput_mbps = throughput_bps / 1000000
-            else:
-                throughput_mbps = 0
-            throughput_data['ports'][port_name] = throughput_mbps
-
-            # Store port utilization stats in database
-            try:
-                # Query Port model to get link_speed for utilization calculation
-                port_obj = Port.objects.filter(
-                    device__lan_ip_address=device_ip, 
-                    name=port_name
-                ).first()
-                
-                link_speed_mbps = None
-                utilization_percent = None
-                
-                if port_obj and port_obj.link_speed:
-                    link_speed_mbps = port_obj.link_speed
-                    if throughput_mbps > 0 and link_speed_mbps > 0:
-                        utilization_percent = (throughput_mbps / link_speed_mbps) * 100
-                    else:
-                        utilization_percent = 0.0
-                else:
-                    # No link_speed configured, set utilization to 0 but store throughput
-                    utilization_percent = 0.0
-                    # logger.warning(f"No link_speed configured for port {port_name} on device {device_ip}")
-
-                # Create PortUtilizationStats record
-                PortUtilizationStats.objects.create(
-                    ip_address=device_ip,
-                    port_name=port_name,
-                    throughput_mbps=throughput_mbps,
-                    utilization_percent=utilization_percent,
-                    rx_bytes_diff=values['rx_bytes_diff'],
-                    tx_bytes_diff=values['tx_bytes_diff'],
-                    duration_diff=values['duration_diff']
-                )
-                
-            except Exception as db_e:
-                # Log database errors but don't fail the request
-                logger.exception(f"Failed to store port utilization stats for {port_name} on {device_ip}: {db_e}")
+        # Store the whole report with one COPY (through the write-behind buffer when enabled)
+        try:
+            telemetry_buffer.write_port_utilization(device_ip, rows)
+        except Exception as db_e:
+            # Log database errors but don't fail the request
+            logger.exception(f"Failed to store port utilization stats for {len(rows)} ports on {device_ip}: {db_e}")
 
         # Continue with existing WebSocket functionality
         channel_layer = get_channel_layer()
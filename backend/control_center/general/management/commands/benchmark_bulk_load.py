@@ -0,0 +1,95 @@
+"""
+Django Management Command: benchmark_bulk_load
+
+Loads synthetic FlowStat rows with bulk_create(batch_size=5000), as the ingestion
+tasks used to, and with COPY through utils.db_utils.copy_rows. Every run happens in
+a transaction that is rolled back, so the hypertable is left unchanged.
+"""
+
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from network_data.models import FlowStat
+from utils.db_utils import copy_rows
+
+BENCHMARK_PREFIX = 'benchmark:'
+
+
+class Command(BaseCommand):
+    help = 'Benchmark COPY-based bulk loading against bulk_create on the FlowStat hypertable'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1_000, 10_000, 100_000],
+            help='Numbers of rows loaded per run'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per size and method; the best run is reported'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        repeat = max(1, options['repeat'])
+
+        for size in options['sizes']:
+            rows = self._rows(rng, size)
+            self.stdout.write(self.style.SUCCESS(f'\n{size:,} FlowStat rows, best of {repeat}'))
+
+            bulk_time = min(self._timed(lambda: self._bulk_create(rows), size) for _ in range(repeat))
+            copy_time = min(self._timed(lambda: copy_rows(FlowStat, rows), size) for _ in range(repeat))
+
+            self.stdout.write(f'  bulk_create: {bulk_time:.3f}s ({size / bulk_time:,.0f} rows/s)')
+            self.stdout.write(f'  COPY:        {copy_time:.3f}s ({size / copy_time:,.0f} rows/s)')
+            self.stdout.write(f'  speedup:     {bulk_time / copy_time:.1f}x')
+
+    def _rows(self, rng, size):
+        start = timezone.now()
+        # Prefixed so the rows of a run can be counted without scanning the table
+        classifications = [f'{BENCHMARK_PREFIX}{name}' for name in ('YouTube', 'Netflix', 'Zoom', 'Teams', 'Spotify')]
+        return [
+            {
+                'timestamp': start - timedelta(milliseconds=i),
+                'classification': rng.choice(classifications),
+                'meter_id': rng.randint(0, 10),
+                'duration_seconds': rng.random() * 300,
+                'packet_count': rng.randint(1, 1_000_000),
+                'byte_count': rng.randint(64, 1_000_000_000),
+                'priority': 40000,
+                'mac_address': ':'.join(f'{rng.randint(0, 255):02x}' for _ in range(6)),
+                'protocol': rng.choice(['tcp', 'udp']),
+                'port': rng.randint(1, 65535),
+            }
+            for i in range(size)
+        ]
+
+    def _bulk_create(self, rows):
+        # What the ingestion tasks did before: build instances, multi-row INSERTs
+        FlowStat.objects.bulk_create([FlowStat(**row) for row in rows], batch_size=5000)
+
+    def _timed(self, load, size):
+        with transaction.atomic():
+            start = time.perf_counter()
+            load()
+            elapsed = time.perf_counter() - start
+            loaded = FlowStat.objects.filter(classification__startswith=BENCHMARK_PREFIX).count()
+            transaction.set_rollback(True)
+        if loaded != size:
+            self.stdout.write(self.style.ERROR(f'  loaded {loaded:,} rows, expected {size:,}'))
+        return elapsed
@@ -0,0 +1,117 @@
+"""
+Django Management Command: benchmark_vpn_lookup
+
+Micro-benchmark of VPN CIDR lookups on synthetic data: the merged uint32 range
+arrays used by VPNNetworkLoader.verify_vpn_ips versus the previous sorted list
+of ipaddress.IPv4Network objects with a per-IP binary search.
+"""
+
+import bisect
+import ipaddress
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from classifier.ip_reputation import cidrs_to_ranges, merge_ranges, ranges_contain
+
+
+class Command(BaseCommand):
+    help = 'Benchmark vectorised VPN CIDR lookups against the legacy IPv4Network bisect'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[10_000, 100_000, 1_000_000],
+            help='Numbers of synthetic CIDR ranges to test'
+        )
+        parser.add_argument(
+            '--lookups',
+            type=int,
+            default=100_000,
+            help='Number of IPs looked up per size'
+        )
+        parser.add_argument(
+            '--legacy-max',
+            type=int,
+            default=100_000,
+            help='Skip the legacy implementation above this many ranges (it is slow to build)'
+        )
+        parser.add_argument(
+            '--legacy-sample',
+            type=int,
+            default=2_000,
+            help='Number of IPs looked up with the legacy implementation (it scans backwards on a miss)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed'
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        num_lookups = options['lookups']
+
+        for size in options['sizes']:
+            # Random public-ish prefixes between /16 and /32
+            prefix_lengths = rng.integers(16, 33, size=size)
+            addresses = rng.integers(1 << 24, 224 << 24, size=size, dtype=np.uint64)
+            masks = (0xFFFFFFFF << (32 - prefix_lengths)) & 0xFFFFFFFF
+            network_addresses = (addresses & masks.astype(np.uint64)).astype(np.uint32)
+            cidrs = [f"{ipaddress.IPv4Address(int(a))}/{int(p)}" for a, p in zip(network_addresses, prefix_lengths)]
+            queries = rng.integers(1 << 24, 224 << 24, size=num_lookups, dtype=np.uint64).astype(np.uint32)
+
+            self.stdout.write(self.style.SUCCESS(f'\n{size:,} CIDR ranges, {num_lookups:,} lookups'))
+
+            start = time.perf_counter()
+            starts, ends = merge_ranges(*cidrs_to_ranges(cidrs))
+            build_time = time.perf_counter() - start
+            start = time.perf_counter()
+            vectorised = ranges_contain(starts, ends, queries)
+            lookup_time = time.perf_counter() - start
+            self.stdout.write(
+                f'  vectorised: build {build_time:.2f}s, {len(starts):,} merged ranges, '
+                f'{(starts.nbytes + ends.nbytes) / 1024:.0f} KiB, '
+                f'lookups {lookup_time * 1000:.1f} ms ({num_lookups / lookup_time:,.0f}/s)'
+            )
+
+            if size > options['legacy_max']:
+                self.stdout.write('  legacy: skipped (--legacy-max)')
+                continue
+
+            tracemalloc.start()
+            start = time.perf_counter()
+            networks = sorted((ipaddress.IPv4Network(c) for c in cidrs), key=lambda n: int(n.network_address))
+            network_starts = [int(n.network_address) for n in networks]
+            build_time = time.perf_counter() - start
+            legacy_memory, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            # Legacy algorithm: rightmost start <= IP, then scan backwards over candidate networks
+            sample = queries[:min(num_lookups, options['legacy_sample'])].tolist()
+            start = time.perf_counter()
+            legacy = []
+            for ip_int in sample:
+                idx = bisect.bisect_right(network_starts, ip_int) - 1
+                ip = ipaddress.IPv4Address(ip_int)
+                legacy.append(any(
+                    ip_int <= int(networks[i].broadcast_address) and ip in networks[i]
+                    for i in range(idx, -1, -1)
+                ))
+            lookup_time = time.perf_counter() - start
+            self.stdout.write(
+                f'  legacy:     build {build_time:.2f}s, {len(networks):,} IPv4Network objects, '
+                f'{legacy_memory / 1024:.0f} KiB, '
+                f'lookups {len(sample) / lookup_time:,.0f}/s (on {len(sample):,} IPs)'
+            )
+
+            mismatches = int(np.count_nonzero(np.asarray(legacy) != vectorised[:len(sample)]))
+            if mismatches:
+                self.stdout.write(self.style.ERROR(f'  {mismatches} results differ from the legacy lookup'))
+            else:
+                self.stdout.write(self.style.SUCCESS('  results identical'))
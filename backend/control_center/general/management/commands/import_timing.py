@@ -0,0 +1,94 @@
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Packages that should never be pulled in by a process that does not classify
+HEAVY_PACKAGES = ('tensorflow', 'keras', 'pandas', 'h5py', 'sklearn', 'scipy', 'matplotlib')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+class Command(BaseCommand):
+    help = 'Report per-app import cost of a fresh process (django.setup() plus entry-point modules)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modules',
+            nargs='*',
+            default=['control_center.urls', 'control_center.celery'],
+            help='Modules imported after django.setup() (default: URLconf and Celery app)'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Number of third-party packages to list'
+        )
+
+    def handle(self, *args, **options):
+        modules = options.get('modules') or []
+        script = 'import django; django.setup()\n' + ''.join(f'import {m}\n' for m in modules)
+
+        env = os.environ.copy()
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'control_center.settings')
+        # -X importtime reports every import of the child process on stderr
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            cwd=str(settings.BASE_DIR),
+            env=env,
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            error_lines = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+            self.stdout.write(self.style.ERROR('Import failed:'))
+            self.stdout.write('\n'.join(error_lines[-20:]))
+            return
+
+        self_time = defaultdict(int)
+        imported = set()
+        total_us = 0
+        for line in result.stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, indent, module = match.groups()
+            package = module.split('.')[0]
+            self_time[package] += int(self_us)
+            imported.add(package)
+            if len(indent) <= 1:
+                total_us += int(cumulative_us)
+
+        app_packages = {app_config.name.split('.')[0] for app_config in apps.get_app_configs()}
+        local_apps = sorted(
+            (package for package in app_packages if os.path.isdir(os.path.join(settings.BASE_DIR, package))),
+            key=lambda package: -self_time.get(package, 0)
+        )
+
+        self.stdout.write(f"Startup import time: {total_us / 1000:.0f} ms (imports: {', '.join(modules) or 'none'})")
+        self.stdout.write('')
+        self.stdout.write('Project apps (own modules only):')
+        for package in local_apps:
+            self.stdout.write(f'  {package:<24} {self_time.get(package, 0) / 1000:8.1f} ms')
+
+        third_party = sorted(
+            ((package, us) for package, us in self_time.items() if package not in local_apps),
+            key=lambda item: -item[1]
+        )[:options['top']]
+        self.stdout.write('')
+        self.stdout.write('Top third-party packages:')
+        for package, us in third_party:
+            self.stdout.write(f'  {package:<24} {us / 1000:8.1f} ms')
+
+        heavy = [package for package in HEAVY_PACKAGES if package in imported]
+        self.stdout.write('')
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"Heavy ML packages imported at startup: {', '.join(heavy)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS('No heavy ML packages imported at startup'))
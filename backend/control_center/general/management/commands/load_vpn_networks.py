@@ -10,6 +10,7 @@ from django.conf import settings
 from classifier.vpn_loader import REDIS_VPN_KEY
 import redis
 from classifier.vpn_loader import VPNNetworkLoader
+from classifier.ip_reputation import rebuild_snapshot
 import ipaddress
 
 class Command(BaseCommand):
@@ -126,6 +127,9 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'{message}'))
             return
         
+        # Rebuild the shared IP reputation snapshot (DNS + VPN + ASN) mapped by the workers
+        rebuild_snapshot(redis_conn, self.stdout, self.style)
+
         # Final summary
         self.stdout.write(self.style.SUCCESS('\n' + '='*60))
         self.stdout.write(self.style.SUCCESS('VPN Network Loading Complete'))
@@ -5,6 +5,9 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 import redis
 
+from utils.ip_lookup_service import bump_asn_index_version
+from classifier.ip_reputation import rebuild_snapshot
+
 
 class Command(BaseCommand):
     help = 'Populate Redis with IP-to-ASN mapping data from GeoLite2 CSV file'
@@ -181,6 +184,20 @@ class Command(BaseCommand):
             )
             return
 
+        # Tell every worker to reload its in-process ASN index
+        try:
+            version = bump_asn_index_version(redis_conn)
+            self.stdout.write(
+                self.style.SUCCESS(f'ASN index version bumped to {version}')
+            )
+        except Exception as e:
+            self.stdout.write(
+                self.style.WARNING(f'Could not bump ASN index version: {e}')
+            )
+
+        # Rebuild the shared IP reputation snapshot (DNS + VPN + ASN) mapped by the workers
+        rebuild_snapshot(redis_conn, self.stdout, self.style)
+
         self.stdout.write(
             self.style.SUCCESS('IP-to-ASN lookup service population completed successfully!')
         )
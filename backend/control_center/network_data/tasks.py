@@ -23,6 +23,7 @@ from .models import Flow, AggregatedFlow
 from celery import shared_task
 from django.utils.dateparse import parse_datetime
 from .models import FlowStat
+from utils.db_utils import copy_rows
 import threading
 import time
 import requests
@@ -160,16 +161,12 @@ def create_flow_stat_entries_batch(data_list):
       - port: int (either tp_src or tp_dst)
       - classification: application classification
 
-    This task converts the timestamp and duration as necessary, then creates the FlowStat entries in bulk.
-    Optimized for TimescaleDB with larger batch sizes and better error handling.
+    This task converts the timestamp and duration as necessary, then loads the FlowStat
+    rows with COPY (utils.db_utils.copy_rows) without building model instances.
     """
-    objs = []
+    rows = []
     errors = []
     
-    # Pre-allocate list for better memory efficiency
-    objs = [None] * len(data_list)
-    obj_count = 0
-    
     for idx, data in enumerate(data_list):
         try:
             ts_str = data.get('timestamp')
@@ -188,32 +185,27 @@ def create_flow_stat_entries_batch(data_list):
             elif isinstance(duration_str, (int, float)):
                 duration_seconds = float(duration_str)
 
-            obj = FlowStat(
-                timestamp=timestamp,
-                classification=str(data.get('classification', 'unknown_cookie')),
-                meter_id=int(data.get('meter', 0)),
-                duration_seconds=duration_seconds,
-                packet_count=int(data.get('packets', 0)),
-                byte_count=int(data.get('bytes', 0)),
-                priority=int(data.get('priority', 0)),
-                mac_address=data.get('mac_address', ""),
-                protocol=data.get('protocol', ""),
-                port=int(data.get('port', 0) or 0)
-            )
-            objs[obj_count] = obj
-            obj_count += 1
+            rows.append({
+                'timestamp': timestamp,
+                'classification': str(data.get('classification', 'unknown_cookie')),
+                'meter_id': int(data.get('meter', 0)),
+                'duration_seconds': duration_seconds,
+                'packet_count': int(data.get('packets', 0)),
+                'byte_count': int(data.get('bytes', 0)),
+                'priority': int(data.get('priority', 0)),
+                'mac_address': data.get('mac_address', ""),
+                'protocol': data.get('protocol', ""),
+                'port': int(data.get('port', 0) or 0)
+            })
         except Exception as e:
             errors.append(f"Error processing record at index {idx}: {e}")
 
     created_count = 0
     try:
-        if obj_count > 0:
-            # Use larger batch size for TimescaleDB optimization
-            # TimescaleDB handles large batches more efficiently
-            FlowStat.objects.bulk_create(objs[:obj_count], batch_size=5000)  # type: ignore[attr-defined]
-            created_count = obj_count
+        if rows:
+            created_count = copy_rows(FlowStat, rows)
     except Exception as e:
-        errors.append(f"bulk_create failed: {e}")
+        errors.append(f"bulk load failed: {e}")
 
     return {
         "created": created_count,
@@ -234,37 +226,24 @@ def create_flow_entries_batch(data_list):
       - src_port (optional)
       - dst_port (optional)
       - classification
-    Optimized for TimescaleDB with larger batch sizes and better memory efficiency.
+    Loaded with COPY (utils.db_utils.copy_rows); timestamps are set to the load time.
     """
-    # Pre-allocate list for better memory efficiency
-    objs = [None] * len(data_list)
-    obj_count = 0
+    fields = ('src_ip', 'dst_ip', 'src_mac', 'dst_mac', 'src_port', 'dst_port', 'classification')
+    rows = []
     errors = []
     
     for idx, data in enumerate(data_list):
         try:
-            obj = Flow(
-                src_ip=data.get('src_ip'),
-                dst_ip=data.get('dst_ip'),
-                src_mac=data.get('src_mac'),
-                dst_mac=data.get('dst_mac'),
-                src_port=data.get('src_port'),
-                dst_port=data.get('dst_port'),
-                classification=data.get('classification'),
-            )
-            objs[obj_count] = obj
-            obj_count += 1
+            rows.append({field: data.get(field) for field in fields})
         except Exception as e:
             errors.append(f"Error processing record at index {idx}: {e}")
     
     created_count = 0
     try:
-        if obj_count > 0:
-            # Use larger batch size for TimescaleDB optimization
-            Flow.objects.bulk_create(objs[:obj_count], batch_size=5000)  # type: ignore[attr-defined]
-            created_count = obj_count
+        if rows:
+            created_count = copy_rows(Flow, rows)
     except Exception as e:
-        errors.append(f"bulk_create failed: {e}")
+        errors.append(f"bulk load failed: {e}")
     
     return {
         "created": created_count,
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class NetworkDeviceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'network_device'
+
+    def ready(self):
+        import network_device.signals
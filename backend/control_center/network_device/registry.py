@@ -0,0 +1,189 @@
+"""
+End-user device registry for the classification paths
+
+Every classified flow needs a NetworkDevice row for its client MAC. The registry
+keeps an in-process TTL cache of MAC -> (id, ip) and resolves a whole request batch
+at once: MACs that are cached (with an unchanged IP) cost nothing, and the rest are
+written with one upsert per batch (INSERT ... ON CONFLICT (mac_address)) followed
+by one SELECT for their ids. Pairs that device_error() rejects are skipped, so one
+malformed MAC or IP cannot make Postgres reject the whole batch; views use it to fail
+just those items.
+
+Edits and deletes of NetworkDevice rows (API, admin) bump a Redis version key once
+committed (network_device.signals); every process drops its cache when it sees the new
+version, at most DEVICE_REGISTRY_REFRESH_SECONDS later.
+
+Usage:
+    from network_device.registry import device_registry
+
+    device_ids = device_registry.ensure_devices([(mac, private_ip), ...])
+"""
+
+import ipaddress
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+
+from utils.versioned_cache import VersionedCache
+from .models import NetworkDevice, mac_address_validator
+
+logger = logging.getLogger(__name__)
+
+DEVICE_REGISTRY_VERSION_KEY = 'network_device:registry:version'
+
+# MAC -> (device id, ip address, expiry on the monotonic clock)
+DeviceCache = Dict[str, Tuple[int, Optional[str], float]]
+
+
+def device_error(mac_address: Optional[str], ip_address: Optional[str]) -> Optional[str]:
+    """
+    Why a (MAC, IP) pair cannot be stored as a NetworkDevice
+
+    Returns:
+        Error message, or None if the pair is valid (empty MACs and IPs are valid; they
+        are skipped and left unchanged respectively)
+    """
+    if mac_address and not mac_address_validator.regex.match(mac_address):
+        return f"Invalid MAC address: {mac_address}"
+    if ip_address:
+        try:
+            ipaddress.ip_address(ip_address)
+        except ValueError:
+            return f"Invalid IP address: {ip_address}"
+    return None
+
+
+class DeviceRegistry:
+    """
+    TTL cache of end-user devices with batched upserts
+
+    Args:
+        ttl_seconds: How long a MAC is trusted without touching the database
+        max_entries: Cache size; the oldest entries are evicted beyond it
+        refresh_seconds: Minimum interval between checks of the shared version key
+    """
+
+    def __init__(self, ttl_seconds: float = 300.0, max_entries: int = 100_000, refresh_seconds: float = 2.0):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # A new, empty cache for every version
+        self._caches: VersionedCache[DeviceCache] = VersionedCache(
+            'device registry', DEVICE_REGISTRY_VERSION_KEY, lambda version: {}, refresh_seconds,
+        )
+
+    def ensure_devices(self, devices: Iterable[Tuple[Optional[str], Optional[str]]]) -> Dict[str, int]:
+        """
+        Make sure a NetworkDevice exists for every MAC and record IP changes
+
+        New MACs are created as 'end_user' devices. A non-empty IP replaces the stored
+        one; None leaves it unchanged.
+
+        Args:
+            devices: (mac_address, ip_address or None) pairs; empty MACs and pairs
+                rejected by device_error() are skipped
+
+        Returns:
+            Dict of MAC address -> NetworkDevice id
+        """
+        current = time.monotonic()
+        device_ids, pending = self._from_cache(devices, current)
+        if pending:
+            self._remember(self._upsert(pending), current, device_ids)
+        return device_ids
+
+    async def aensure_devices(self, devices: Iterable[Tuple[Optional[str], Optional[str]]]) -> Dict[str, int]:
+        """
+        ensure_devices for async views: cached MACs are answered in the event loop,
+        only the upsert runs in a thread
+        """
+        if self._caches.check_due():
+            # The version check reads Redis; keep it out of the event loop
+            await sync_to_async(self._caches.get)()
+        current = time.monotonic()
+        device_ids, pending = self._from_cache(devices, current)
+        if pending:
+            self._remember(await sync_to_async(self._upsert)(pending), current, device_ids)
+        return device_ids
+
+    def _from_cache(self, devices, current: float) -> Tuple[Dict[str, int], Dict[str, Optional[str]]]:
+        device_ids: Dict[str, int] = {}
+        # MAC -> IP to write (None: create if missing, keep the stored IP)
+        pending: Dict[str, Optional[str]] = {}
+        cache = self._caches.get()
+        with self._lock:
+            for mac, ip in devices:
+                if not mac:
+                    continue
+                error = device_error(mac, ip)
+                if error:
+                    logger.warning(f"Skipping end-user device: {error}")
+                    continue
+                entry = cache.get(mac)
+                if entry is not None and entry[2] > current and (not ip or entry[1] == ip):
+                    device_ids[mac] = entry[0]
+                elif ip or mac not in pending:
+                    pending[mac] = ip or None
+        return device_ids, pending
+
+    def _remember(self, rows, current: float, device_ids: Dict[str, int]):
+        expires = current + self.ttl_seconds
+        cache = self._caches.get()
+        with self._lock:
+            for mac, device_id, ip in rows:
+                cache.pop(mac, None)
+                cache[mac] = (device_id, ip, expires)
+                device_ids[mac] = device_id
+            self._evict(cache, current)
+
+    def _upsert(self, pending: Dict[str, Optional[str]]):
+        # Sorted so concurrent batches lock conflicting rows in the same order
+        macs = sorted(pending)
+        with_ip = [
+            NetworkDevice(mac_address=mac, device_type='end_user', ip_address=pending[mac])
+            for mac in macs if pending[mac]
+        ]
+        without_ip = [
+            NetworkDevice(mac_address=mac, device_type='end_user')
+            for mac in macs if not pending[mac]
+        ]
+        with transaction.atomic():
+            if with_ip:
+                NetworkDevice.objects.bulk_create(
+                    with_ip, update_conflicts=True, unique_fields=['mac_address'], update_fields=['ip_address']
+                )
+            if without_ip:
+                NetworkDevice.objects.bulk_create(without_ip, ignore_conflicts=True)
+        logger.debug(f"Upserted {len(with_ip)} devices with IPs and {len(without_ip)} without")
+        return list(NetworkDevice.objects.filter(mac_address__in=macs).values_list('mac_address', 'id', 'ip_address'))
+
+    def _evict(self, cache: DeviceCache, current: float):
+        # Called with the lock held; dicts keep insertion order, so the oldest come first
+        if len(cache) <= self.max_entries:
+            return
+        for mac in [mac for mac, entry in cache.items() if entry[2] <= current]:
+            del cache[mac]
+        excess = len(cache) - self.max_entries
+        if excess > 0:
+            for mac in list(cache)[:excess]:
+                del cache[mac]
+
+    def invalidate(self):
+        """
+        Drop this process's cache and bump the shared version so every worker drops its own
+
+        Called from network_device.signals once the triggering transaction has committed.
+        """
+        self._caches.invalidate()
+
+
+device_registry = DeviceRegistry(
+    ttl_seconds=getattr(settings, 'DEVICE_REGISTRY_TTL_SECONDS', 300.0),
+    max_entries=getattr(settings, 'DEVICE_REGISTRY_MAX_ENTRIES', 100_000),
+    refresh_seconds=getattr(settings, 'DEVICE_REGISTRY_REFRESH_SECONDS', 2.0),
+)
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import NetworkDevice
+from .registry import device_registry
+
+
+@receiver(post_save, sender=NetworkDevice)
+@receiver(post_delete, sender=NetworkDevice)
+def forget_cached_devices(sender, instance, **kwargs):
+    # Edits outside the classify paths (API, admin) must not be masked by a cached id/IP in
+    # any worker; reload only after commit, so other workers do not read the old row
+    transaction.on_commit(device_registry.invalidate)
@@ -0,0 +1,258 @@
+"""
+Cached OdlMeter resolution for odl_classify_and_apply_policy
+
+Choosing the ODL meter for a classified flow used to take a controller lookup, two
+ModelConfiguration lookups, a Category lookup with fallbacks and an OdlMeter
+queryset per flow. OdlMeterResolver loads controllers, model configurations,
+categories and meters once (five queries) and compiles an OdlPolicy per
+(controller IP, switch node, active model, category) on first use: the category
+cookie and the candidate meters in pk order (meters of a client device first, then
+shared ones), each with its activation window. A flow's
+policy decision is then made without touching the database. Switch nodes without
+meters share one policy per (controller IP, active model, category), so node IDs
+sent by clients cannot grow the cache.
+
+The resolver is rebuilt when odl.signals bumps ODL_METER_RESOLVER_VERSION_KEY after
+an OdlMeter, Category, ModelConfiguration or controller change; other processes
+check the version key at most every METER_POLICY_REFRESH_SECONDS.
+"""
+
+import logging
+from collections import namedtuple
+from datetime import datetime, time
+from typing import Dict, List, Optional, Set, Tuple
+
+from django.conf import settings
+
+from classifier.models import ModelConfiguration
+from general.models import Controller as GeneralController, Device
+from utils.versioned_cache import VersionedCache
+from .models import Category, OdlMeter
+
+logger = logging.getLogger(__name__)
+
+ODL_METER_RESOLVER_VERSION_KEY = 'odl:meter_resolver:version'
+METER_POLICY_INDEX_ENABLED = getattr(settings, 'METER_POLICY_INDEX_ENABLED', True)
+METER_POLICY_REFRESH_SECONDS = getattr(settings, 'METER_POLICY_REFRESH_SECONDS', 2.0)
+
+# An OdlMeter as needed for selection and flow programming; window is (start, end) or None
+OdlMeterCandidate = namedtuple('OdlMeterCandidate', (
+    'pk', 'meter_id_on_odl', 'switch_node_id', 'network_device_id', 'activation_period', 'window',
+))
+
+
+def is_meter_active(candidate: OdlMeterCandidate, current_time: time, is_weekday: bool) -> bool:
+    """
+    Whether a meter applies at a given time
+
+    All-week meters always apply; weekday/weekend meters apply on their days, within
+    their window if they have one.
+    """
+    if candidate.activation_period == OdlMeter.ALL_WEEK:
+        return True
+    if candidate.activation_period == OdlMeter.WEEKDAY:
+        if not is_weekday:
+            return False
+    elif candidate.activation_period != OdlMeter.WEEKEND or is_weekday:
+        return False
+    window = candidate.window
+    return window is None or (window[1] is not None and window[0] <= current_time <= window[1])
+
+
+class OdlPolicy:
+    """Compiled policy for one (controller IP, switch node, active model, category)"""
+
+    __slots__ = ('controller_device_id', 'controller_ip', 'category_pk', 'category_cookie', 'by_device', 'shared')
+
+    def __init__(self, controller_device_id: int, controller_ip: str, category_pk: int,
+                 category_cookie: Optional[str], candidates: List[OdlMeterCandidate]):
+        self.controller_device_id = controller_device_id
+        self.controller_ip = controller_ip
+        self.category_pk = category_pk
+        self.category_cookie = category_cookie
+        # order_by('network_device') puts device-specific meters before shared (NULL) ones
+        self.by_device: Dict[int, List[OdlMeterCandidate]] = {}
+        self.shared: List[OdlMeterCandidate] = []
+        for candidate in candidates:
+            if candidate.network_device_id is None:
+                self.shared.append(candidate)
+            else:
+                self.by_device.setdefault(candidate.network_device_id, []).append(candidate)
+
+    def select_meter(self, network_device_id: Optional[int], at: datetime) -> Optional[OdlMeterCandidate]:
+        """
+        First active meter for a client device at a point in time
+
+        Args:
+            network_device_id: NetworkDevice pk of the client
+            at: Time used for the activation windows
+
+        Returns:
+            OdlMeterCandidate or None if no meter is active
+        """
+        current_time = at.time()
+        is_weekday = at.weekday() < 5
+        for candidate in self.by_device.get(network_device_id, ()):
+            if is_meter_active(candidate, current_time, is_weekday):
+                return candidate
+        for candidate in self.shared:
+            if is_meter_active(candidate, current_time, is_weekday):
+                return candidate
+        return None
+
+
+class OdlMeterResolver:
+    """ODL controllers, categories and meters for one version of the configuration"""
+
+    def __init__(self, version=None):
+        self.version = version
+        # Controller LAN IP -> ids of devices with device_type='controller' (the IP is not unique)
+        self.controller_devices: Dict[str, List[int]] = {}
+        # Device id -> number of ODL controller profiles
+        self.odl_profiles: Dict[int, int] = {}
+        self.device_ips: Dict[int, str] = {}
+        self.model_ids: Dict[str, int] = {}
+        # (category name, model configuration id or None) -> [(pk, cookie)]
+        self.categories: Dict[Tuple[str, Optional[int]], List[Tuple[int, Optional[str]]]] = {}
+        # (controller device id, switch node id, category name) -> [(candidate, model configuration id)] in pk order
+        self.meters: Dict[Tuple[int, str, str], List[Tuple[OdlMeterCandidate, Optional[int]]]] = {}
+        # Switch node IDs that have at least one meter
+        self.switch_nodes: Set[str] = set()
+        # Switch node is None for nodes without meters
+        self._policies: Dict[Tuple[str, Optional[str], Optional[str], str], OdlPolicy] = {}
+
+    @classmethod
+    def build(cls, version=None) -> 'OdlMeterResolver':
+        """Load controllers, model configurations, categories and meters (five queries)"""
+        resolver = cls(version)
+        for device_id, lan_ip in Device.objects.filter(device_type='controller').values_list('id', 'lan_ip_address'):
+            resolver.controller_devices.setdefault(lan_ip, []).append(device_id)
+            resolver.device_ips[device_id] = lan_ip
+        for device_id in GeneralController.objects.filter(type='odl').values_list('device_id', flat=True):
+            resolver.odl_profiles[device_id] = resolver.odl_profiles.get(device_id, 0) + 1
+        resolver.model_ids = dict(ModelConfiguration.objects.values_list('name', 'id'))
+        for pk, name, model_id, cookie in Category.objects.values_list(
+            'id', 'name', 'model_configuration_id', 'category_cookie'
+        ):
+            resolver.categories.setdefault((name, model_id), []).append((pk, cookie))
+
+        seen = set()
+        rows = OdlMeter.categories.through.objects.values_list(
+            'category__name', 'odlmeter_id', 'odlmeter__controller_device_id', 'odlmeter__switch_node_id',
+            'odlmeter__meter_id_on_odl', 'odlmeter__model_configuration_id', 'odlmeter__network_device_id',
+            'odlmeter__activation_period', 'odlmeter__start_time', 'odlmeter__end_time',
+        ).order_by('odlmeter_id')
+        for (category_name, pk, controller_device_id, switch_node_id, meter_id_on_odl, model_id,
+             network_device_id, activation_period, start_time, end_time) in rows:
+            key = (controller_device_id, switch_node_id, category_name)
+            if (key, pk) in seen:
+                continue
+            seen.add((key, pk))
+            candidate = OdlMeterCandidate(
+                pk, meter_id_on_odl, switch_node_id, network_device_id, activation_period,
+                (start_time, end_time) if start_time else None,
+            )
+            resolver.meters.setdefault(key, []).append((candidate, model_id))
+            resolver.switch_nodes.add(switch_node_id)
+        logger.debug(
+            f"ODL meter resolver: {len(seen)} meter/category pairs, {len(resolver.categories)} categories"
+        )
+        return resolver
+
+    def _get_category(self, application: str, model_id: Optional[int]) -> Tuple[int, Optional[str]]:
+        matches = self.categories.get((application, model_id))
+        if not matches:
+            raise Category.DoesNotExist('Category matching query does not exist.')
+        if len(matches) > 1:
+            raise Category.MultipleObjectsReturned(
+                f'get() returned more than one Category -- it returned {len(matches)}!'
+            )
+        return matches[0]
+
+    def get_policy(self, controller_ip: str, switch_node_id: str, active_model_name: Optional[str],
+                   application: str) -> OdlPolicy:
+        """
+        Compiled policy for a flow, built on first use
+
+        Args:
+            controller_ip: LAN IP of the ODL controller
+            switch_node_id: ODL node ID of the switch
+            active_model_name: Name of the active classification model
+            application: Predicted category name
+
+        Returns:
+            OdlPolicy
+
+        Raises:
+            Device.DoesNotExist: If no controller device has this IP
+            GeneralController.DoesNotExist: If the device is not an ODL controller
+            Category.DoesNotExist: If the category is unknown for the model and as a legacy category
+        """
+        if switch_node_id not in self.switch_nodes:
+            switch_node_id = None
+        key = (controller_ip, switch_node_id, active_model_name, application)
+        policy = self._policies.get(key)
+        if policy is not None:
+            return policy
+
+        device_ids = self.controller_devices.get(controller_ip)
+        if not device_ids:
+            raise Device.DoesNotExist('Device matching query does not exist.')
+        if len(device_ids) > 1:
+            raise Device.MultipleObjectsReturned(f'get() returned more than one Device -- it returned {len(device_ids)}!')
+        controller_device_id = device_ids[0]
+        profiles = self.odl_profiles.get(controller_device_id, 0)
+        if not profiles:
+            raise GeneralController.DoesNotExist('Controller matching query does not exist.')
+        if profiles > 1:
+            raise GeneralController.MultipleObjectsReturned(
+                f'get() returned more than one Controller -- it returned {profiles}!'
+            )
+
+        # Category of the active model, falling back to the legacy one (no model configuration)
+        model_id = self.model_ids.get(active_model_name) if active_model_name else None
+        category = None
+        if model_id is not None:
+            try:
+                category = self._get_category(application, model_id)
+            except Category.DoesNotExist:
+                pass
+        if category is None:
+            category = self._get_category(application, None)
+
+        # Meters of the active model if it has any on this switch, otherwise legacy meters
+        meters = self.meters.get((controller_device_id, switch_node_id, application), [])
+        candidates = [c for c, meter_model_id in meters if model_id is not None and meter_model_id == model_id]
+        if not candidates:
+            candidates = [c for c, meter_model_id in meters if meter_model_id is None]
+
+        policy = OdlPolicy(controller_device_id, self.device_ips[controller_device_id], category[0], category[1], candidates)
+        self._policies[key] = policy
+        return policy
+
+
+_cache: VersionedCache[OdlMeterResolver] = VersionedCache(
+    'ODL meter resolver', ODL_METER_RESOLVER_VERSION_KEY, OdlMeterResolver.build, METER_POLICY_REFRESH_SECONDS,
+)
+
+
+def get_odl_meter_resolver(force_refresh: bool = False) -> OdlMeterResolver:
+    """
+    Return the process-wide ODL meter resolver, rebuilding it when the version changes
+
+    Args:
+        force_refresh: Check the version key now instead of waiting for the interval
+
+    Returns:
+        OdlMeterResolver: Current resolver
+    """
+    return _cache.get(force_refresh)
+
+
+def invalidate_odl_meter_resolver():
+    """
+    Drop this process's resolver and bump the shared version so every worker rebuilds
+
+    Called from odl.signals once the triggering transaction has committed.
+    """
+    _cache.invalidate()
@@ -0,0 +1,183 @@
+"""
+Pooled OpenDaylight RESTCONF client
+
+One OdlClient per controller keeps a requests.Session with a keep-alive connection
+pool and a thread pool of ODL_MAX_CONCURRENCY workers. put_flows() sends a batch of
+flow PUTs concurrently, so a batch costs roughly the slowest PUT instead of the sum
+of all of them, while no controller sees more than ODL_MAX_CONCURRENCY requests at
+once. Credentials, port and timeout come from the ODL_* settings.
+
+Every request's latency is recorded in the stage metrics under the "odl_restconf"
+pipeline, one stage per method and controller (e.g. "put 10.0.0.5"), and shows up in
+GET /api/v1/classification-stats/stages/.
+
+Usage:
+    from odl.odl_client import get_odl_client
+
+    results = get_odl_client(controller_ip).put_flows(flow_requests)
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Sequence
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+from classifier.stage_timing import span, recorder as stage_recorder
+
+logger = logging.getLogger(__name__)
+
+ODL_USERNAME = getattr(settings, 'ODL_USERNAME', 'admin')
+ODL_PASSWORD = getattr(settings, 'ODL_PASSWORD', 'admin')
+ODL_REST_PORT = getattr(settings, 'ODL_REST_PORT', 8181)
+ODL_REQUEST_TIMEOUT = getattr(settings, 'ODL_REQUEST_TIMEOUT', 15.0)
+ODL_MAX_CONCURRENCY = getattr(settings, 'ODL_MAX_CONCURRENCY', 8)
+
+METRICS_PIPELINE = 'odl_restconf'
+JSON_HEADERS = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+
+
+def flow_path(node_id: str, table_id, flow_id: str) -> str:
+    # node_id is already "openflow:123..."
+    return f"opendaylight-inventory:nodes/node={node_id}/flow-node-inventory:table={table_id}/flow={flow_id}"
+
+
+def meter_path(node_id: str, meter_id) -> str:
+    return f"opendaylight-inventory:nodes/node={node_id}/flow-node-inventory:meter={meter_id}"
+
+
+class OdlClient:
+    """
+    RESTCONF (RFC 8040) client for one ODL controller
+
+    Args:
+        controller_ip: Controller address
+        username: RESTCONF user
+        password: RESTCONF password
+        port: RESTCONF port
+        timeout: Default per-request timeout in seconds
+        max_concurrency: Requests in flight at once from this process (also the pool size)
+    """
+
+    def __init__(self, controller_ip: str, username: str = ODL_USERNAME, password: str = ODL_PASSWORD,
+                 port: int = ODL_REST_PORT, timeout: float = ODL_REQUEST_TIMEOUT,
+                 max_concurrency: int = ODL_MAX_CONCURRENCY):
+        self.controller_ip = controller_ip
+        self.base_url = f'http://{controller_ip}:{port}/rests/data'
+        self.timeout = timeout
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.session = requests.Session()
+        self.session.auth = (username, password)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount('http://', adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix=f'odl-{controller_ip}'
+        )
+
+    def request(self, method: str, path: str, timeout: float = None, **kwargs) -> requests.Response:
+        """
+        Send a RESTCONF request and record its latency
+
+        Args:
+            method: HTTP method
+            path: Path below /rests/data (see flow_path and meter_path)
+            timeout: Overrides the client's timeout
+            **kwargs: Passed to requests (json, headers, ...)
+
+        Returns:
+            requests.Response (status is not checked)
+
+        Raises:
+            requests.RequestException: If the controller cannot be reached
+        """
+        kwargs.setdefault('headers', JSON_HEADERS)
+        start = time.perf_counter()
+        try:
+            return self.session.request(
+                method, f'{self.base_url}/{path}', timeout=timeout or self.timeout, **kwargs
+            )
+        finally:
+            stage_recorder.record_duration(
+                METRICS_PIPELINE, f'{method.lower()} {self.controller_ip}', time.perf_counter() - start
+            )
+
+    def put_flow(self, node_id: str, table_id, flow_id: str, payload: dict) -> dict:
+        """
+        PUT one flow rule (create or replace)
+
+        Returns:
+            dict with "status" ("success" or "error"), "flow_id" and, when the controller
+            answered, "response_code"; successful results include "payload_sent"
+        """
+        try:
+            response = self.request('PUT', flow_path(node_id, table_id, flow_id), json=payload)
+            response.raise_for_status()  # Raises HTTPError for 4xx/5xx responses
+            return {"status": "success", "flow_id": flow_id, "response_code": response.status_code, "payload_sent": payload}
+        except requests.exceptions.HTTPError as e:
+            err_msg = f"Failed to program ODL flow {flow_id}. Status: {e.response.status_code}. Response: {e.response.text}"
+            logger.exception(err_msg)
+            return {"status": "error", "flow_id": flow_id, "message": err_msg, "response_code": e.response.status_code}
+        except requests.exceptions.RequestException as e:
+            err_msg = f"Network error while programming ODL flow {flow_id}: {e}"
+            logger.exception(err_msg)
+            return {"status": "error", "flow_id": flow_id, "message": err_msg}
+
+    def put_flows(self, flow_requests: Sequence[dict]) -> List[dict]:
+        """
+        PUT several flow rules concurrently
+
+        Args:
+            flow_requests: {"node_id", "table_id", "flow_id", "payload"} dicts
+
+        Returns:
+            put_flow results aligned with ``flow_requests``
+        """
+        if not flow_requests:
+            return []
+        with span('odl_put'):
+            if len(flow_requests) == 1:
+                flow = flow_requests[0]
+                return [self.put_flow(flow['node_id'], flow['table_id'], flow['flow_id'], flow['payload'])]
+            futures = [
+                self._executor.submit(
+                    self.put_flow, flow['node_id'], flow['table_id'], flow['flow_id'], flow['payload']
+                )
+                for flow in flow_requests
+            ]
+            return [future.result() for future in futures]
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+_clients: Dict[str, OdlClient] = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+
+def get_odl_client(controller_ip: str) -> OdlClient:
+    """
+    Return this process's pooled client for a controller
+
+    Clients are not shared across fork(): a forked worker starts with new sessions
+    and threads.
+    """
+    global _clients, _clients_pid
+    if _clients_pid != os.getpid():
+        with _clients_lock:
+            if _clients_pid != os.getpid():
+                _clients = {}
+                _clients_pid = os.getpid()
+    client = _clients.get(controller_ip)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(controller_ip)
+            if client is None:
+                client = _clients[controller_ip] = OdlClient(controller_ip)
+    return client
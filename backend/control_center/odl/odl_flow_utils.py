@@ -1,10 +1,10 @@
-import json
 import logging
-import requests
-from requests.auth import HTTPBasicAuth
 import time
 import hashlib
 
+from classifier.installed_flows import installed_flow_cache, rule_key
+from .odl_client import get_odl_client
+
 logger = logging.getLogger(__name__)
 class OdlMeterFlowRule:
     def __init__(self, protocol_str, client_port_num,
@@ -134,62 +134,87 @@ class OdlMeterFlowRule:
 
         return flow_payload
 
-    def _send_flow_to_odl(self, flow_payload, flow_id_str, controller_device_obj):
+    def build_flow_requests(self):
         """
-        Sends a single flow rule to OpenDaylight.
-        Uses PUT (create or replace).
+        Flow rules for both directions as queueable dicts (see classifier.flow_programming),
+        c2s first
         """
-        # Use the RFC 8040 URL
-        # URL: /rests/data/opendaylight-inventory:nodes/node=<Node-id>/flow-node-inventory:table=<Table-#>/flow=<Flow-#>
-        # self.odl_switch_node_id_str is already "openflow:123..."
-        api_url = (
-            f"http://{self.controller_ip_str}:8181/rests/data/"
-            f"opendaylight-inventory:nodes/node={self.odl_switch_node_id_str}/"
-            f"flow-node-inventory:table={self.table_id}/flow={flow_id_str}"
-        )
+        return [
+            {
+                "node_id": self.odl_switch_node_id_str,
+                "table_id": self.table_id,
+                "flow_id": flow_id,
+                "payload": self._build_odl_flow_payload(flow_id, direction),
+            }
+            for flow_id, direction in ((self.flow_id_c2s, 'c2s'), (self.flow_id_s2c, 's2c'))
+        ]
 
-        # print(f"Sending ODL flow rule to: {api_url}")
-        # print(f"ODL Flow Payload for {flow_id_str}: {json.dumps(flow_payload)}")
-
-        try:
-            response = requests.put(
-                api_url,
-                json=flow_payload,
-                auth=HTTPBasicAuth('admin', 'admin'),
-                headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
-                timeout=15
-            )
-            response.raise_for_status() # Raises HTTPError for 4xx/5xx responses
-            # print(f"Successfully programmed ODL flow {flow_id_str}. Status: {response.status_code}")
-            return {"status": "success", "flow_id": flow_id_str, "response_code": response.status_code, "payload_sent": flow_payload}
-        except requests.exceptions.HTTPError as e:
-            err_msg = f"Failed to program ODL flow {flow_id_str}. Status: {e.response.status_code}. Response: {e.response.text}"
-            logger.exception(err_msg)
-            return {"status": "error", "flow_id": flow_id_str, "message": err_msg, "response_code": e.response.status_code}
-        except requests.exceptions.RequestException as e:
-            err_msg = f"Network error while programming ODL flow {flow_id_str}: {e}"
-            logger.exception(err_msg)
-            return {"status": "error", "flow_id": flow_id_str, "message": err_msg}
-
-
-    def apply_metered_flow_rules(self, controller_device_obj):
+    def apply_metered_flow_rules(self, controller_device_obj=None):
         """
         Builds and sends flow rules for both directions (client-to-server and server-to-client)
-        to OpenDaylight.
-        controller_device_obj: The general.models.Device instance for the ODL controller.
+        to OpenDaylight. Both PUTs run concurrently.
+        controller_device_obj: Optional general.models.Device instance for the ODL controller
+        (the rules are sent to controller_ip_str).
         """
-        results = []
-        payload_c2s = self._build_odl_flow_payload(self.flow_id_c2s, 'c2s')
-        result_c2s = self._send_flow_to_odl(payload_c2s, self.flow_id_c2s, controller_device_obj)
-        results.append(result_c2s)
-
-        # Only proceed to s2c if c2s was successful, or handle errors appropriately
-        if result_c2s.get("status") == "success":
-            payload_s2c = self._build_odl_flow_payload(self.flow_id_s2c, 's2c')
-            result_s2c = self._send_flow_to_odl(payload_s2c, self.flow_id_s2c, controller_device_obj)
-            results.append(result_s2c)
-        else:
-            logger.debug(f"Skipping s2c flow for {self.flow_id_c2s} due to previous error.")
-            results.append({"status": "skipped", "flow_id": self.flow_id_s2c, "reason": "c2s flow failed"})
-
-        return results
\ No newline at end of file
+        return apply_odl_flow_rules([self])[0]
+
+
+def install_odl_flows(controller_ip, flow_requests):
+    """
+    PUT flow rules concurrently, skipping rules that are already installed
+
+    Identical rules are sent once and rules found in the installed-flow cache are not
+    sent at all.
+
+    Args:
+        controller_ip: ODL controller address
+        flow_requests: {"node_id", "table_id", "flow_id", "payload"} dicts
+
+    Returns:
+        Results aligned with ``flow_requests``: dicts with "status" ("success" or "error"),
+        "flow_id" and, when the controller answered, "response_code"; a rule that was
+        already installed gets the result of its original PUT with "cached": True
+    """
+    cached = installed_flow_cache.lookup('odl', controller_ip, flow_requests)
+    results = [dict(entry, cached=True) if entry is not None else None for entry in cached]
+    # rule key -> positions in flow_requests, for the rules that have to be sent
+    pending = {}
+    for position, (flow_request, entry) in enumerate(zip(flow_requests, cached)):
+        if entry is None:
+            pending.setdefault(rule_key(flow_request), []).append(position)
+    if not pending:
+        return results
+    sent = [flow_requests[positions[0]] for positions in pending.values()]
+    sent_results = get_odl_client(controller_ip).put_flows(sent)
+    for positions, result in zip(pending.values(), sent_results):
+        for position in positions:
+            results[position] = result
+    accepted = [(flow, result) for flow, result in zip(sent, sent_results) if result.get("status") == "success"]
+    installed_flow_cache.store(
+        'odl', controller_ip, [flow for flow, _ in accepted], [result for _, result in accepted]
+    )
+    return results
+
+
+def apply_odl_flow_rules(flow_rules):
+    """
+    Install the rules of several classifications, all PUTs of a controller concurrently
+
+    Args:
+        flow_rules: OdlMeterFlowRule instances
+
+    Returns:
+        List aligned with ``flow_rules`` of [c2s result, s2c result] lists
+    """
+    results = [None] * len(flow_rules)
+    # controller IP -> [(rule index, flow requests)]
+    by_controller = {}
+    for index, flow_rule in enumerate(flow_rules):
+        by_controller.setdefault(flow_rule.controller_ip_str, []).append((index, flow_rule.build_flow_requests()))
+    for controller_ip, entries in by_controller.items():
+        flow_results = install_odl_flows(controller_ip, [flow for _, flows in entries for flow in flows])
+        position = 0
+        for index, flows in entries:
+            results[index] = flow_results[position:position + len(flows)]
+            position += len(flows)
+    return results
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from classifier.models import ModelConfiguration
+from general.models import Controller as GeneralController, Device
+from .models import Category, OdlMeter
+from .meter_resolver import invalidate_odl_meter_resolver
+
+
+def _schedule_invalidation():
+    # Rebuild only after commit, so other workers do not reload the old rows
+    transaction.on_commit(invalidate_odl_meter_resolver)
+
+
+@receiver(post_save, sender=OdlMeter)
+@receiver(post_delete, sender=OdlMeter)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ModelConfiguration)
+@receiver(post_delete, sender=ModelConfiguration)
+@receiver(post_save, sender=GeneralController)
+@receiver(post_delete, sender=GeneralController)
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def odl_meter_policy_changed(sender, instance, **kwargs):
+    _schedule_invalidation()
+
+
+@receiver(m2m_changed, sender=OdlMeter.categories.through)
+def odl_meter_categories_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _schedule_invalidation()
@@ -22,10 +22,12 @@ import os
 import logging
 import requests
 import ipaddress
+from redis import RedisError
 
 from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
 
-from requests.auth import HTTPBasicAuth
 from django.db.models import IntegerField
 from django.db.models.functions import Cast
 from django.shortcuts import get_object_or_404
@@ -33,12 +35,12 @@ from rest_framework.generics import ListAPIView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from asgiref.sync import async_to_sync
+from asgiref.sync import sync_to_async
 from .models import Category
 from network_device.models import NetworkDevice
+from network_device.registry import device_error, device_registry
 from general.models import Device, Bridge
 from .serializers import OdlMeterSerializer, OdlNodeSerializer
-from channels.layers import get_channel_layer
 from classifier.models import ModelConfiguration
 from classifier.state_manager import state_manager
 
@@ -46,12 +48,17 @@ from django.utils.timezone import now as django_now
 from django.db.models import Q
 from django.db import transaction
 from rest_framework.decorators import api_view, permission_classes
-from utils.permissions import HasAPIKeyOrIsAuthenticated
+from utils.permissions import HasAPIKeyOrIsAuthenticated, check_permissions
 
 
 from classifier.classification import create_classification_from_json
 from classifier.model_manager import model_manager
-from .odl_flow_utils import OdlMeterFlowRule
+from classifier.stage_timing import span, traced
+from classifier.flow_notifier import flow_notifier
+from .odl_flow_utils import OdlMeterFlowRule, apply_odl_flow_rules
+from .odl_client import get_odl_client, meter_path
+from classifier.flow_programming import FLOW_PROGRAMMING_ASYNC, ODL, build_odl_job, enqueue_flow_jobs
+from .meter_resolver import METER_POLICY_INDEX_ENABLED, OdlMeterResolver, get_odl_meter_resolver
 from .models import OdlMeter
 from general.models import Controller as GeneralController
 from network_data.tasks import create_flow_entries_batch
@@ -329,15 +336,14 @@ class CreateOpenDaylightMeterView(APIView):
                 }]
             }
 
-            odl_api_url = f"http://{controller_ip}:8181/rests/data/opendaylight-inventory:nodes/node={switch_node_id_input}/flow-node-inventory:meter={numeric_meter_id_val}"
+            odl_meter_path = meter_path(switch_node_id_input, numeric_meter_id_val)
+            odl_api_url = f"{get_odl_client(controller_ip).base_url}/{odl_meter_path}"
             logger.debug(f"Sending ODL meter creation request to: {odl_api_url}")  # For debugging
             logger.debug(f"Sending ODL meter creation payload: {json.dumps(odl_meter_payload)}")  # For debugging
 
             try:
-                response = requests.put(
-                    odl_api_url, json=odl_meter_payload, auth=HTTPBasicAuth('admin', 'admin'),
-                    headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
-                    timeout=20
+                response = get_odl_client(controller_ip).request(
+                    'PUT', odl_meter_path, json=odl_meter_payload, timeout=20
                 )
                 response.raise_for_status() # Will raise an exception for 4xx/5xx errors
             except requests.exceptions.HTTPError as e:
@@ -392,232 +398,316 @@ class CreateOpenDaylightMeterView(APIView):
             )
 
 
-@api_view(['POST'])
-@permission_classes([HasAPIKeyOrIsAuthenticated])
-def odl_classify_and_apply_policy(request):
+def _is_private_ip(ip):
+    try:
+        return ipaddress.ip_address(ip).is_private
+    except Exception:
+        return False
+
+
+def _decode_odl_items(data_list, results, has_active_model, input_shape):
     """
-    Classify and apply policy to ODL meters
-    Authentication: Required (Knox Token or API Key)
+    Validate items and prepare model inputs so the whole batch is classified with a
+    single forward pass
+
+    Args:
+        has_active_model: False fails every item
+        input_shape: Input shape of the active model, looked up once per request (the
+            helper does no I/O, so the async view can call it in the event loop)
+
+    Returns:
+        List of (index, item, classification, model_input, public_ip_for_asn); failed
+        items get an error in ``results``
     """
-    if request.method == 'POST':
-        data = request.data
-        # Accept both a single object and a list of objects
-        if isinstance(data, dict):
-            data_list = [data]
-            single_input = True
-        elif isinstance(data, list):
-            data_list = data
-            single_input = False
+    pending = []
+    for index, item in enumerate(data_list):
+        if not has_active_model:
+            results[index] = {
+                "status": "error",
+                "message": "No active classification model available"
+            }
+            continue
+        port_to_router_of = item.get('port_to_router')
+        port_to_client_of = item.get('port_to_client')
+        odl_switch_node_id = item.get('switch_id')
+        client_mac = item.get('src_mac')
+        client_ip = item.get('src_ip')
+        dst_ip = item.get('dst_ip')
+        
+        # Extract public IP for ASN lookup (prefer src_ip, fallback to dst_ip)
+        public_ip_for_asn = None
+        if client_ip and not _is_private_ip(client_ip):
+            public_ip_for_asn = client_ip
+        elif dst_ip and not _is_private_ip(dst_ip):
+            public_ip_for_asn = dst_ip
+        
+        if not all([port_to_router_of, port_to_client_of, odl_switch_node_id, client_mac]):
+            results[index] = {
+                "status": "error",
+                "message": "Missing required fields: port_to_router, port_to_client, switch_id (ODL Node ID), src_mac"
+            }
+            continue
+        try:
+            with span('decode'):
+                classification_obj = create_classification_from_json(item)
+                model_input = model_manager.prepare_input(classification_obj.payload, input_shape)
+            pending.append((index, item, classification_obj, model_input, public_ip_for_asn))
+        except ValueError as e:
+            logger.exception(f"Invalid data for classification: {e}")
+            results[index] = {"status": "error", "message": str(e)}
+        except Exception as e:
+            logger.exception(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Error preparing ODL classification input")
+            results[index] = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+    return pending
+
+
+def _odl_client_device(item):
+    """Client device of a flow; a private src_ip updates the device's IP"""
+    client_ip = item.get('src_ip')
+    return item.get('src_mac'), client_ip if client_ip and _is_private_ip(client_ip) else None
+
+
+def _odl_client_devices(pending):
+    """Client devices of a batch"""
+    return [_odl_client_device(item) for _, item, *_ in pending]
+
+
+def _drop_invalid_devices(pending, predictions, results):
+    """Fail the items whose client device cannot be stored, so the device upsert of the batch is not rejected"""
+    valid, valid_predictions = [], []
+    for entry, prediction in zip(pending, predictions):
+        error = device_error(*_odl_client_device(entry[1]))
+        if error:
+            results[entry[0]] = {"status": "error", "message": error}
         else:
-            return Response({'status': 'error', 'message': 'Invalid input format'}, status=400)
+            valid.append(entry)
+            valid_predictions.append(prediction)
+    return valid, valid_predictions
 
-        results = []
-        flow_entries_to_log = []  # Collect flow log dicts here
-        for item in data_list:
-            if not model_manager.get_active_model():
-                results.append({
-                    "status": "error",
-                    "message": "No active classification model available"
-                })
-                continue
-            port_to_router_of = item.get('port_to_router')
-            port_to_client_of = item.get('port_to_client')
-            odl_switch_node_id = item.get('switch_id')
-            client_mac = item.get('src_mac')
-            destination_mac_for_flow = item.get('dst_mac')
-            client_ip = item.get('src_ip')
-            dst_ip = item.get('dst_ip')
-            
-            # Function to check if IP is private
-            def is_private_ip(ip):
-                try:
-                    return ipaddress.ip_address(ip).is_private
-                except Exception:
-                    return False
-            
-            # Extract public IP for ASN lookup (prefer src_ip, fallback to dst_ip)
-            public_ip_for_asn = None
-            if client_ip and not is_private_ip(client_ip):
-                public_ip_for_asn = client_ip
-            elif dst_ip and not is_private_ip(dst_ip):
-                public_ip_for_asn = dst_ip
-            
-            # Keep existing logic for private IP (for network device creation)
-            private_ip = client_ip if client_ip and is_private_ip(client_ip) else None
-            if not all([port_to_router_of, port_to_client_of, odl_switch_node_id, client_mac]):
-                results.append({
+
+def _build_odl_flow_rules(pending, predictions, device_ids, results, flow_entries_to_log, notifications,
+                          active_model_name, meter_resolver=None):
+    """
+    Resolve each classification's ODL policy and build its flow rule
+
+    Args:
+        notifications: Receives the application name of every processed flow (published
+            to flow_updates by the caller)
+        meter_resolver: OdlMeterResolver; the shared one (or a fresh one when
+            METER_POLICY_INDEX_ENABLED is off) if not given
+
+    Returns:
+        Tuple (queued_flows, odl_flow_rules): controller IP -> [(index, job,
+        OdlMeterFlowRule)] to queue with FLOW_PROGRAMMING_ASYNC, and
+        [(index, OdlMeterFlowRule)] to install in the request
+    """
+    queued_flows = {}
+    odl_flow_rules = []
+    if not pending:
+        return queued_flows, odl_flow_rules
+    if meter_resolver is None:
+        # Read once per request; the resolver answers every flow's policy from memory
+        meter_resolver = get_odl_meter_resolver() if METER_POLICY_INDEX_ENABLED else OdlMeterResolver.build()
+
+    for (index, item, classification_obj, _, _), predicted_app_tuple in zip(pending, predictions):
+        port_to_router_of = item.get('port_to_router')
+        port_to_client_of = item.get('port_to_client')
+        odl_switch_node_id = item.get('switch_id')
+        client_mac = item.get('src_mac')
+        destination_mac_for_flow = item.get('dst_mac')
+        try:
+            application_name = predicted_app_tuple[0]
+            flow_data = {
+                'src_ip': item.get('src_ip'),
+                'dst_ip': item.get('dst_ip'),
+                'src_mac': item.get('src_mac'),
+                'src_port': item.get('src_port'),
+                'dst_port': item.get('dst_port'),
+                'classification': application_name,
+            }
+            flow_entries_to_log.append(flow_data)  # Collect for batch logging
+            flow_application_results = []
+            flow_job = None
+            applied_meter_id = None
+            odl_controller_ip = item.get('controller_ip')
+            if not odl_controller_ip:
+                results[index] = {
                     "status": "error",
-                    "message": "Missing required fields: port_to_router, port_to_client, switch_id (ODL Node ID), src_mac"
-                })
-                continue
-            try:
-                classification_obj = create_classification_from_json(item)
-                # Pass the public IP address to predict_flow for ASN lookup when confidence is low
-                predicted_app_tuple = model_manager.predict_flow(classification_obj.payload, public_ip_for_asn)
-                application_name = predicted_app_tuple[0]
-                flow_data = {
-                    'src_ip': item.get('src_ip'),
-                    'dst_ip': item.get('dst_ip'),
-                    'src_mac': item.get('src_mac'),
-                    'src_port': item.get('src_port'),
-                    'dst_port': item.get('dst_port'),
-                    'classification': application_name,
+                    "message": "controller_ip for OpenDaylight is required."
                 }
-                flow_entries_to_log.append(flow_data)  # Collect for batch logging
-                network_device, created = NetworkDevice.objects.get_or_create(
-                    mac_address=client_mac,
-                    defaults={
-                        'device_type': 'end_user',
-                        'ip_address': private_ip
-                    }
-                )
-                # If the device already existed, update the IP if it's different, provided, and private
-                if not created and private_ip:
-                    if network_device.ip_address != private_ip:
-                        network_device.ip_address = private_ip
-                        network_device.save(update_fields=['ip_address'])
-                flow_application_results = []
-                applied_meter_id = None
-                odl_controller_ip = item.get('controller_ip')
-                if not odl_controller_ip:
-                    results.append({
-                        "status": "error",
-                        "message": "controller_ip for OpenDaylight is required."
-                    })
-                    continue
+                continue
+            with span('meter_selection'):
                 try:
-                    controller_device_obj = Device.objects.get(lan_ip_address=odl_controller_ip, device_type='controller')
-                    general_controller_profile = GeneralController.objects.get(device=controller_device_obj, type='odl')
+                    policy = meter_resolver.get_policy(
+                        odl_controller_ip, odl_switch_node_id, active_model_name, application_name
+                    )
                 except Device.DoesNotExist:
-                    results.append({
+                    results[index] = {
                         "status": "error",
                         "message": f"ODL Controller Device with IP {odl_controller_ip} not found."
-                    })
+                    }
                     continue
                 except GeneralController.DoesNotExist:
-                    results.append({
+                    results[index] = {
                         "status": "error",
                         "message": f"Device {odl_controller_ip} is not configured as an OpenDaylight controller."
-                    })
+                    }
                     continue
-                try:
-                    # Try to find category for the active model first
-                    active_model_name = model_manager.active_model
-                    if active_model_name:
-                        from classifier.models import ModelConfiguration
-                        try:
-                            model_config = ModelConfiguration.objects.get(name=active_model_name)
-                            category_obj = Category.objects.get(name=application_name, model_configuration=model_config)
-                        except (ModelConfiguration.DoesNotExist, Category.DoesNotExist):
-                            # Fallback to legacy categories (no model_configuration)
-                            category_obj = Category.objects.get(name=application_name, model_configuration__isnull=True)
-                    else:
-                        # No active model, use legacy categories
-                        category_obj = Category.objects.get(name=application_name, model_configuration__isnull=True)
-                    
-                    if not category_obj.category_cookie:
-                        logger.debug(f"Category '{application_name}' found but has no pre-calculated cookie. Regenerating.")
-                        category_obj.save()
-                    category_cookie_to_use = category_obj.category_cookie
                 except Category.DoesNotExist:
                     logger.debug(f"Category '{application_name}' not found in database. Cannot apply policy.")
-                    results.append({
+                    results[index] = {
                         "status": "error",
                         "message": f"Category '{application_name}' not found."
-                    })
+                    }
                     continue
-                # Build meter queryset with model-specific filtering
-                meter_queryset = OdlMeter.objects.filter(
-                    categories__name=application_name,
-                    controller_device=controller_device_obj,
-                    switch_node_id=odl_switch_node_id
+                category_cookie_to_use = policy.category_cookie
+                if not category_cookie_to_use:
+                    logger.debug(f"Category '{application_name}' found but has no pre-calculated cookie. Regenerating.")
+                    category_obj = Category.objects.get(pk=policy.category_pk)
+                    category_obj.save()
+                    category_cookie_to_use = category_obj.category_cookie
+                final_selected_meter = policy.select_meter(device_ids.get(client_mac), django_now())
+            if final_selected_meter:
+                applied_meter_id = final_selected_meter.meter_id_on_odl
+                protocol_type = 'udp'
+                if classification_obj.tcp == 1:
+                    protocol_type = 'tcp'
+                odl_flow_manager = OdlMeterFlowRule(
+                    protocol_str=protocol_type,
+                    client_port_num=classification_obj.client_port,
+                    in_port_of_number_client_to_server=port_to_client_of,
+                    out_port_of_number_client_to_server=port_to_router_of,
+                    in_port_of_number_server_to_client=port_to_router_of,
+                    out_port_of_number_server_to_client=port_to_client_of,
+                    client_mac_address=client_mac,
+                    server_mac_address=destination_mac_for_flow,
+                    controller_ip_str=policy.controller_ip,
+                    odl_meter_id_numeric=int(final_selected_meter.meter_id_on_odl),
+                    odl_switch_node_id_str=final_selected_meter.switch_node_id,
+                    category_obj_cookie=category_cookie_to_use
                 )
-                
-                # Filter by active model if available
-                active_model_name = model_manager.active_model
-                if active_model_name:
-                    from classifier.models import ModelConfiguration
-                    try:
-                        model_config = ModelConfiguration.objects.get(name=active_model_name)
-                        # First try to find meters for the active model
-                        model_specific_meters = meter_queryset.filter(model_configuration=model_config)
-                        if model_specific_meters.exists():
-                            meter_queryset = model_specific_meters
-                        else:
-                            # Fallback to legacy meters (no model_configuration)
-                            meter_queryset = meter_queryset.filter(model_configuration__isnull=True)
-                    except ModelConfiguration.DoesNotExist:
-                        # If active model doesn't exist, use legacy meters
-                        meter_queryset = meter_queryset.filter(model_configuration__isnull=True)
-                else:
-                    # No active model, use legacy meters
-                    meter_queryset = meter_queryset.filter(model_configuration__isnull=True)
-                current_time = django_now().time()
-                current_day_is_weekday = django_now().weekday() < 5
-                active_meters = meter_queryset.filter(
-                    Q(network_device=network_device) | Q(network_device__isnull=True)
-                ).order_by('network_device')
-                final_selected_meter = None
-                for potential_meter in active_meters:
-                    is_active_now = False
-                    if potential_meter.activation_period == OdlMeter.ALL_WEEK:
-                        is_active_now = True
-                    elif potential_meter.activation_period == OdlMeter.WEEKDAY and current_day_is_weekday:
-                        if not potential_meter.start_time or (
-                                potential_meter.start_time <= current_time <= potential_meter.end_time): is_active_now = True
-                    elif potential_meter.activation_period == OdlMeter.WEEKEND and not current_day_is_weekday:
-                        if not potential_meter.start_time or (
-                                potential_meter.start_time <= current_time <= potential_meter.end_time): is_active_now = True
-                    if is_active_now:
-                        final_selected_meter = potential_meter
-                        break
-                if final_selected_meter:
-                    applied_meter_id = final_selected_meter.meter_id_on_odl
-                    protocol_type = 'udp'
-                    if classification_obj.tcp == 1:
-                        protocol_type = 'tcp'
-                    odl_flow_manager = OdlMeterFlowRule(
-                        protocol_str=protocol_type,
-                        client_port_num=classification_obj.client_port,
-                        in_port_of_number_client_to_server=port_to_client_of,
-                        out_port_of_number_client_to_server=port_to_router_of,
-                        in_port_of_number_server_to_client=port_to_router_of,
-                        out_port_of_number_server_to_client=port_to_client_of,
-                        client_mac_address=client_mac,
-                        server_mac_address=destination_mac_for_flow,
-                        controller_ip_str=general_controller_profile.device.lan_ip_address,
-                        odl_meter_id_numeric=int(final_selected_meter.meter_id_on_odl),
-                        odl_switch_node_id_str=final_selected_meter.switch_node_id,
-                        category_obj_cookie=category_cookie_to_use
+                if FLOW_PROGRAMMING_ASYNC:
+                    # Queued after the loop; answer with the payloads and a handle
+                    flow_job, flow_application_results = build_odl_job(odl_flow_manager)
+                    queued_flows.setdefault(policy.controller_ip, []).append(
+                        (index, flow_job, odl_flow_manager)
                     )
-                    flow_application_results = odl_flow_manager.apply_metered_flow_rules(controller_device_obj)
                 else:
-                    logger.debug(f"No active ODL Meter found for app {application_name} on switch {odl_switch_node_id} for MAC {client_mac}")
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    'flow_updates',
-                    {
-                        'type': 'flow_message',
-                        'flow': application_name
-                    }
-                )
-                results.append({
-                    'status': 'success',
-                    'message': 'Classification processed.',
-                    'classification': application_name,
-                    'applied_meter_id': applied_meter_id,
-                    'flow_results': flow_application_results
-                })
-            except ValueError as e:
-                logger.exception(f"Invalid data for classification: {e}")
-                results.append({"status": "error", "message": str(e)})
+                    # Installed after the loop, concurrently with the rest of the batch
+                    odl_flow_rules.append((index, odl_flow_manager))
+            else:
+                logger.debug(f"No active ODL Meter found for app {application_name} on switch {odl_switch_node_id} for MAC {client_mac}")
+            notifications.append(application_name)
+            results[index] = {
+                'status': 'success',
+                'message': 'Classification processed.',
+                'classification': application_name,
+                'applied_meter_id': applied_meter_id,
+                'flow_results': flow_application_results
+            }
+            if flow_job is not None:
+                results[index]['flow_handle'] = flow_job['handle']
+        except ValueError as e:
+            logger.exception(f"Invalid data for classification: {e}")
+            results[index] = {"status": "error", "message": str(e)}
+        except Exception as e:
+            logger.exception(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Error during ODL classification/policy application")
+            results[index] = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+    return queued_flows, odl_flow_rules
+
+
+def _program_odl_flow_rules(queued_flows, odl_flow_rules, results):
+    """Queue or install the rules built by _build_odl_flow_rules and merge the outcome into ``results``"""
+    for controller_ip, queued in queued_flows.items():
+        with span('flow_programming'):
+            try:
+                enqueue_flow_jobs(ODL, controller_ip, [flow_job for _, flow_job, _ in queued])
+            except RedisError as e:
+                # Without the queue, program the rules in the request as the synchronous path does
+                logger.error(f"Failed to queue flows for ODL {controller_ip}, programming them now: {e}")
+                for index, _, odl_flow_manager in queued:
+                    results[index].pop('flow_handle', None)
+                    odl_flow_rules.append((index, odl_flow_manager))
+    if odl_flow_rules:
+        # Every PUT of the request runs concurrently (bounded per controller by ODL_MAX_CONCURRENCY)
+        with span('flow_programming'):
+            flow_results = apply_odl_flow_rules([flow_rule for _, flow_rule in odl_flow_rules])
+        for (index, _), flow_result in zip(odl_flow_rules, flow_results):
+            if results[index].get('status') == 'success':
+                results[index]['flow_results'] = flow_result
+
+
+@api_view(['POST'])
+@permission_classes([HasAPIKeyOrIsAuthenticated])
+@traced('odl_classify')
+def odl_classify_and_apply_policy(request):
+    """
+    Classify and apply policy to ODL meters
+    Authentication: Required (Knox Token or API Key)
+    """
+    if request.method == 'POST':
+        with span('parse'):
+            data = request.data
+        # Accept both a single object and a list of objects
+        if isinstance(data, dict):
+            data_list = [data]
+            single_input = True
+        elif isinstance(data, list):
+            data_list = data
+            single_input = False
+        else:
+            return Response({'status': 'error', 'message': 'Invalid input format'}, status=400)
+
+        results = [None] * len(data_list)
+        flow_entries_to_log = []  # Collect flow log dicts here
+        notifications = []
+        
+        active_model_data = model_manager.get_active_model()
+        pending = _decode_odl_items(
+            data_list, results, bool(active_model_data), model_manager.input_shape_of(active_model_data)
+        )
+        
+        predictions = []
+        if pending:
+            try:
+                # Pass the public IP addresses to predict_flows for ASN lookup when confidence is low
+                with span('predict'):
+                    predictions = model_manager.predict_flows(
+                        [entry[3] for entry in pending],
+                        [entry[4] for entry in pending]
+                    )
             except Exception as e:
-                logger.exception(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Error during ODL classification/policy application")
-                results.append({"status": "error", "message": f"An internal error occurred: {str(e)}"})
+                logger.exception(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Error during batch classification")
+                for index, *_ in pending:
+                    results[index] = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+                pending = []
+        
+        device_ids = {}
+        if pending:
+            # Register client devices for the whole batch
+            try:
+                pending, predictions = _drop_invalid_devices(pending, predictions, results)
+                with span('device_lookup'):
+                    device_ids = device_registry.ensure_devices(_odl_client_devices(pending))
+            except Exception as e:
+                logger.exception(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Error registering end-user devices")
+                for index, *_ in pending:
+                    results[index] = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+                pending = []
+
+        queued_flows, odl_flow_rules = _build_odl_flow_rules(
+            pending, predictions, device_ids, results, flow_entries_to_log, notifications,
+            model_manager.active_model if pending else None
+        )
+        _program_odl_flow_rules(queued_flows, odl_flow_rules, results)
+        if notifications:
+            with span('notify'):
+                flow_notifier.publish_many(notifications)
         # After the loop, batch log the flow entries
         if flow_entries_to_log:
             logger.debug(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Batching {len(flow_entries_to_log)} flow entries")
-            create_flow_entries_batch.delay(flow_entries_to_log)
+            with span('dispatch'):
+                create_flow_entries_batch.delay(flow_entries_to_log)
         # Return a list if input was a list, or a single result if input was a dict
         if single_input:
             return Response(results[0], status=status.HTTP_200_OK if results[0].get('status') == 'success' else 400)
@@ -625,6 +715,93 @@ def odl_classify_and_apply_policy(request):
             return Response(results, status=status.HTTP_200_OK)
 
 
+@csrf_exempt
+@traced('odl_classify')
+async def odl_classify_and_apply_policy_async(request):
+    """
+    Native async version of odl_classify_and_apply_policy, served when
+    CLASSIFY_ASYNC_VIEWS is enabled
+    Authentication: Required (Knox Token or API Key)
+
+    Inference is awaited on the micro-batcher, the active model is read with the async
+    Redis client and flow_updates notifications are handed to the coalescing notifier.
+    Authentication, device upserts, policy resolution, flow programming and the Celery
+    dispatch run in worker threads.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+    denied = await sync_to_async(check_permissions)(request)
+    if denied is not None:
+        return denied
+    try:
+        with span('parse'):
+            data = json.loads(request.body)
+    except ValueError as e:
+        return JsonResponse({'detail': f'JSON parse error - {e}'}, status=400)
+    if isinstance(data, dict):
+        data_list = [data]
+        single_input = True
+    elif isinstance(data, list):
+        data_list = data
+        single_input = False
+    else:
+        return JsonResponse({'status': 'error', 'message': 'Invalid input format'}, status=400)
+
+    results = [None] * len(data_list)
+    flow_entries_to_log = []
+    notifications = []
+    
+    active_model_data = await model_manager.aget_active_model()
+    pending = _decode_odl_items(
+        data_list, results, bool(active_model_data), model_manager.input_shape_of(active_model_data)
+    )
+    
+    predictions = []
+    if pending:
+        try:
+            with span('predict'):
+                predictions = await model_manager.apredict_flows(
+                    [entry[3] for entry in pending],
+                    [entry[4] for entry in pending]
+                )
+        except Exception as e:
+            logger.exception(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Error during batch classification")
+            for index, *_ in pending:
+                results[index] = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+            pending = []
+    
+    device_ids = {}
+    if pending:
+        try:
+            pending, predictions = _drop_invalid_devices(pending, predictions, results)
+            with span('device_lookup'):
+                device_ids = await device_registry.aensure_devices(_odl_client_devices(pending))
+        except Exception as e:
+            logger.exception(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Error registering end-user devices")
+            for index, *_ in pending:
+                results[index] = {"status": "error", "message": f"An internal error occurred: {str(e)}"}
+            pending = []
+
+    if pending:
+        active_model_name = await model_manager.aget_active_model_name()
+        # Loading the resolver and regenerating a missing category cookie may query the database
+        queued_flows, odl_flow_rules = await sync_to_async(_build_odl_flow_rules)(
+            pending, predictions, device_ids, results, flow_entries_to_log, notifications, active_model_name
+        )
+        if queued_flows or odl_flow_rules:
+            await sync_to_async(_program_odl_flow_rules, thread_sensitive=False)(queued_flows, odl_flow_rules, results)
+    if notifications:
+        with span('notify'):
+            flow_notifier.publish_many(notifications)
+    if flow_entries_to_log:
+        logger.debug(f"[ODL_CLASSIFY_AND_APPLY_POLICY] Batching {len(flow_entries_to_log)} flow entries")
+        with span('dispatch'):
+            await sync_to_async(create_flow_entries_batch.delay, thread_sensitive=False)(flow_entries_to_log)
+    if single_input:
+        return JsonResponse(results[0], status=200 if results[0].get('status') == 'success' else 400)
+    return JsonResponse(results, safe=False, status=200)
+
+
 class OdlMeterDetailView(APIView):
     """
     Retrieve, update or delete an OdlMeter instance.
@@ -774,15 +951,14 @@ class OdlMeterDetailView(APIView):
                         }
                     }]
                 }
-                odl_api_url = f"http://{requested_controller_ip}:8181/rests/data/opendaylight-inventory:nodes/node={requested_switch_node_id}/flow-node-inventory:meter={requested_meter_id_on_odl_int}"
+                odl_meter_path = meter_path(requested_switch_node_id, requested_meter_id_on_odl_int)
+                odl_api_url = f"{get_odl_client(requested_controller_ip).base_url}/{odl_meter_path}"
                 logger.debug(f"Sending ODL meter PUT request to: {odl_api_url}")
                 logger.debug(f"Sending ODL meter PUT payload: {json.dumps(odl_meter_payload)}")
 
                 try:
-                    response = requests.put(
-                        odl_api_url, json=odl_meter_payload, auth=HTTPBasicAuth('admin', 'admin'),
-                        headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
-                        timeout=20
+                    response = get_odl_client(requested_controller_ip).request(
+                        'PUT', odl_meter_path, json=odl_meter_payload, timeout=20
                     )
                     response.raise_for_status()
                 except requests.exceptions.HTTPError as e:
@@ -845,10 +1021,9 @@ class OdlMeterDetailView(APIView):
         switch_node_id = meter.switch_node_id
         controller_ip_address = meter.controller_device.lan_ip_address
 
-        odl_api_url = f"http://{controller_ip_address}:8181/rests/data/opendaylight-inventory:nodes/node={switch_node_id}/flow-node-inventory:meter={meter_id_on_odl}"
         try:
-            response = requests.delete(
-                odl_api_url,auth=HTTPBasicAuth('admin', 'admin'),
+            response = get_odl_client(controller_ip_address).request(
+                'DELETE', meter_path(switch_node_id, meter_id_on_odl),
                 headers={'Content-Type': 'application/xml', 'Accept': 'application/xml'},
                 timeout=20
             )
@@ -24,3 +24,6 @@ from django.apps import AppConfig
 class OnosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'onos'
+
+    def ready(self):
+        import onos.signals
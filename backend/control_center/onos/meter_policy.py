@@ -0,0 +1,228 @@
+"""
+In-memory meter policy index for ONOS meter selection
+
+The classify view used to resolve the meter for every flow with a chain of queries
+(plugin, installation, switch, controller and up to six Meter querysets). The
+MeterPolicyIndex compiles all of that once per process:
+
+- whether the metering plugin exists and is installed
+- switch LAN IP -> ONOS controller device
+- (controller device, category) -> the lowest-pk meter, the lowest-pk meter per
+  client MAC, and the weekday/weekend meters with their activation windows
+
+Resolving a meter is then a few dict lookups. The index is rebuilt when
+onos.signals bumps METER_POLICY_VERSION_KEY after a Meter, Category, plugin
+installation, controller or switch change; other processes poll the version key
+at most every METER_POLICY_REFRESH_SECONDS.
+"""
+
+import logging
+from collections import namedtuple
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.timezone import now
+
+from general.models import Controller, Device
+from onos.models import Meter
+from software_plugin.models import Plugin, PluginInstallation
+from utils.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+METER_PLUGIN_NAME = 'tau-onos-metre-traffic-classification'
+METER_POLICY_VERSION_KEY = 'onos:meter_policy:version'
+METER_POLICY_INDEX_ENABLED = getattr(settings, 'METER_POLICY_INDEX_ENABLED', True)
+METER_POLICY_REFRESH_SECONDS = getattr(settings, 'METER_POLICY_REFRESH_SECONDS', 2.0)
+
+# What the flow rule needs from a Meter, without holding model instances
+MeterPolicy = namedtuple('MeterPolicy', (
+    'pk', 'meter_id', 'switch_id', 'controller_ip', 'mac_address',
+    'activation_period', 'start_time', 'end_time',
+))
+
+
+def meter_policy_from_meter(meter: Meter) -> MeterPolicy:
+    """Build a MeterPolicy from a Meter instance (used by the query-based fallback)"""
+    return MeterPolicy(
+        meter.pk, meter.meter_id, meter.switch_id, meter.controller_device.lan_ip_address,
+        meter.network_device.mac_address if meter.network_device else None,
+        meter.activation_period, meter.start_time, meter.end_time,
+    )
+
+
+class CategoryPolicy:
+    """Meters of one (controller device, category) pair"""
+
+    __slots__ = ('first', 'by_mac', 'windows')
+
+    def __init__(self, policies: List[MeterPolicy]):
+        policies = sorted(policies, key=lambda p: p.pk)
+        self.first = policies[0]
+        self.by_mac: Dict[Optional[str], MeterPolicy] = {}
+        # Activation windows per period, in pk order; meters without both times never match
+        self.windows: Dict[str, List[MeterPolicy]] = {Meter.WEEKDAY: [], Meter.WEEKEND: []}
+        for policy in policies:
+            self.by_mac.setdefault(policy.mac_address, policy)
+            if policy.activation_period in self.windows and policy.start_time is not None and policy.end_time is not None:
+                self.windows[policy.activation_period].append(policy)
+
+    def select(self, src_mac: Optional[str], at: datetime) -> MeterPolicy:
+        """
+        Meter for a client at a point in time
+
+        Meters assigned to the client's MAC take precedence over the category's
+        other meters, but a weekday/weekend meter whose window contains ``at`` is
+        also eligible; the lowest pk wins, as in the original queryset union.
+        """
+        best = self.by_mac.get(src_mac)
+        if best is None:
+            # No MAC-specific meter: every meter of the category is eligible
+            return self.first
+        period = Meter.WEEKDAY if at.weekday() < 5 else Meter.WEEKEND
+        current_time = at.time()
+        for policy in self.windows[period]:
+            if policy.pk >= best.pk:
+                break
+            if policy.start_time <= current_time <= policy.end_time:
+                return policy
+        return best
+
+
+class MeterPolicyIndex:
+    """Compiled meter selection data for one version of the configuration"""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.plugin_exists = False
+        self.plugin_installed = False
+        # Switch LAN IP -> switch Device ids (lookup is by IP, which is not unique)
+        self.switches: Dict[str, List[int]] = {}
+        # Switch Device id -> ONOS controller device ids
+        self.controllers: Dict[int, List[int]] = {}
+        self.categories: Dict[Tuple[int, str], CategoryPolicy] = {}
+        # NetworkDevice ids referenced by meters; saving other network devices needs no rebuild
+        self.network_device_ids = set()
+        self.meter_count = 0
+
+    @classmethod
+    def build(cls, version=None) -> 'MeterPolicyIndex':
+        """Load the index from the database (five queries)"""
+        index = cls(version)
+        plugin = Plugin.objects.filter(name=METER_PLUGIN_NAME).first()
+        index.plugin_exists = plugin is not None
+        index.plugin_installed = index.plugin_exists and PluginInstallation.objects.filter(plugin=plugin).exists()
+
+        for device_id, lan_ip in Device.objects.filter(device_type='switch').values_list('id', 'lan_ip_address'):
+            index.switches.setdefault(lan_ip, []).append(device_id)
+        for switch_id, controller_device_id in Controller.switches.through.objects.filter(
+            controller__type='onos'
+        ).values_list('device_id', 'controller__device_id'):
+            index.controllers.setdefault(switch_id, []).append(controller_device_id)
+
+        grouped: Dict[Tuple[int, str], List[MeterPolicy]] = {}
+        meter_pks = set()
+        rows = Meter.categories.through.objects.values_list(
+            'category__name', 'meter__controller_device_id', 'meter_id', 'meter__meter_id', 'meter__switch_id',
+            'meter__controller_device__lan_ip_address', 'meter__network_device_id',
+            'meter__network_device__mac_address', 'meter__activation_period',
+            'meter__start_time', 'meter__end_time',
+        )
+        for (category, controller_device_id, pk, meter_id, switch_id, controller_ip, network_device_id,
+             mac_address, activation_period, start_time, end_time) in rows:
+            grouped.setdefault((controller_device_id, category), []).append(MeterPolicy(
+                pk, meter_id, switch_id, controller_ip, mac_address, activation_period, start_time, end_time,
+            ))
+            meter_pks.add(pk)
+            if network_device_id is not None:
+                index.network_device_ids.add(network_device_id)
+        index.categories = {key: CategoryPolicy(policies) for key, policies in grouped.items()}
+        index.meter_count = len(meter_pks)
+        logger.debug(f"Meter policy index: {index.meter_count} meters, {len(index.categories)} controller categories")
+        return index
+
+    def select(self, application: str, switch_ip: str, src_mac: Optional[str],
+               at: Optional[datetime] = None) -> Optional[MeterPolicy]:
+        """
+        Resolve the meter for a classified flow
+
+        Args:
+            application: Predicted category name
+            switch_ip: LAN IP of the switch that saw the flow
+            src_mac: Client MAC address
+            at: Time used for the activation windows (defaults to now())
+
+        Returns:
+            MeterPolicy or None if the metering plugin is not installed or no meter applies
+
+        Raises:
+            Plugin.DoesNotExist: If the metering plugin is not registered
+            Device/Controller.DoesNotExist or MultipleObjectsReturned:
+                If the switch or its ONOS controller cannot be resolved uniquely
+        """
+        if not self.plugin_exists:
+            raise Plugin.DoesNotExist('Plugin matching query does not exist.')
+        if not self.plugin_installed:
+            return None
+        switch_ids = self.switches.get(switch_ip)
+        if not switch_ids:
+            raise Device.DoesNotExist('Device matching query does not exist.')
+        if len(switch_ids) > 1:
+            raise Device.MultipleObjectsReturned(f'get() returned more than one Device -- it returned {len(switch_ids)}!')
+        controller_ids = self.controllers.get(switch_ids[0])
+        if not controller_ids:
+            raise Controller.DoesNotExist('Controller matching query does not exist.')
+        if len(controller_ids) > 1:
+            raise Controller.MultipleObjectsReturned(f'get() returned more than one Controller -- it returned {len(controller_ids)}!')
+        category_policy = self.categories.get((controller_ids[0], application))
+        if category_policy is None:
+            return None
+        return category_policy.select(src_mac, at or now())
+
+
+_cache: VersionedCache[MeterPolicyIndex] = VersionedCache(
+    'meter policy index', METER_POLICY_VERSION_KEY, MeterPolicyIndex.build, METER_POLICY_REFRESH_SECONDS,
+)
+
+
+def get_meter_policy_index(force_refresh: bool = False) -> MeterPolicyIndex:
+    """
+    Return the process-wide meter policy index, rebuilding it when the version changes
+
+    Args:
+        force_refresh: Check the version key now instead of waiting for the interval
+
+    Returns:
+        MeterPolicyIndex: Current index
+    """
+    return _cache.get(force_refresh)
+
+
+def loaded_meter_policy_index() -> Optional[MeterPolicyIndex]:
+    """This process's current index without loading or refreshing it"""
+    return _cache.loaded()
+
+
+def invalidate_meter_policy_index():
+    """
+    Drop this process's index and bump the shared version so every worker rebuilds
+
+    Called from onos.signals once the triggering transaction has committed.
+    """
+    _cache.invalidate()
+
+
+def select_meter(application: str, switch_ip: str, src_mac: Optional[str]) -> Optional[MeterPolicy]:
+    """
+    Resolve the ONOS meter for a classified flow from the policy index
+
+    Args:
+        application: Predicted category name
+        switch_ip: LAN IP of the switch that saw the flow
+        src_mac: Client MAC address
+
+    Returns:
+        MeterPolicy or None if the metering plugin is not installed or no meter applies
+    """
+    return get_meter_policy_index().select(application, switch_ip, src_mac)
@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from general.models import Controller, Device
+from network_device.models import NetworkDevice
+from software_plugin.models import Plugin, PluginInstallation
+from .models import Category, Meter
+from .meter_policy import invalidate_meter_policy_index, loaded_meter_policy_index
+
+
+def _schedule_invalidation():
+    # Rebuild only after commit, so other workers do not reload the old rows
+    transaction.on_commit(invalidate_meter_policy_index)
+
+
+@receiver(post_save, sender=Meter)
+@receiver(post_delete, sender=Meter)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Plugin)
+@receiver(post_delete, sender=Plugin)
+@receiver(post_save, sender=PluginInstallation)
+@receiver(post_delete, sender=PluginInstallation)
+@receiver(post_save, sender=Controller)
+@receiver(post_delete, sender=Controller)
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def meter_policy_changed(sender, instance, **kwargs):
+    _schedule_invalidation()
+
+
+@receiver(m2m_changed, sender=Meter.categories.through)
+@receiver(m2m_changed, sender=Controller.switches.through)
+def meter_policy_relation_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _schedule_invalidation()
+
+
+@receiver(post_save, sender=NetworkDevice)
+def metered_network_device_changed(sender, instance, created, **kwargs):
+    # Client devices are created for every unseen MAC; only an edit to a device with
+    # meters (e.g. its MAC) changes the index. Deleting one cascades to Meter post_delete.
+    if created:
+        return
+    index = loaded_meter_policy_index()
+    if index is not None:
+        metered = instance.pk in index.network_device_ids
+    else:
+        metered = Meter.objects.filter(network_device_id=instance.pk).exists()
+    if metered:
+        _schedule_invalidation()
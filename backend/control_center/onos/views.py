@@ -33,6 +33,7 @@ from general.models import Device
 from .serializers import MeterSerializer
 from network_device.models import NetworkDevice
 from utils.meter import convert_onos_meter_api_id_to_internal_id
+from .onos_client import ONOS_USERNAME, ONOS_PASSWORD
 
 
 class MeterListView(APIView):
@@ -44,12 +45,12 @@ class MeterListView(APIView):
             # Make API call
             response = requests.get(
                 url=url,
-                auth=HTTPBasicAuth('onos', 'rocks')
+                auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
             )
             url_devices = f"http://{lan_ip_address}:8181/onos/v1/devices"
             response_devices = requests.get(
                 url=url_devices,
-                auth=HTTPBasicAuth('onos', 'rocks')
+                auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
             )
             device_response_json = response_devices.json()
             devices = device_response_json.get('devices')
@@ -134,13 +135,13 @@ class MeterListByIdView(APIView):
             # Make API call
             response = requests.get(
                 url=url,
-                auth=HTTPBasicAuth('onos', 'rocks')
+                auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
             )
 
             url_devices = f"http://{lan_ip_address}:8181/onos/v1/devices"
             response_devices = requests.get(
                 url=url_devices,
-                auth=HTTPBasicAuth('onos', 'rocks')
+                auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
             )
             device_response_json = response_devices.json()
             devices = device_response_json.get('devices')
@@ -286,7 +287,7 @@ class CreateMeterView(APIView):
                 url=url,
                 json=payload,
                 headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
-                auth=HTTPBasicAuth('onos', 'rocks'),
+                auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD),
                 timeout=15 # Add a timeout to the request itself
             )
 
@@ -305,7 +306,7 @@ class CreateMeterView(APIView):
                 try:
                     response_meters = requests.get(
                         url=url_meters,
-                        auth=HTTPBasicAuth('onos', 'rocks'),
+                        auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD),
                         timeout=10 # Add timeout
                     )
                     response_meters.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
@@ -411,7 +412,7 @@ class SwitchList(APIView):
             url = f"http://{controller_ip}:8181/onos/v1/devices"
             response = requests.get(
                 url=url,
-                auth=HTTPBasicAuth('onos', 'rocks')
+                auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
             )
             response_json = response.json()
             devices = response_json.get('devices', [])
@@ -485,7 +486,7 @@ def delete_meter(request):
     response = requests.delete(
         url=url,
         headers={'Accept': 'application/json'},
-        auth=HTTPBasicAuth('onos', 'rocks')
+        auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
     )
     print(response.text)
     if response.status_code == 204:  # Depending on the server, it may return 204 for a successful delete
@@ -508,7 +509,7 @@ def get_device_details(request):
     response = requests.get(
         url=url,
         headers={'Accept': 'application/json'},
-        auth=HTTPBasicAuth('onos', 'rocks')
+        auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
     )
     return Response(response.json(), status=response.status_code)
 
@@ -523,7 +524,7 @@ def get_port_details(request):
         response = requests.get(
             url=url,
             headers={'Accept': 'application/json'},
-            auth=HTTPBasicAuth('onos', 'rocks')
+            auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
         )
         return Response(response.json(), status=response.status_code)
     else:
@@ -543,7 +544,7 @@ def delete_flows(request):
     response = requests.delete(
         url=url,
         headers={'Accept': 'application/json'},
-        auth=HTTPBasicAuth('onos', 'rocks')
+        auth=HTTPBasicAuth(ONOS_USERNAME, ONOS_PASSWORD)
     )
     print(response.text)
     if response.status_code == 204:  # Depending on the server, it may return 204 for a successful delete
@@ -1,11 +1,17 @@
 """
 Database utility functions for connection management and monitoring
 """
+import csv
+import io
+import json
 import logging
 import time
 from contextlib import contextmanager
-from django.db import connection, transaction
+from datetime import date, datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+from django.db import connection, connections, transaction
 from django.conf import settings
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
@@ -180,3 +186,157 @@ def log_connection_pool_stats():
     except Exception as e:
         logger.error(f"Error getting connection pool stats: {e}")
         return None
+
+
+# NULL marker of the CSV rows sent to COPY (empty strings stay empty strings)
+COPY_NULL = r'\N'
+COPY_CHUNK_ROWS = 1000
+COPY_READ_SIZE = 64 * 1024
+
+
+def _copy_value(value):
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, datetime):
+        if settings.USE_TZ and timezone.is_naive(value):
+            # As the ORM does: naive datetimes are in the default time zone
+            value = timezone.make_aware(value)
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _copy_columns(model, fields: Optional[Sequence[str]]):
+    """(field, row key) pairs of the columns to load; the auto primary key is left to its sequence"""
+    auto_field = model._meta.auto_field
+    concrete = [f for f in model._meta.concrete_fields if f is not auto_field]
+    if fields is not None:
+        wanted = set(fields)
+        concrete = [f for f in concrete if f.name in wanted or f.attname in wanted]
+    return concrete
+
+
+class _CopyStream(io.TextIOBase):
+    """File-like CSV view of a chunk iterator, read by COPY a block at a time"""
+
+    def __init__(self, chunks: Iterator[str]):
+        self._chunks = chunks
+        self._buffer = ''
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._buffer[self._pos:] + ''.join(self._chunks)
+            self._buffer, self._pos = '', 0
+            return data
+        while len(self._buffer) - self._pos < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer = self._buffer[self._pos:] + chunk
+            self._pos = 0
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+    readline = read
+
+
+def _csv_chunks(rows: Iterable[dict], columns, counter: List[int]) -> Iterator[str]:
+    now = timezone.now()
+    getters = []
+    for field in columns:
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+            fallback = (lambda now=now: now)
+        elif field.has_default():
+            fallback = field.get_default
+        else:
+            fallback = (lambda: None)
+        getters.append((field.name, field.attname, fallback))
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    pending = 0
+    for row in rows:
+        values = []
+        for name, attname, fallback in getters:
+            if attname in row:
+                value = row[attname]
+            elif name in row:
+                value = row[name]
+            else:
+                value = fallback()
+            if hasattr(value, 'pk') and attname != name:
+                # A model instance given for a foreign key
+                value = value.pk
+            values.append(_copy_value(value))
+        writer.writerow(values)
+        counter[0] += 1
+        pending += 1
+        if pending >= COPY_CHUNK_ROWS:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+            pending = 0
+    if pending:
+        yield out.getvalue()
+
+
+def copy_rows(model, rows: Iterable[dict], fields: Optional[Sequence[str]] = None, using: str = 'default') -> int:
+    """
+    Load rows into a model's table with COPY ... FROM STDIN
+
+    Rows are dicts keyed by field name or attname (e.g. "meter_id" or "device"), written
+    as CSV and streamed to Postgres without building model instances. Missing keys get
+    the field's default, auto_now/auto_now_add fields the current time and the auto
+    primary key its sequence value. No model validation, save() or signals run, as
+    with bulk_create.
+
+    Falls back to bulk_create when DB_BULK_LOAD_COPY is False or the database is not
+    PostgreSQL.
+
+    Args:
+        model: Model class to load into
+        rows: Iterable of dicts (consumed once)
+        fields: Field names to load; defaults to every concrete field except the auto primary key
+        using: Database alias
+
+    Returns:
+        int: Number of rows loaded
+
+    Raises:
+        django.db.Error: If Postgres rejects a row (no row of the call is loaded)
+    """
+    db = connections[using]
+    if not getattr(settings, 'DB_BULK_LOAD_COPY', True) or db.vendor != 'postgresql':
+        objs = [model(**row) for row in rows]
+        if objs:
+            model.objects.using(using).bulk_create(objs, batch_size=5000)
+        return len(objs)
+
+    columns = _copy_columns(model, fields)
+    quote = db.ops.quote_name
+    sql = (
+        f"COPY {quote(model._meta.db_table)} ({', '.join(quote(f.column) for f in columns)}) "
+        f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    )
+    counter = [0]
+    chunks = _csv_chunks(rows, columns, counter)
+    with db_connection_monitor(f"copy_rows {model._meta.db_table}"):
+        with transaction.atomic(using=using):
+            with db.cursor() as cursor:
+                if hasattr(cursor, 'copy_expert'):
+                    # psycopg2
+                    cursor.copy_expert(sql, _CopyStream(chunks), size=COPY_READ_SIZE)
+                else:
+                    # psycopg 3
+                    with cursor.copy(sql) as copy:
+                        for chunk in chunks:
+                            copy.write(chunk)
+    return counter[0]
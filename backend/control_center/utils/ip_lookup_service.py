@@ -6,34 +6,272 @@ functionality using Redis as the backend database. The service uses a Redis Sort
 where the score is the end IP address (integer) and the member contains the start IP,
 ASN, and organization information.
 
+Lookups are served from an in-process ASNIndex: the Sorted Set is read once into
+sorted uint32 start/end arrays plus an interned organization table and queried with
+np.searchsorted. The index is reloaded when populate_redis_asn bumps the
+REDIS_VERSION_KEY counter, which each process polls at most every
+ASN_INDEX_REFRESH_SECONDS.
+
 Usage:
-    from utils.ip_lookup_service import get_asn_from_ip
+    from utils.ip_lookup_service import get_asn_from_ip, lookup_many
     
     result = get_asn_from_ip("8.8.8.8")
     if result:
         print(f"ASN: {result['asn']}, Organization: {result['organization']}")
     else:
         print("IP not found in ASN database")
+    
+    results = lookup_many(["8.8.8.8", "1.1.1.1"])
 """
 
 import ipaddress
+import logging
+import threading
+import time
+import numpy as np
 import redis
 from django.conf import settings
-from typing import Optional, Dict, Union
+from typing import Optional, Dict, List, Sequence, Union
 
+logger = logging.getLogger(__name__)
 
 # Redis configuration constants
 REDIS_KEY = 'ip_asn_map'
+REDIS_VERSION_KEY = 'ip_asn_map:version'
 REDIS_HOST = getattr(settings, 'CHANNEL_REDIS_HOST', 'redis')
 REDIS_PORT = getattr(settings, 'CHANNEL_REDIS_PORT', 6379)
+ASN_INDEX_ENABLED = getattr(settings, 'ASN_INDEX_ENABLED', True)
+ASN_INDEX_REFRESH_SECONDS = getattr(settings, 'ASN_INDEX_REFRESH_SECONDS', 30.0)
+# ZRANGE page size used while loading the index
+ASN_INDEX_LOAD_CHUNK = 50000
+
+_redis_pool: Optional[redis.ConnectionPool] = None
+
+
+def _get_redis() -> redis.Redis:
+    """Return a client on the process-wide connection pool (no TCP connect per lookup)"""
+    global _redis_pool
+    if _redis_pool is None:
+        _redis_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    return redis.Redis(connection_pool=_redis_pool)
+
+
+def _parse_member(member: str):
+    """Split a "start_ip_int:asn:organization" member; organizations may contain colons"""
+    start_ip_str, asn_str, organization = member.split(':', 2)
+    return int(start_ip_str), int(asn_str), organization
+
+
+def _ip_to_int(ip_string: str) -> Optional[int]:
+    try:
+        ip_addr = ipaddress.ip_address(ip_string)
+    except ValueError:
+        return None
+    if ip_addr.version != 4:
+        # ip_asn_map only holds GeoLite2 IPv4 blocks
+        return None
+    return int(ip_addr)
+
+
+class ASNIndex:
+    """
+    Immutable in-memory copy of the ip_asn_map Sorted Set
+    
+    Ranges are stored sorted by end IP (the ZSET score), so the candidate range for an
+    IP is the first one whose end >= IP, exactly as the ZRANGEBYSCORE lookup did.
+    """
+    
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, asns: np.ndarray,
+                 org_ids: np.ndarray, organizations: List[str], version: Optional[str] = None):
+        self.starts = starts
+        self.ends = ends
+        self.asns = asns
+        self.org_ids = org_ids
+        self.organizations = organizations
+        self.version = version
+    
+    def __len__(self) -> int:
+        return len(self.ends)
+    
+    @classmethod
+    def from_redis(cls, redis_conn: redis.Redis, version: Optional[str] = None) -> "ASNIndex":
+        """
+        Build the index from the ip_asn_map Sorted Set
+        
+        Args:
+            redis_conn: Redis client with decode_responses=True
+            version: Value of REDIS_VERSION_KEY the data corresponds to
+            
+        Returns:
+            ASNIndex: Loaded index (empty if the key does not exist)
+        """
+        starts, ends, asns, org_ids = [], [], [], []
+        organizations: List[str] = []
+        org_lookup: Dict[str, int] = {}
+        offset = 0
+        while True:
+            page = redis_conn.zrange(REDIS_KEY, offset, offset + ASN_INDEX_LOAD_CHUNK - 1, withscores=True)
+            if not page:
+                break
+            for member, end_ip_score in page:
+                try:
+                    start_ip_int, asn, organization = _parse_member(member)
+                except ValueError:
+                    continue
+                org_id = org_lookup.get(organization)
+                if org_id is None:
+                    org_id = org_lookup[organization] = len(organizations)
+                    organizations.append(organization)
+                starts.append(start_ip_int)
+                ends.append(int(end_ip_score))
+                asns.append(asn)
+                org_ids.append(org_id)
+            offset += len(page)
+            if len(page) < ASN_INDEX_LOAD_CHUNK:
+                break
+        
+        ends_arr = np.asarray(ends, dtype=np.uint32)
+        order = np.argsort(ends_arr, kind='stable')
+        return cls(
+            starts=np.asarray(starts, dtype=np.uint32)[order],
+            ends=ends_arr[order],
+            asns=np.asarray(asns, dtype=np.uint32)[order],
+            org_ids=np.asarray(org_ids, dtype=np.uint32)[order],
+            organizations=organizations,
+            version=version
+        )
+    
+    def lookup_ints(self, ip_ints: np.ndarray) -> np.ndarray:
+        """
+        Vectorised range lookup
+        
+        Args:
+            ip_ints: uint32 array of IPv4 addresses
+            
+        Returns:
+            np.ndarray: Row index into the index arrays per IP, -1 where not covered
+        """
+        ip_ints = np.asarray(ip_ints, dtype=np.uint32)
+        if not len(self.ends):
+            return np.full(len(ip_ints), -1, dtype=np.int64)
+        idx = np.searchsorted(self.ends, ip_ints, side='left')
+        in_bounds = idx < len(self.ends)
+        safe_idx = np.where(in_bounds, idx, 0)
+        found = in_bounds & (self.starts[safe_idx] <= ip_ints)
+        return np.where(found, safe_idx, -1)
+    
+    def lookup_many(self, ip_strings: Sequence[str]) -> List[Optional[Dict[str, Union[int, str]]]]:
+        """
+        Look up many IPs at once
+        
+        Args:
+            ip_strings: IP address strings; invalid or IPv6 addresses yield None
+            
+        Returns:
+            List of {'asn', 'organization'} dicts or None, aligned with ip_strings
+        """
+        ip_ints = [_ip_to_int(ip) for ip in ip_strings]
+        valid = [i for i, ip_int in enumerate(ip_ints) if ip_int is not None]
+        results: List[Optional[Dict[str, Union[int, str]]]] = [None] * len(ip_ints)
+        if not valid:
+            return results
+        rows = self.lookup_ints(np.fromiter((ip_ints[i] for i in valid), dtype=np.uint32, count=len(valid)))
+        for i, row in zip(valid, rows.tolist()):
+            if row >= 0:
+                results[i] = {
+                    'asn': int(self.asns[row]),
+                    'organization': self.organizations[self.org_ids[row]]
+                }
+        return results
+
+
+_asn_index: Optional[ASNIndex] = None
+_asn_index_checked_at = 0.0
+_asn_index_lock = threading.Lock()
+
+
+def get_asn_index(force_refresh: bool = False) -> ASNIndex:
+    """
+    Return the process-wide ASN index, reloading it when the Redis version changes
+    
+    The version key is polled at most every ASN_INDEX_REFRESH_SECONDS; in between,
+    lookups never touch Redis. If Redis is unavailable the last loaded index is kept.
+    
+    Args:
+        force_refresh: Check the version key now instead of waiting for the interval
+        
+    Returns:
+        ASNIndex: Current index
+        
+    Raises:
+        redis.RedisError: If no index has been loaded yet and Redis is unreachable
+    """
+    global _asn_index, _asn_index_checked_at
+    now = time.monotonic()
+    index = _asn_index
+    if index is not None and not force_refresh and now - _asn_index_checked_at < ASN_INDEX_REFRESH_SECONDS:
+        return index
+    
+    with _asn_index_lock:
+        if _asn_index is not None and not force_refresh and now - _asn_index_checked_at < ASN_INDEX_REFRESH_SECONDS:
+            return _asn_index
+        try:
+            redis_conn = _get_redis()
+            version = redis_conn.get(REDIS_VERSION_KEY)
+            if _asn_index is None or _asn_index.version != version:
+                from classifier.asn_matcher import clear_match_cache
+
+                start = time.monotonic()
+                _asn_index = ASNIndex.from_redis(redis_conn, version=version)
+                # Memoised ASN -> category results may name organisations that changed
+                clear_match_cache()
+                logger.info(
+                    f"Loaded ASN index version {version}: {len(_asn_index)} ranges, "
+                    f"{len(_asn_index.organizations)} organizations in {time.monotonic() - start:.2f}s"
+                )
+        except redis.RedisError as e:
+            if _asn_index is None:
+                raise
+            logger.warning(f"ASN index refresh failed, keeping version {_asn_index.version}: {e}")
+        _asn_index_checked_at = now
+        return _asn_index
+
+
+def lookup_many(ip_strings: Sequence[str]) -> List[Optional[Dict[str, Union[int, str]]]]:
+    """
+    Bulk ASN lookup for batched classification
+    
+    Args:
+        ip_strings: IP address strings
+        
+    Returns:
+        List of {'asn', 'organization'} dicts or None, aligned with ip_strings
+        
+    Raises:
+        redis.RedisError: If the index cannot be loaded
+    """
+    if not ASN_INDEX_ENABLED:
+        return [get_asn_from_ip(ip) for ip in ip_strings]
+    return get_asn_index().lookup_many(ip_strings)
+
+
+def bump_asn_index_version(redis_conn: redis.Redis) -> int:
+    """
+    Signal all processes to reload their ASN index (called after repopulating ip_asn_map)
+    
+    Returns:
+        int: New version number
+    """
+    return redis_conn.incr(REDIS_VERSION_KEY)
 
 
 def get_asn_from_ip(ip_string: str) -> Optional[Dict[str, Union[int, str]]]:
     """
     Look up the ASN and organization information for a given IP address.
     
-    This function performs a high-performance lookup using Redis Sorted Set.
-    The lookup algorithm:
+    This function performs a high-performance lookup against the in-process
+    ASNIndex built from the Redis Sorted Set (or directly against Redis when
+    ASN_INDEX_ENABLED is False). The lookup algorithm:
     1. Converts the IP to integer representation
     2. Finds the first range whose end IP (score) >= query IP
     3. Verifies the query IP is within the range (start IP <= query IP <= end IP)
@@ -64,6 +302,12 @@ def get_asn_from_ip(ip_string: str) -> Optional[Dict[str, Union[int, str]]]:
         >>> print(result)
         None  # Private IP not in database
     """
+    if ASN_INDEX_ENABLED:
+        try:
+            return get_asn_index().lookup_many([ip_string])[0]
+        except redis.RedisError as e:
+            raise redis.RedisError(f"Redis connection/query error: {e}")
+    
     try:
         # Step 1: Validate and convert IP address
         ip_addr = ipaddress.ip_address(ip_string)
@@ -74,12 +318,8 @@ def get_asn_from_ip(ip_string: str) -> Optional[Dict[str, Union[int, str]]]:
         return None
     
     try:
-        # Step 2: Connect to Redis
-        redis_conn = redis.Redis(
-            host=REDIS_HOST,
-            port=REDIS_PORT,
-            decode_responses=True
-        )
+        # Step 2: Reuse a pooled Redis connection
+        redis_conn = _get_redis()
         
         # Step 3: Query the Sorted Set for the first range whose end IP >= our IP
         result = redis_conn.zrangebyscore(
@@ -102,20 +342,10 @@ def get_asn_from_ip(ip_string: str) -> Optional[Dict[str, Union[int, str]]]:
         
         # Decode the member string and split by colon
         # Format: "start_ip_int:asn:organization"
-        parts = member.split(':')
-        
-        if len(parts) != 3:
-            # Invalid member format
-            return None
-        
-        start_ip_str, asn_str, organization = parts
-        
-        # Convert start IP string to integer
         try:
-            start_ip_int = int(start_ip_str)
-            asn = int(asn_str)
+            start_ip_int, asn, organization = _parse_member(member)
         except ValueError:
-            # Invalid integer conversion
+            # Invalid member format or integer conversion
             return None
         
         # Step 6: Final verification - check if IP is within the range
@@ -24,7 +24,11 @@ This module provides permission classes that combine API key authentication
 with standard DRF authentication methods.
 """
 
+from django.http import JsonResponse
+from rest_framework import exceptions
 from rest_framework.permissions import BasePermission, IsAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
 from rest_framework_api_key.permissions import HasAPIKey
 
 
@@ -53,3 +57,38 @@ class HasAPIKeyOrIsAuthenticated(BasePermission):
         # Fall back to standard authentication
         return self._auth_permission.has_permission(request, view)
 
+
+
+def check_permissions(request, permission_classes=(HasAPIKeyOrIsAuthenticated,)):
+    """
+    Run DRF authentication and permission checks for a plain (e.g. async) Django view
+
+    Mirrors what APIView.check_permissions does for @api_view views. Authentication may
+    query the database, so async views call this through sync_to_async.
+
+    Args:
+        request: django.http.HttpRequest
+        permission_classes: DRF permission classes that must all allow the request
+
+    Returns:
+        None if the request is allowed, otherwise a JsonResponse with the error
+    """
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        for permission_class in permission_classes:
+            if not permission_class().has_permission(drf_request, None):
+                if drf_request.authenticators and not drf_request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied()
+    except exceptions.APIException as exc:
+        response = JsonResponse({'detail': str(exc.detail)}, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            authenticate_header = drf_request.authenticators[0].authenticate_header(drf_request)
+            if authenticate_header:
+                response['WWW-Authenticate'] = authenticate_header
+            else:
+                response.status_code = 403
+        return response
+    return None
@@ -0,0 +1,99 @@
+"""
+Process-wide caches invalidated through a Redis version counter
+
+Used for configuration compiled into memory (ONOS and ODL meter policy indexes,
+port link speeds) and the end-user device registry.
+Model signals call invalidate() after commit: the local copy is dropped and the
+version key is incremented, and every other process notices the new version the
+next time it checks, at most refresh_seconds later.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Generic, Optional, TypeVar
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_HOST = getattr(settings, 'CHANNEL_REDIS_HOST', 'redis')
+REDIS_PORT = getattr(settings, 'CHANNEL_REDIS_PORT', 6379)
+
+_redis_pool: Optional[redis.ConnectionPool] = None
+
+T = TypeVar('T')
+
+
+def _get_redis() -> redis.Redis:
+    global _redis_pool
+    if _redis_pool is None:
+        _redis_pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
+    return redis.Redis(connection_pool=_redis_pool)
+
+
+class VersionedCache(Generic[T]):
+    """
+    A value built by ``loader(version)`` and rebuilt when the Redis version key changes
+
+    Args:
+        name: Name used in log messages
+        version_key: Redis key holding the version counter
+        loader: Callable building the value; receives the version it is built for
+        refresh_seconds: Minimum interval between version checks
+    """
+
+    def __init__(self, name: str, version_key: str, loader: Callable[[Optional[str]], T], refresh_seconds: float):
+        self.name = name
+        self.version_key = version_key
+        self.loader = loader
+        self.refresh_seconds = refresh_seconds
+        self._value: Optional[T] = None
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, force_refresh: bool = False) -> T:
+        """
+        Return the cached value, rebuilding it if the version changed
+
+        If Redis is unavailable the current value is kept (and built if there is none).
+        """
+        current = time.monotonic()
+        value = self._value
+        if value is not None and not force_refresh and current - self._checked_at < self.refresh_seconds:
+            return value
+
+        with self._lock:
+            if self._value is not None and not force_refresh and current - self._checked_at < self.refresh_seconds:
+                return self._value
+            try:
+                version = _get_redis().get(self.version_key)
+            except redis.RedisError as e:
+                logger.warning(f"{self.name} version check failed: {e}")
+                version = self._version
+            if self._value is None or self._version != version:
+                start = time.monotonic()
+                self._value = self.loader(version)
+                self._version = version
+                logger.info(f"Loaded {self.name} version {version} in {time.monotonic() - start:.3f}s")
+            self._checked_at = current
+            return self._value
+
+    def check_due(self) -> bool:
+        """Whether the next get() would check the version key (async callers run it in a thread then)"""
+        return self._value is None or time.monotonic() - self._checked_at >= self.refresh_seconds
+
+    def loaded(self) -> Optional[T]:
+        """The current value without loading or refreshing it"""
+        return self._value
+
+    def invalidate(self):
+        """Drop this process's value and bump the shared version so every process rebuilds"""
+        with self._lock:
+            self._value = None
+        try:
+            _get_redis().incr(self.version_key)
+        except redis.RedisError as e:
+            logger.error(f"Failed to bump {self.name} version, other processes keep their current copy: {e}")
@@ -46,6 +46,10 @@ export default function RealTimeClassificationsGraph() {
       if (typeof data === "string") {
         try {
           const parsedData = JSON.parse(data);
+          if (parsedData.counts) {
+            updateClassificationCounts(parsedData.counts);
+            return;
+          }
           if (parsedData.flow) {
             updateClassificationData(parsedData.flow);
             return;
@@ -55,6 +59,13 @@ export default function RealTimeClassificationsGraph() {
         }
       }
 
+      // Handle the batched format: per-category counts for one coalescing window
+      if (typeof data === "object" && data !== null && "counts" in data) {
+        const batchData = data as unknown as { counts: Record<string, number> };
+        updateClassificationCounts(batchData.counts);
+        return;
+      }
+
       // Handle the object format that's actually coming from the WebSocket
       if (typeof data === "object" && data !== null && "flow" in data) {
         const flowData = data as unknown as { flow: string };
@@ -84,14 +95,20 @@ export default function RealTimeClassificationsGraph() {
   }, [subscribe]);
 
   const updateClassificationData = (categoryName: string) => {
+    updateClassificationCounts({ [categoryName]: 1 });
+  };
+
+  const updateClassificationCounts = (counts: Record<string, number>) => {
     setClassificationData((prevData) => {
       const newData = [...prevData];
-      const index = newData.findIndex((data) => data.name === categoryName);
-      if (index !== -1) {
-        newData[index].value += 1;
-      } else {
-        newData.push({ name: categoryName, value: 1 });
-      }
+      Object.entries(counts).forEach(([categoryName, count]) => {
+        const index = newData.findIndex((data) => data.name === categoryName);
+        if (index !== -1) {
+          newData[index] = { ...newData[index], value: newData[index].value + count };
+        } else {
+          newData.push({ name: categoryName, value: count });
+        }
+      });
       return newData;
     });
   };
@@ -668,10 +668,18 @@ export interface ConfidenceBreakdown {
   uncertain: ConfidenceCountWithPercentage;
 }
 
+export interface PredictionTimePercentiles {
+  p50: number;
+  p90: number;
+  p99: number;
+  p999: number;
+}
+
 export interface ClassificationSummaryStats {
   confidence_breakdown: ConfidenceBreakdown;
   total_classifications: number;
   avg_prediction_time_ms: number;
+  prediction_time_percentiles_ms?: PredictionTimePercentiles | null;
 }
 
 export interface ClassificationPeriodStats {
@@ -681,6 +689,7 @@ export interface ClassificationPeriodStats {
   uncertain_count: number;
   total_classifications: number;
   avg_prediction_time_ms: number;
+  prediction_time_percentiles_ms?: PredictionTimePercentiles | null;
 }
 
 export interface ClassificationStatsData {